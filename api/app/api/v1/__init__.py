@@ -3,12 +3,11 @@ API v1 routes
 """
 
 from fastapi import APIRouter
-from app.api.v1 import containers, missions
+from app.api.v1 import admin, challenges, containers, scoreboard
 
 router = APIRouter()
 
 router.include_router(containers.router, prefix="/containers", tags=["containers"])
-router.include_router(missions.router, prefix="/missions", tags=["missions"])
-
-
-
+router.include_router(challenges.router, prefix="/challenges", tags=["challenges"])
+router.include_router(scoreboard.router, tags=["scoreboard"])
+router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -0,0 +1,100 @@
+"""
+Admin endpoints (X-Cache-Invalidation-Token)
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app import services
+from app.core.config import settings
+
+router = APIRouter()
+
+
+def require_admin_token(request: Request) -> None:
+    """管理用エンドポイントの認可（X-Cache-Invalidation-Token が CACHE_INVALIDATION_TOKEN と一致すること）"""
+    expected_token = settings.CACHE_INVALIDATION_TOKEN
+    provided_token = request.headers.get("x-cache-invalidation-token", "")
+    if not expected_token or not hmac.compare_digest(provided_token, expected_token):
+        raise HTTPException(status_code=403, detail="Admin operation not permitted")
+
+
+@router.post("/cache/invalidate")
+async def invalidate_caches(request: Request):
+    """
+    問題データのキャッシュを無効化する（デプロイ時に tools/deploy/uploader.py から呼ばれる）
+    
+    キャッシュはプロセス内にある（API は1プロセスで動かす）ため、
+    このリクエストを受けたプロセスの無効化で全キャッシュが無効になる。
+    
+    Requires: X-Cache-Invalidation-Token ヘッダー（CACHE_INVALIDATION_TOKEN と一致すること）
+    """
+    require_admin_token(request)
+    
+    services.catalog_cache.invalidate()
+    services.flag_cache.invalidate()
+    # 再デプロイでイメージやFlagが変わるため、待機中のウォームコンテナも破棄
+    if services.warm_pool is not None:
+        services.warm_pool.invalidate()
+    if services.shared_instances is not None:
+        services.shared_instances.invalidate()
+    print("[INFO] Challenge caches invalidated")
+    return {"status": "invalidated"}
+
+
+@router.get("/admission")
+def admission_stats(request: Request):
+    """受付制御の予約量・キュー深さ・パイプライン状態"""
+    require_admin_token(request)
+    return services.admission.stats()
+
+
+@router.post("/pipeline-state")
+def set_pipeline_state(state: str, request: Request):
+    """
+    OPS_MANUAL.md のパイプライン状態を反映する
+    
+    THROTTLED / FROZEN では新規コンテナの起動を 503 で拒否し、待機中の起動も打ち切る。
+    """
+    require_admin_token(request)
+    state = state.strip().upper()
+    if state not in ("NORMAL", "STOP", "THROTTLED", "FROZEN"):
+        raise HTTPException(status_code=422, detail=f"Unknown pipeline state: {state}")
+    services.admission.set_state(state)
+    return {"status": "ok", "state": services.admission.state, "new_containers_blocked": services.admission.blocked}
+
+
+@router.get("/nodes")
+def node_pool_stats(request: Request):
+    """Docker ノードごとの配置数・予約メモリ・直近の起動時間"""
+    require_admin_token(request)
+    return {"nodes": services.node_pool.stats() if services.node_pool is not None else {}}
+
+
+@router.get("/proxy")
+def proxy_stats(request: Request, container_id: Optional[str] = None):
+    """リバースプロキシの転送量（container_id 指定時はそのセッションの通信量）"""
+    require_admin_token(request)
+    if container_id is None:
+        return services.reverse_proxy.stats()
+    session = services.session_registry.get_by_container(container_id)
+    traffic = services.reverse_proxy.traffic(session.container_id) if session is not None else None
+    if traffic is None:
+        raise HTTPException(status_code=404, detail="No proxied traffic for this container")
+    return traffic.to_dict()
+
+
+@router.get("/shared-instances")
+def shared_instance_stats(request: Request):
+    """共有インスタンスのレプリカ数・利用ユーザー数（問題別）"""
+    require_admin_token(request)
+    return {"challenges": services.shared_instances.stats() if services.shared_instances is not None else {}}
+
+
+@router.get("/warm-pool")
+def warm_pool_stats(request: Request):
+    """ウォームプールの深さとヒット率（問題別）"""
+    require_admin_token(request)
+    return {"pools": services.warm_pool.stats() if services.warm_pool is not None else {}}
@@ -0,0 +1,263 @@
+"""
+Challenge catalog and flag submission endpoints
+"""
+
+from email.utils import format_datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel, field_validator
+
+from app import services
+from app.core import metrics
+from app.core.catalog_cache import is_not_modified
+from app.core.catalog_query import paginate, parse_fields, project, variant_etag
+from app.core.config import settings
+from app.core.encoding import apply_encoding, dumps, encode_json, negotiate_encoding
+from app.core.flag_cache import verify_submission
+from app.core.rate_limiter import get_remote_address, limiter
+from app.dependencies import get_current_user
+
+router = APIRouter()
+
+
+class ChallengeInfo(BaseModel):
+    challenge_id: str  # APIレスポンスではchallenge_idとして返す
+    title: str
+    description: Optional[str] = None
+    difficulty: Optional[int] = None  # Changed from str to int (DB column is now integer)
+    category: Optional[str] = None
+    points: Optional[int] = None
+    writeup: Optional[str] = None  # Educational writeup in Markdown format（詳細エンドポイントのみ）
+    has_writeup: bool = False
+    solved: bool = False  # リクエストしたユーザーが正解済みか
+    
+    class Config:
+        populate_by_name = True
+
+class FlagSubmitRequest(BaseModel):
+    challenge_id: str
+    flag_submission: str
+    
+    @field_validator('challenge_id')
+    @classmethod
+    def validate_challenge_id(cls, v):
+        """challenge_idのバリデーション"""
+        if not v or (isinstance(v, str) and v.strip() == ""):
+            raise ValueError("challenge_id is required and cannot be empty")
+        return str(v).strip()
+    
+    @field_validator('flag_submission')
+    @classmethod
+    def validate_flag_submission(cls, v):
+        """flag_submissionのバリデーション"""
+        if not v or (isinstance(v, str) and v.strip() == ""):
+            raise ValueError("flag_submission is required and cannot be empty")
+        return str(v).strip()
+    
+    class Config:
+        populate_by_name = True
+
+class FlagSubmitResponse(BaseModel):
+    correct: bool  # フロントエンドとの互換性のためcorrectに統一
+    message: str
+    challenge_id: str
+
+
+@router.get("", response_model=list[ChallengeInfo])
+def list_challenges(
+    request: Request,
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    利用可能なCTF問題一覧を取得
+    
+    Requires: Authentication (JWT Bearer Token)
+    
+    整形済みの一覧は CatalogCache に CATALOG_CACHE_TTL_SECONDS 秒保持される。
+    各問題の solved はユーザーの正解済みビット集合から合成し、ETag もユーザーごとに変わる。
+    ETag は fields / cursor / limit と実際に適用した圧縮形式ごとにも異なる
+    （RESPONSE_COMPRESSION_MIN_BYTES 未満の本文は圧縮しないため Accept-Encoding に依らない）。
+    ETag / Last-Modified を返し、条件付きリクエストには 304 で応答する（304 にも Vary を付ける）。
+    
+    Args:
+        fields: 返すフィールド（カンマ区切り）。既定は writeup 以外のすべて
+        limit: 1ページの件数（CATALOG_MAX_LIMIT まで、未指定は全件）
+        cursor: 前のページの X-Next-Cursor ヘッダーの値
+    
+    Returns:
+        list[ChallengeInfo]: 問題一覧（pointsの昇順でソート）。続きがある場合は X-Next-Cursor ヘッダーを返す
+    """
+    try:
+        user_id = current_user.get("id", "unknown")
+        print(f"[INFO] Fetching challenges for user: {user_id}")
+        
+        try:
+            selected_fields = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if limit is not None:
+            limit = max(1, min(limit, settings.CATALOG_MAX_LIMIT))
+        
+        snapshot = services.catalog_cache.get(services.load_challenge_catalog)
+        items, etag, solved_at = services.solved_bitsets.merge(user_id, snapshot.etag, snapshot.items)
+        last_modified = max(snapshot.last_modified, solved_at) if solved_at else snapshot.last_modified
+        try:
+            page, next_cursor = paginate(items, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # 一覧は最も頻繁に呼ばれるため高速エンコーダで直列化し、一定サイズ以上のときだけ圧縮する
+        body = dumps(project(page, selected_fields))
+        accept_encoding = request.headers.get("accept-encoding")
+        encoding = negotiate_encoding(len(body), accept_encoding, settings.RESPONSE_COMPRESSION_MIN_BYTES)
+        # 射影・ページ・実際に適用する圧縮形式で本文が変わるため、それぞれ別の ETag にする
+        etag = variant_etag(etag, selected_fields, cursor, limit, encoding)
+        cache_headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Cache-Control": "private, no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        
+        if is_not_modified(request.headers, etag, last_modified):
+            return Response(status_code=304, headers=cache_headers)
+        
+        if next_cursor:
+            cache_headers["X-Next-Cursor"] = next_cursor
+        body, encoding_headers = apply_encoding(body, encoding)
+        print(f"[SUCCESS] Returning {len(page)} challenges")
+        return Response(content=body, media_type="application/json", headers={**cache_headers, **encoding_headers})
+    
+    except HTTPException:
+        # HTTPExceptionはそのまま再発生
+        raise
+    except Exception as e:
+        error_msg = f"Failed to fetch challenges: {str(e)}"
+        print(f"[ERROR] {error_msg}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=error_msg)
+
+
+@router.get("/stats")
+def get_challenge_stats(current_user: dict = Depends(get_current_user)):
+    """
+    問題ごとの正解者数・挑戦者数・正答率・ファーストブラッド
+    
+    Requires: Authentication (JWT Bearer Token)
+    """
+    return {"challenges": services.scoreboard.challenge_stats()}
+
+
+@router.get("/{challenge_id}", response_model=ChallengeInfo)
+def get_challenge(
+    challenge_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    問題の詳細（writeup を含む）
+    
+    Requires: Authentication (JWT Bearer Token)
+    
+    一覧と同じ CatalogCache のスナップショットから返す（/api/challenges/stats より後に登録すること）。
+    """
+    snapshot = services.catalog_cache.get(services.load_challenge_catalog)
+    item = next((c for c in snapshot.items if c["challenge_id"] == challenge_id), None)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Challenge not found: {challenge_id}")
+    
+    body, encoding_headers = encode_json(
+        {**item, "solved": services.solved_bitsets.is_solved(current_user["id"], challenge_id)},
+        request.headers.get("accept-encoding"),
+        settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    )
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Cache-Control": "private, no-cache", **encoding_headers},
+    )
+
+
+@router.post("/submit", response_model=FlagSubmitResponse)
+@limiter.limit("10/minute")  # Rate Limit: 10回/分（ブルートフォース対策）
+def submit_flag(
+    flag_request: FlagSubmitRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Flag提出と判定API
+    
+    Requires: Authentication (JWT Bearer Token)
+    Rate Limit: 5 requests/minute
+    
+    Process:
+    1. FlagCacheから問題の Flag モードと正解ダイジェストを取得（ミス時のみchallengesテーブルを参照）
+    2. 動的Flagの問題は HMAC(secret, challenge_id|user_id|salt) を再計算して、静的Flagの問題はダイジェストと定数時間で照合
+    3. スコアボードを差分更新し、submission_logsへの記録をキューに投入（SubmissionLogWriterが一括insert）
+    4. 結果を返す
+    """
+    user_id = current_user["id"]
+    challenge_id = flag_request.challenge_id
+    submitted_flag = flag_request.flag_submission
+    
+    print(f"[INFO] Flag submission: challenge_id={challenge_id}, user_id={user_id}")
+    
+    try:
+        # 1. Flag モードと静的Flagのダイジェストを取得（キャッシュミス時のみDBを参照）
+        entry = services.flag_cache.get(challenge_id)
+        if entry is None:
+            correct_flag, dynamic = services.load_flag_answer(challenge_id)
+            entry = services.flag_cache.set(challenge_id, correct_flag, dynamic)
+            print(f"[INFO] Found correct flag for challenge_id={challenge_id}")
+        
+        # 2. Flag照合（動的Flagの問題は HMAC のみ、他ユーザーのFlagは一致しない。
+        #    静的Flagの問題は SHA-256ダイジェストの定数時間比較、大文字小文字を区別）
+        is_correct = verify_submission(entry, challenge_id, user_id, submitted_flag, services.dynamic_flags)
+        metrics.FLAG_SUBMISSIONS.inc(result="correct" if is_correct else "incorrect")
+        # スコアボード・正答率・正解済みビットを差分更新（同じ問題の2回目以降の正解は加点しない）
+        if services.scoreboard.record(user_id, challenge_id, is_correct):
+            services.solved_bitsets.mark(user_id, challenge_id)
+        
+        # 3. IPアドレスを取得
+        client_ip = get_remote_address(request)
+        
+        # 4. submission_logsテーブルに記録（キューに積み、バックグラウンドで一括insert）
+        log_data = {
+            "user_id": user_id,
+            "challenge_id": challenge_id,
+            "submitted_flag": submitted_flag,  # 実際の運用ではハッシュ化推奨だが今回は生データ
+            "is_correct": is_correct,
+            "ip_address": client_ip
+        }
+        if not services.submission_log_writer.submit(log_data):
+            print("[WARNING] Submission log queue full, record spilled to local file")
+        
+        # 5. 結果を返す
+        if is_correct:
+            message = "MISSION ACCOMPLISHED. WELL DONE AGENT."
+            print(f"[SUCCESS] User {user_id} submitted correct flag for challenge {challenge_id}")
+        else:
+            message = "INVALID FLAG. ACCESS DENIED."
+            print(f"[INFO] User {user_id} submitted incorrect flag for challenge {challenge_id}")
+        
+        return {
+            "correct": is_correct,  # フロントエンドとの互換性のためcorrectに統一
+            "message": message,
+            "challenge_id": challenge_id
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        error_msg = f"Flag submission failed: {str(e)}"
+        print(f"[ERROR] {error_msg}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=error_msg)
@@ -1,72 +1,234 @@
 """
-Container management endpoints
+Mission container endpoints (start jobs, stop, extend)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from pydantic import BaseModel
+from datetime import datetime
 from typing import Optional
 
+import docker
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_validator
+
+from app import services
 from app.core.rate_limiter import limiter
-from app.core.config import settings
+from app.core.start_jobs import format_sse
+from app.dependencies import get_current_user
 
 router = APIRouter()
 
 
-class ContainerStartRequest(BaseModel):
-    """Request model for starting a container"""
-    user_id: str
-    image: str = "python:3.11-slim"
-    flag: str
+class MissionStartRequest(BaseModel):
+    challenge_id: str
+    
+    @field_validator('challenge_id')
+    @classmethod
+    def validate_challenge_id(cls, v):
+        """challenge_idのバリデーション"""
+        if not v or (isinstance(v, str) and v.strip() == ""):
+            raise ValueError("challenge_id is required and cannot be empty")
+        return str(v).strip()
+    
+    class Config:
+        # フィールド名のエイリアスを許可
+        populate_by_name = True
+
+class MissionStartResponse(BaseModel):
+    status: str
+    container_id: str
+    port: int
+    url: str
+    message: str
+    challenge_name: Optional[str] = None
 
 
-class ContainerStartResponse(BaseModel):
-    """Response model for container start"""
+class StartJobResponse(BaseModel):
+    job_id: str
     status: str
-    container_id: Optional[str] = None
-    port: Optional[int] = None
-    message: Optional[str] = None
+    phase: Optional[str] = None
+    events_url: str
 
 
-@router.post("/start", response_model=ContainerStartResponse)
-@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
-async def start_container(
+@router.post("/start", status_code=202, response_model=StartJobResponse)
+@router.post("/start/jobs", status_code=202, response_model=StartJobResponse)
+@limiter.limit("5/minute")  # Rate Limit: 5回/分（2つのパスで共通）
+async def create_start_job(
+    mission_request: MissionStartRequest,
     request: Request,
-    data: ContainerStartRequest
+    current_user: dict = Depends(get_current_user)
 ):
     """
-    Start a new container for a mission (Rate Limited: 5 req/min)
+    コンテナ起動ジョブを作成し、ジョブIDを即時に返す（202）
+    
+    [Atomic Startup Strategy]
+    1. challenge_idからSupabaseで問題情報を取得
+    2. コンテナ起動 (CONTAINER_PORT_RANGE から割り当てたポートに明示的に公開)
+    3. Docker events の start イベントで起動確認、TCP/ヘルスチェックで起動待ち
+    4. 成功なら ready イベントで情報を返す / 失敗なら完全削除して error イベント
+    
+    ウォームプール（WARM_POOL_SIZES）が有効な問題は起動済みコンテナを即時に割り当てる。
+    起動はバックグラウンドで進み、リクエストは起動完了を待たない。進捗は events_url の SSE で受け取る
+    （queued → pulling → creating → port_bound → healthy → ready、失敗時は error）。
+    同じ問題の起動ジョブが進行中ならそのジョブを返す。
+    /api/containers/start/jobs は同じエンドポイントの別名。
+    
+    Requires: Authentication (JWT Bearer Token)
     """
-    docker_manager = request.app.state.docker_manager
+    user_id = current_user["id"]
+    challenge_id = mission_request.challenge_id
     
-    try:
-        result = await docker_manager.start_container(
-            user_id=data.user_id,
-            image=data.image,
-            flag=data.flag
-        )
-        return ContainerStartResponse(**result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    print(f"[INFO] Received mission start request: challenge_id={challenge_id}, user_id={user_id}")
+    
+    if not challenge_id or challenge_id.strip() == "":
+        raise HTTPException(status_code=422, detail="challenge_id is required and cannot be empty")
+    
+    job = services.start_jobs.submit(
+        user_id,
+        challenge_id,
+        lambda report: services.provision_mission(user_id, challenge_id, report),
+    )
+    return {
+        "job_id": job.id,
+        "status": "accepted",
+        "phase": job.phase,
+        "events_url": f"/api/containers/start/jobs/{job.id}/events",
+    }
 
 
-@router.post("/stop/{container_id}")
-@limiter.limit(f"{settings.RATE_LIMIT_PER_MINUTE}/minute")
-async def stop_container(
+def get_owned_job(job_id: str, user_id: str):
+    """自分の起動ジョブのみ返す（他ユーザーのジョブは存在しない扱いで 404）"""
+    job = services.start_jobs.get_owned(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Start job not found")
+    return job
+
+
+@router.get("/start/jobs/{job_id}")
+async def get_start_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    起動ジョブの現在の状態と、これまでの進捗イベント
+    
+    Requires: Authentication (JWT Bearer Token)
+    """
+    return get_owned_job(job_id, current_user["id"]).snapshot()
+
+
+@router.get("/start/jobs/{job_id}/events")
+async def stream_start_job(
+    job_id: str,
     request: Request,
-    container_id: str
+    current_user: dict = Depends(get_current_user)
 ):
     """
-    Stop and remove a container (Rate Limited: 5 req/min)
+    起動ジョブの進捗を Server-Sent Events で配信する
+    
+    ready イベントにはコンテナURLが含まれるため、ジョブを作成したユーザーのみ購読できる。
+    EventSource は認証ヘッダーを送れないので、フロントエンドは fetch でストリームを読む。
+    再接続時は Last-Event-ID 以降のイベントから再送し、ready / error で終了する。
+    
+    Requires: Authentication (JWT Bearer Token)
     """
-    docker_manager = request.app.state.docker_manager
+    job = get_owned_job(job_id, current_user["id"])
     
-    success = await docker_manager.stop_container(container_id)
-    if not success:
-        raise HTTPException(status_code=404, detail="Container not found")
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    
+    async def event_stream():
+        yield "retry: 2000\n\n"
+        async for index, event in job.follow(start):
+            if await request.is_disconnected():
+                return
+            yield format_sse(index, event)
     
-    return {"status": "success", "message": "Container stopped"}
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
+@router.get("/queue")
+async def start_queue_status(
+    challenge_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    起動待ちキューでの位置と推定待ち時間
+    
+    POST /api/containers/start が容量待ちの間にポーリングする想定（レート制限なし）。
+    """
+    status = services.admission.queue_status(f"start:{current_user['id']}:{challenge_id}")
+    if status is None:
+        return {"status": "not_queued"}
+    return {"status": "queued", **status}
 
+
+@router.post("/stop")
+@limiter.limit("5/minute")  # Rate Limit: 5回/分 (PROJECT_MASTER.md 4.4準拠)
+async def stop_container(
+    container_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)  # 認証必須
+):
+    """
+    コンテナ停止API
+    
+    自分のセッションに属するコンテナのみ停止できる（他人のcontainer_idは404）。
+    
+    Requires: Authentication (JWT Bearer Token)
+    Rate Limit: 5 requests/minute
+    """
+    session = services.session_registry.get_by_container(container_id)
+    if session is None and services.shared_instances is not None:
+        # 共有インスタンスはコンテナを止めず、ユーザーの割り当てだけを解除する
+        shared = services.shared_instances.find(container_id)
+        if shared is not None:
+            services.shared_instances.release(shared[0], current_user["id"])
+            return {"status": "released", "id": container_id}
+    if session is None or session.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Container not found")
+    
+    try:
+        stopped = await services.sessions.stop(session)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to stop container: {str(e)}")
+    if not stopped:
+        raise HTTPException(status_code=404, detail="Container not found")
+    return {"status": "deleted", "id": container_id}
+
+
+@router.post("/extend")
+@limiter.limit("5/minute")
+async def extend_container(
+    container_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    コンテナ有効期限の延長API
+    
+    期限を「現在時刻 + CONTAINER_TTL_MINUTES」に再設定する（短くはならない）。
+    自分のセッションに属するコンテナのみ延長できる（他人のcontainer_idは404）。
+    アイドル検出で pause 中のコンテナは再開する。
+    
+    Requires: Authentication (JWT Bearer Token)
+    Rate Limit: 5 requests/minute
+    """
+    session = services.session_registry.get_by_container(container_id)
+    if session is None or session.user_id != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Container not found")
+    
+    try:
+        # 延長後の期限はDBにも保存する（再起動時の復元で元の期限のまま削除しない）
+        deadline = await services.sessions.extend(session)
+    except docker.errors.DockerException as e:
+        raise HTTPException(status_code=500, detail=f"Failed to resume container: {str(e)}")
+    
+    return {
+        "status": "extended",
+        "id": container_id,
+        "expires_at": datetime.utcfromtimestamp(deadline).isoformat() + "Z",
+    }
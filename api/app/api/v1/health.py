@@ -0,0 +1,101 @@
+"""
+Health check and metrics endpoints
+"""
+
+from datetime import datetime
+
+import anyio
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, Response
+
+from app import services
+from app.core import metrics
+from app.core.config import settings
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def health_check():
+    """
+    監視用ヘルスチェック (Ver 10.2準拠)
+    
+    依存チェックは HEALTH_CACHE_SECONDS 秒キャッシュされ、バックグラウンドで更新される。
+    
+    Returns:
+        {
+            "status": "ok",
+            "system_version": "10.2",
+            "dependencies": {
+                "database": "connected" | "disconnected",
+                "docker": "connected" | "disconnected"
+            },
+            "timestamp": "ISO8601_STRING"
+        }
+    """
+    results = await services.health_monitor.get()
+    
+    return {
+        "status": "ok",
+        "system_version": "10.2",
+        "dependencies": {name: result["status"] for name, result in results.items()},
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }
+
+@router.get("/health/live")
+async def liveness_check():
+    """軽量な生存確認（依存サービスには問い合わせない）"""
+    return {"status": "ok"}
+
+@router.get("/health/ready")
+async def readiness_check():
+    """
+    詳細な準備状態チェック（依存サービスごとの状態とレイテンシ）
+    
+    いずれかの依存サービスが disconnected の場合は 503 を返す。
+    """
+    results = await services.health_monitor.get()
+    ready = all(result["status"] == "connected" for result in results.values())
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "system_version": "10.2",
+            "dependencies": results,
+            "timestamp": datetime.utcnow().isoformat() + "Z"
+        }
+    )
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus形式のメトリクス（ワーカーごとの値）
+    
+    ゲージ（問題別の実行中コンテナ数・ウォームプール深さ・スレッドプール使用率）はスクレイプ時に更新する。
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    metrics.RUNNING_CONTAINERS.clear()
+    for session in services.session_registry.all():
+        metrics.RUNNING_CONTAINERS.inc(challenge_id=session.challenge_id)
+    metrics.PAUSED_CONTAINERS.set(len(services.session_registry) - len(services.session_registry.active()))
+    metrics.WARM_POOL_IDLE.clear()
+    if services.warm_pool is not None:
+        for challenge_id, stats in services.warm_pool.stats().items():
+            metrics.WARM_POOL_IDLE.set(stats["idle"], challenge_id=challenge_id)
+    admission_stats = services.admission.stats()
+    metrics.ADMISSION_QUEUE_DEPTH.set(admission_stats["queue_depth"])
+    metrics.ADMISSION_RESERVED.set(admission_stats["cpu_reserved"], resource="cpu")
+    metrics.ADMISSION_RESERVED.set(admission_stats["memory_reserved"], resource="memory_bytes")
+    if services.node_pool is not None:
+        for node in services.node_pool:
+            metrics.NODE_RUNNING_CONTAINERS.set(node.running, node=node.name)
+            metrics.NODE_START_LATENCY.set(node.start_latency, node=node.name)
+    limiter_tokens = anyio.to_thread.current_default_thread_limiter()
+    metrics.THREADPOOL_IN_USE.set(limiter_tokens.borrowed_tokens, pool="anyio")
+    metrics.THREADPOOL_SIZE.set(limiter_tokens.total_tokens, pool="anyio")
+    metrics.THREADPOOL_IN_USE.set(services.docker_executor.in_flight, pool="docker")
+    metrics.THREADPOOL_SIZE.set(services.docker_executor.max_workers, pool="docker")
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,127 @@
+"""
+Reverse proxy routes to mission containers (by path and by subdomain)
+"""
+
+import docker
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+
+from app import services
+from app.core import metrics
+from app.core.config import settings
+from app.core.proxy import UpstreamError, hostname, token_from_host
+
+router = APIRouter()
+
+PROXY_METHODS = ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+
+def _raw_path(request: Request) -> str:
+    """エンコードされたままのリクエストパス（%2F などを upstream にそのまま渡す）"""
+    raw_path = request.scope.get("raw_path")
+    return raw_path.decode("latin-1") if raw_path else request.url.path
+
+
+async def proxy_to_session(request: Request, token: str, path: str, prefix: str = "") -> Response:
+    """
+    トークンのセッションへリクエストを転送し、レスポンスをストリーミングで返す
+    
+    pause 中のコンテナは再開してから転送する。転送先が未確定（ウォームプール）なら inspect で解決する。
+    共有インスタンスのトークンはユーザーに割り当てたレプリカへ転送する。
+    レジストリにないトークンは 404（レジストリは起動時に復元済み）。
+    """
+    if not services.PROXY_ENABLED:
+        raise HTTPException(status_code=404, detail="Mission session not found")
+    session = services.session_registry.get_by_token(token)
+    replica = services.shared_instances.route_token(token) if session is None and services.shared_instances is not None else None
+    if session is None and replica is None:
+        raise HTTPException(status_code=404, detail="Mission session not found")
+    try:
+        if replica is not None:
+            if replica.upstream is None:
+                replica.upstream = await services.docker_executor.run(services.sessions.resolve_upstream, replica.container.id, replica.port)
+            key, upstream = replica.container.id, replica.upstream
+        else:
+            if session.paused:
+                await services.sessions.resume(session)
+            if session.upstream is None:
+                session.upstream = await services.docker_executor.run(services.sessions.resolve_upstream, session.container_id, session.port)
+            key, upstream = session.container_id, session.upstream
+    except docker.errors.DockerException as e:
+        raise HTTPException(status_code=502, detail=f"Mission container is not available: {str(e)}")
+    
+    try:
+        status, headers, body = await services.reverse_proxy.forward(
+            key,
+            upstream,
+            request.method,
+            path,
+            request.url.query,
+            request.headers.raw,
+            request.stream(),
+            forwarded={
+                "for": request.client.host if request.client else "",
+                "proto": request.url.scheme,
+                "host": request.headers.get("host", ""),
+            },
+            prefix=prefix,
+        )
+    except UpstreamError as e:
+        metrics.PROXY_REQUESTS.inc(status=str(e.status_code))
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    metrics.PROXY_REQUESTS.inc(status=str(status))
+    response = StreamingResponse(body, status_code=status)
+    response.raw_headers = headers
+    return response
+
+
+def require_proxy_host(request: Request) -> None:
+    """パス方式のプロキシは PROXY_PUBLIC_URL のホスト宛てのリクエストにだけ応答する"""
+    if services.PROXY_PATH_HOST is None or hostname(request.headers.get("host", "")) != services.PROXY_PATH_HOST:
+        raise HTTPException(status_code=404, detail="Mission session not found")
+
+
+@router.api_route(settings.PROXY_PATH_PREFIX + "/{token}/{path:path}", methods=PROXY_METHODS, include_in_schema=False)
+async def proxy_by_path(token: str, path: str, request: Request):
+    """
+    PROXY_PATH_PREFIX/{token}/... をセッションのコンテナへ転送する
+    
+    トークンは推測不能な値のため認証ヘッダーなしでアクセスできる（ブラウザから直接開くURL）。
+    絶対パスのリダイレクトには PROXY_PATH_PREFIX/{token} を付け直す。
+    PROXY_PUBLIC_URL のホスト以外（API・フロントエンドのオリジン）宛ては 404。
+    """
+    require_proxy_host(request)
+    mount = f"{settings.PROXY_PATH_PREFIX}/{token}"
+    return await proxy_to_session(request, token, _raw_path(request)[len(mount):] or "/", prefix=mount)
+
+
+@router.api_route(settings.PROXY_PATH_PREFIX + "/{token}", methods=PROXY_METHODS, include_in_schema=False)
+async def proxy_by_path_root(token: str, request: Request):
+    """末尾スラッシュなしは相対リンクが壊れるため /{token}/ へリダイレクト"""
+    require_proxy_host(request)
+    query = f"?{request.url.query}" if request.url.query else ""
+    return RedirectResponse(f"{settings.PROXY_PATH_PREFIX}/{token}/{query}", status_code=307)
+
+
+async def route_session_subdomain(request: Request, call_next):
+    """
+    {token}.PROXY_DOMAIN 宛てのリクエストは API のルートを通さずコンテナへ転送する
+    
+    パス方式のホスト（PROXY_PUBLIC_URL）宛ては PROXY_PATH_PREFIX 配下以外を 404 にする
+    （問題のJSから同一オリジンで API を呼べないようにする）。
+    app.main で HTTP ミドルウェアとして登録する。
+    """
+    host = request.headers.get("host", "")
+    token = token_from_host(host, settings.PROXY_DOMAIN)
+    if token is None:
+        if (
+            services.PROXY_PATH_HOST is not None
+            and hostname(host) == services.PROXY_PATH_HOST
+            and not request.url.path.startswith(settings.PROXY_PATH_PREFIX + "/")
+        ):
+            return JSONResponse(status_code=404, content={"detail": "Not Found"})
+        return await call_next(request)
+    try:
+        return await proxy_to_session(request, token, _raw_path(request))
+    except HTTPException as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
@@ -0,0 +1,32 @@
+"""
+Scoreboard endpoint
+"""
+
+from fastapi import APIRouter, Depends
+
+from app import services
+from app.core.config import settings
+from app.dependencies import get_current_user
+
+router = APIRouter()
+
+
+@router.get("/scoreboard")
+def get_scoreboard(
+    limit: int = 10,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    スコアボード（上位 limit 人と自分の順位）
+    
+    メモリ上の順位表から上位を切り出すだけで、submission_logs は参照しない。
+    同点の場合は最後の正解が早いユーザーが上位。
+    
+    Requires: Authentication (JWT Bearer Token)
+    """
+    limit = max(1, min(limit, settings.SCOREBOARD_MAX_LIMIT))
+    return {
+        "entries": services.scoreboard.top(limit),
+        "total_players": len(services.scoreboard),
+        "me": services.scoreboard.rank_of(current_user["id"]),
+    }
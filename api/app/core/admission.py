@@ -0,0 +1,278 @@
+"""
+Capacity-aware admission control for mission container starts
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_MEMORY_UNITS = {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# OPS_MANUAL.md のパイプライン状態のうち、新規コンテナを止める状態
+BLOCKING_STATES = {"THROTTLED", "FROZEN"}
+
+
+def parse_memory(value: str) -> int:
+    """Docker style memory size ("128m", "1g", "512k", bytes) -> bytes"""
+    value = str(value).strip().lower()
+    if value and value[-1] in _MEMORY_UNITS:
+        return int(float(value[:-1]) * _MEMORY_UNITS[value[-1]])
+    return int(value)
+
+
+def host_memory_bytes() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+class AdmissionRejected(Exception):
+    """Start refused without queueing (maps to 503 + Retry-After)"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+@dataclass
+class _Reservation:
+    cpu: float
+    memory: int
+    granted_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Waiter:
+    key: str
+    user_id: str
+    cpu: float
+    memory: int
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdmissionController:
+    """
+    Tracks CPU / memory reserved by mission containers against a host budget.
+
+    ``acquire()`` admits immediately when the request fits and nobody is
+    waiting; otherwise it waits in a fair queue (round-robin across users,
+    FIFO within a user). A full queue or a blocking pipeline state
+    (THROTTLED / FROZEN) rejects fast with ``AdmissionRejected``.
+
+    Reservations are keyed by an arbitrary string (a pending start, then the
+    container id via ``transfer()``) and must be ``release()``d when the
+    container is removed. Event-loop only; budgets are per process.
+    """
+
+    def __init__(
+        self,
+        cpu_budget: float,
+        memory_budget: int,
+        max_queue_depth: int = 50,
+        default_hold_seconds: float = 300.0,
+    ):
+        self.cpu_budget = cpu_budget
+        self.memory_budget = memory_budget
+        self.max_queue_depth = max_queue_depth
+        self.state = "NORMAL"
+        self._reservations: Dict[str, _Reservation] = {}
+        self._reserved_cpu = 0.0
+        self._reserved_memory = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+        self._avg_hold = default_hold_seconds
+        self.admitted = 0
+        self.rejected = 0
+
+    # --- State ---
+
+    @property
+    def blocked(self) -> bool:
+        return self.state in BLOCKING_STATES
+
+    def set_state(self, state: str) -> None:
+        """Apply an OPS_MANUAL pipeline state; blocking states fail queued starts"""
+        self.state = state.upper()
+        if self.blocked:
+            for queue in list(self._queues.values()):
+                for waiter in list(queue):
+                    self._remove_waiter(waiter)
+                    if not waiter.future.done():
+                        waiter.future.set_exception(self._blocked_error())
+        else:
+            self._pump()
+        logger.info(f"Admission state set to {self.state}")
+
+    def _blocked_error(self) -> AdmissionRejected:
+        return AdmissionRejected(f"New containers are blocked (state: {self.state})", retry_after=300)
+
+    def fits(self, cpu: float, memory: int) -> bool:
+        return (
+            self._reserved_cpu + cpu <= self.cpu_budget + 1e-9
+            and self._reserved_memory + memory <= self.memory_budget
+        )
+
+    # --- Reservations ---
+
+    def _grant(self, key: str, cpu: float, memory: int) -> None:
+        self._reservations[key] = _Reservation(cpu, memory)
+        self._reserved_cpu += cpu
+        self._reserved_memory += memory
+        self.admitted += 1
+
+    def reserve(self, key: str, cpu: float, memory: int) -> None:
+        """Record an existing container regardless of the budget (startup recovery)"""
+        if key not in self._reservations:
+            self._grant(key, cpu, memory)
+
+    def try_reserve(self, key: str, cpu: float, memory: int) -> bool:
+        """Reserve only if it fits and nobody is queued (warm-pool refills yield to users)"""
+        if self.blocked or self._queued or not self.fits(cpu, memory):
+            return False
+        self._grant(key, cpu, memory)
+        return True
+
+    def transfer(self, old_key: str, new_key: str) -> None:
+        reservation = self._reservations.pop(old_key, None)
+        if reservation is not None:
+            self._reservations[new_key] = reservation
+
+    def resize(self, key: str, cpu: float) -> None:
+        """Change the CPU held by ``key`` (paused containers give theirs back); may exceed the budget"""
+        reservation = self._reservations.get(key)
+        if reservation is None:
+            return
+        self._reserved_cpu = max(0.0, self._reserved_cpu - reservation.cpu + cpu)
+        reservation.cpu = cpu
+        self._pump()
+
+    def release(self, key: str) -> None:
+        reservation = self._reservations.pop(key, None)
+        if reservation is None:
+            return
+        self._reserved_cpu = max(0.0, self._reserved_cpu - reservation.cpu)
+        self._reserved_memory = max(0, self._reserved_memory - reservation.memory)
+        hold = time.monotonic() - reservation.granted_at
+        self._avg_hold = 0.8 * self._avg_hold + 0.2 * hold
+        self._pump()
+
+    # --- Queue ---
+
+    async def acquire(self, key: str, user_id: str, cpu: float, memory: int, timeout: float) -> None:
+        """
+        Reserve capacity for ``key``, waiting in the fair queue if needed.
+
+        Raises:
+            AdmissionRejected: blocked state, queue full, or not admitted within ``timeout``
+        """
+        if self.blocked:
+            self.rejected += 1
+            raise self._blocked_error()
+        if key in self._reservations:
+            return
+        if not self._queued and self.fits(cpu, memory):
+            self._grant(key, cpu, memory)
+            return
+        if self._queued >= self.max_queue_depth:
+            self.rejected += 1
+            raise AdmissionRejected("Start queue is full", retry_after=self._eta(self._queued + 1))
+
+        waiter = _Waiter(key, user_id, cpu, memory, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(user_id, deque()).append(waiter)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.exception():
+                return
+            position = self.position(key)
+            self._remove_waiter(waiter)
+            self.rejected += 1
+            raise AdmissionRejected(
+                "Host is at capacity; start was not admitted in time",
+                retry_after=self._eta(position or 1),
+            )
+        except asyncio.CancelledError:
+            # 許可と同時にキャンセルされた場合は確保した枠を返す
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release(key)
+            raise
+        finally:
+            if not waiter.future.done():
+                self._remove_waiter(waiter)
+                waiter.future.cancel()
+
+    def _remove_waiter(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.user_id)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._queued -= 1
+        if not queue:
+            del self._queues[waiter.user_id]
+
+    def _pump(self) -> None:
+        """Admit queued starts in round-robin user order while they fit"""
+        while self._queues and not self.blocked:
+            user_id, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if waiter.future.done():
+                self._remove_waiter(waiter)
+                continue
+            if not self.fits(waiter.cpu, waiter.memory):
+                break  # 先頭を飛ばさない（大きな要求の飢餓を防ぐ）
+            queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            self._grant(waiter.key, waiter.cpu, waiter.memory)
+            waiter.future.set_result(True)
+
+    def position(self, key: str) -> Optional[int]:
+        """1-based position in admission order, or None if not queued"""
+        users = list(self._queues.items())
+        for user_index, (_, queue) in enumerate(users):
+            for depth, waiter in enumerate(queue):
+                if waiter.key != key:
+                    continue
+                ahead = sum(min(len(q), depth) for _, q in users)
+                ahead += sum(1 for _, q in users[:user_index] if len(q) > depth)
+                return ahead + 1
+        return None
+
+    def _eta(self, position: int) -> int:
+        """Seconds until ``position`` is admitted, assuming running containers free up evenly"""
+        running = max(1, len(self._reservations))
+        return int(math.ceil(position * self._avg_hold / running))
+
+    def queue_status(self, key: str) -> Optional[dict]:
+        position = self.position(key)
+        if position is None:
+            return None
+        return {"position": position, "eta_seconds": self._eta(position), "queue_depth": self._queued}
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "cpu_budget": self.cpu_budget,
+            "cpu_reserved": round(self._reserved_cpu, 3),
+            "memory_budget": self.memory_budget,
+            "memory_reserved": self._reserved_memory,
+            "reservations": len(self._reservations),
+            "queue_depth": self._queued,
+            "max_queue_depth": self.max_queue_depth,
+            "avg_hold_seconds": round(self._avg_hold, 1),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,97 @@
+"""
+In-memory challenge catalog cache with TTL and explicit invalidation
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogSnapshot:
+    """Prepared catalog (sorted, placeholders substituted) plus validators"""
+    items: List[dict]
+    etag: str
+    last_modified: datetime
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class CatalogCache:
+    """
+    Holds the prepared challenge list for ``ttl_seconds``.
+
+    ``loader`` is only called when the snapshot is missing, expired or has been
+    invalidated; concurrent callers wait for a single reload.
+    """
+
+    def __init__(self, ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _compute_etag(items: List[dict]) -> str:
+        payload = json.dumps(items, sort_keys=True, ensure_ascii=False, default=str)
+        return 'W/"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        return snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl_seconds
+
+    def get(self, loader: Callable[[], List[dict]]) -> CatalogSnapshot:
+        """Return the cached snapshot, reloading through ``loader`` if stale"""
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                return snapshot
+
+            items = loader()
+            etag = self._compute_etag(items)
+            # 内容が変わっていなければ Last-Modified を維持（クライアントの再検証を有効に保つ）
+            if snapshot is not None and snapshot.etag == etag:
+                last_modified = snapshot.last_modified
+            else:
+                last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            self._snapshot = CatalogSnapshot(items=items, etag=etag, last_modified=last_modified)
+            logger.info(f"Challenge catalog reloaded: {len(items)} items ({etag})")
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next request reloads from the database"""
+        with self._lock:
+            if self._snapshot is not None:
+                # 再読込時に Last-Modified を比較できるよう期限切れ扱いにする
+                self._snapshot.loaded_at = float("-inf")
+        logger.info("Challenge catalog cache invalidated")
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, last_modified: datetime) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since against the current validators.
+
+    ``headers`` is any case-insensitive mapping (e.g. ``request.headers``);
+    If-Modified-Since is only consulted when If-None-Match is absent.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
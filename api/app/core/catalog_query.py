@@ -0,0 +1,101 @@
+"""
+Field projection and cursor pagination over the cached challenge catalog
+"""
+
+import base64
+import bisect
+import hashlib
+import json
+from typing import List, Optional, Tuple
+
+# カタログ項目のフィールド（challenge_id は常に返す）
+CATALOG_FIELDS = (
+    "challenge_id", "title", "description", "difficulty", "category",
+    "points", "has_writeup", "writeup", "solved",
+)
+# 一覧の既定: 最大のフィールドである writeup は詳細エンドポイントでのみ返す
+LIST_FIELDS = tuple(f for f in CATALOG_FIELDS if f != "writeup")
+
+
+def sort_key(item: dict) -> Tuple[bool, int, str]:
+    """Catalog order: points ascending (None last), then challenge id"""
+    points = item.get("points")
+    return (points is None, points or 0, item.get("challenge_id") or "")
+
+
+def parse_fields(value: Optional[str]) -> Tuple[str, ...]:
+    """
+    ``fields=title,points`` -> ("challenge_id", "title", "points").
+
+    Raises:
+        ValueError: unknown field name
+    """
+    if not value:
+        return LIST_FIELDS
+    requested = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in CATALOG_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(CATALOG_FIELDS)})")
+    return ("challenge_id",) + tuple(dict.fromkeys(f for f in requested if f != "challenge_id"))
+
+
+def variant_etag(
+    etag: str,
+    fields: Tuple[str, ...],
+    cursor: Optional[str],
+    limit: Optional[int],
+    encoding: Optional[str],
+) -> str:
+    """
+    ETag for one representation of the catalog: the projection, page and
+    Content-Encoding all change the body, so each gets its own validator.
+    ``encoding`` is the encoding actually applied (None when the body is sent
+    uncompressed), not merely the one the client accepts.
+    """
+    if fields == LIST_FIELDS and cursor is None and limit is None and encoding is None:
+        return etag
+    variant = json.dumps([list(fields), cursor, limit, encoding], separators=(",", ":")).encode("utf-8")
+    digest = hashlib.blake2s(variant, digest_size=6).hexdigest()
+    return f'{etag[:-1]}-{digest}"'
+
+
+def encode_cursor(item: dict) -> str:
+    """Opaque cursor pointing just after ``item``"""
+    raw = json.dumps(list(sort_key(item)), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[bool, int, str]:
+    """
+    Raises:
+        ValueError: malformed cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        is_none, points, challenge_id = json.loads(raw)
+        return (bool(is_none), int(points), str(challenge_id))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def paginate(items: List[dict], cursor: Optional[str], limit: Optional[int]) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of ``items`` (already in catalog order) after ``cursor``.
+
+    Cursors carry the sort key of the last item rather than an offset, so
+    a catalog reload between pages neither repeats nor skips challenges.
+    Returns (page, next cursor or None).
+    """
+    start = 0
+    if cursor:
+        start = bisect.bisect_right([sort_key(item) for item in items], decode_cursor(cursor))
+    end = len(items) if limit is None else min(len(items), start + limit)
+    page = items[start:end]
+    next_cursor = encode_cursor(page[-1]) if page and end < len(items) else None
+    return page, next_cursor
+
+
+def project(items: List[dict], fields: Tuple[str, ...]) -> List[dict]:
+    if fields == CATALOG_FIELDS:
+        return items
+    return [{f: item.get(f) for f in fields} for item in items]
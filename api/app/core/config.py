@@ -3,7 +3,7 @@ Application configuration
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -18,25 +18,132 @@ class Settings(BaseSettings):
     SUPABASE_URL: str = ""
     SUPABASE_KEY: str = ""
     SUPABASE_SERVICE_KEY: str = ""
-    
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 20
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 10
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = 30.0
+
     # Docker
     DOCKER_HOST: str = "unix:///var/run/docker.sock"
+    # 複数の Docker ホストに配置する場合のノード一覧（空 = DOCKER_HOST の1台のみ）
+    # カンマ区切り: "node-a=tcp://10.0.0.11:2375|ctf-a.example.com,node-b=tcp://10.0.0.12:2375|ctf-b.example.com"
+    # "|" の後ろはそのノードの CONTAINER_HOST（コンテナURLのホスト名）
+    DOCKER_NODES: str = ""
+    DOCKER_NODE_MAX_INSTANCES: int = 0  # ノードあたりの起動数上限（0 = メモリ量のみで判定）
+    # ノードのイメージキャッシュ・公開ポートを読み直す間隔（ヘルスチェックとは別の定期ジョブ、0 = 起動時のみ）
+    NODE_INVENTORY_REFRESH_SECONDS: float = 60.0
     
     # Security
     SECRET_KEY: str = "change-me-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
+
+    # Authentication (Supabase JWT)
+    # "local": SUPABASE_JWT_SECRET でローカル検証 / "remote": 毎回 /auth/v1/user に問い合わせ
+    AUTH_VERIFY_MODE: str = "local"
+    AUTH_REMOTE_FALLBACK: bool = True
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    # /auth/v1/user で検証したトークンのキャッシュ秒数の上限（ログアウト・失効はこの秒数以内に反映される）
+    AUTH_REMOTE_CACHE_SECONDS: int = 30
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 5
+    # トークンバケットの保存先（memory:// | sqlite:///path | redis://host:port/db）
+    # API は1プロセスのため既定はプロセス内。複数の API レプリカで共有する場合は redis://
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
+    RATE_LIMIT_KEY_BY: str = "user,ip"  # user / ip のどちらか、または両方
     
     # Container Configuration
     CONTAINER_TTL_MINUTES: int = 30
+    # 期限切れコンテナの並列削除数と、取りこぼし回収（全件走査）の間隔
+    EXPIRY_MAX_CONCURRENCY: int = 4
+    EXPIRY_RECONCILE_MINUTES: int = 30
+    # 通信のないコンテナを docker pause する（0 = 無効）。次の起動・アクセス時に自動で再開
+    IDLE_PAUSE_MINUTES: int = 0
+    IDLE_SAMPLE_INTERVAL_SECONDS: float = 60.0
     CONTAINER_CPU_LIMIT: str = "0.5"
     CONTAINER_MEMORY_LIMIT: str = "128m"
     CONTAINER_PIDS_LIMIT: int = 50
     CONTAINER_NETWORK: str = "ctf_net"
     CONTAINER_INTERNAL_PORT: int = 8000
+    # コンテナを公開するホストポートの範囲（API が空きポートを管理し、明示的に割り当てる）
+    CONTAINER_PORT_RANGE: str = "20000-29999"
+    CONTAINER_START_TIMEOUT_SECONDS: int = 30
+    # 起動後、アプリがTCP接続を受け付ける（またはhealthy）まで待つ
+    CONTAINER_WAIT_READY: bool = True
+    DOCKER_EXECUTOR_WORKERS: int = 8
+    
+    # Reverse proxy（/i/{token}/... または {token}.PROXY_DOMAIN をコンテナの ctf_net IP へ転送）
+    # PROXY_PUBLIC_URL / PROXY_DOMAIN を設定するとコンテナURLはプロキシ経由になる（空 = ホストポート直接）
+    # パス方式の公開URL。フロントエンド・API とは別のホスト名にすること（このホストではプロキシ以外のルートを返さない）
+    PROXY_PUBLIC_URL: str = ""  # 例: "https://play.ctf.example.com"
+    PROXY_DOMAIN: str = ""  # 例: "ctf.example.com"（*.ctf.example.com を API に向ける）
+    PROXY_PATH_PREFIX: str = "/i"
+    PROXY_TOKEN_SECRET: str = ""  # プロキシ有効時は必須（空なら起動失敗。既定値が公開されている SECRET_KEY は使わない）
+    PROXY_MAX_CONNECTIONS: int = 200
+    PROXY_MAX_KEEPALIVE: int = 50
+    PROXY_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    PROXY_READ_TIMEOUT_SECONDS: float = 60.0
+    # コンテナへ転送しない Cookie 名の接頭辞（カンマ区切り、既定は Supabase の認証 Cookie）。Authorization は常に除去
+    PROXY_STRIP_COOKIE_PREFIXES: str = "sb-"
+    
+    # Admission control（ホストの予算内でのみ起動し、超過分は公平なキューで待機）
+    ADMISSION_CPU_BUDGET: float = 0.0  # 0 = ホストのCPU数
+    ADMISSION_MEMORY_BUDGET: str = ""  # 例: "8g"（空 = 物理メモリの80%）
+    ADMISSION_MAX_QUEUE_DEPTH: int = 50  # これを超える待機は 503 + Retry-After で即時拒否
+    ADMISSION_MAX_WAIT_SECONDS: float = 60.0
+    START_JOB_RETENTION_SECONDS: float = 300.0  # 完了した起動ジョブの進捗を保持する時間
+    # OPS_MANUAL.md のパイプライン状態（THROTTLED / FROZEN では新規コンテナを停止）
+    PIPELINE_STATE: str = "NORMAL"
+    
+    # Active sessions
+    SESSION_MAX_PER_USER: int = 3  # ユーザーあたりの同時起動数（0 = 無制限）
+    SESSION_TABLE: str = "active_sessions"
+    
+    # Warm pool (起動済みコンテナのプール)
+    WARM_POOL_DEFAULT_SIZE: int = 0  # 0 = 無効
+    # 問題別サイズ（カンマ区切り: "SOL-MSN-0001=3,SOL-MSN-0002=1"）
+    WARM_POOL_SIZES: str = ""
+    WARM_POOL_FLAG_PATH: str = "/home/ctfuser/flag.txt"
+    WARM_POOL_MAX_AGE_SECONDS: int = 600
+    
+    # Shared instances（mission JSON の environment.instance_mode が "shared" の問題）
+    SHARED_INSTANCE_REPLICAS: int = 2  # 問題ごとのレプリカ数（全プレイヤーで共有）
+    SHARED_INSTANCE_CHECK_SECONDS: float = 30.0  # 停止したレプリカを置き換える間隔
+    
+    # Caching
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    CATALOG_MAX_LIMIT: int = 200  # /api/challenges の limit 上限
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024  # これ以上の一覧・詳細レスポンスを br / gzip 圧縮（0 = 無効）
+    # 正解Flagダイジェストのキャッシュ。Flag 変更（ローテーション）は /api/admin/cache/invalidate で即時反映、
+    # DB を直接書き換えた場合はこの秒数が経つまで旧Flagが有効
+    FLAG_CACHE_TTL_SECONDS: int = 600
+    FLAG_CACHE_PRELOAD: bool = True
+    # 動的Flag（environment.flag_mode が "dynamic" の問題: SolCTF{HMAC(secret, challenge_id|user_id|salt)}）
+    DYNAMIC_FLAGS_ENABLED: bool = False
+    FLAG_HMAC_SECRET: str = ""  # DYNAMIC_FLAGS_ENABLED 時は必須（空なら起動失敗。SECRET_KEY は使わない）
+    FLAG_HMAC_SALT: str = ""  # 変更すると発行済みの動的Flagはすべて無効になる（大会ごとのローテーション用）
+    # /api/admin/cache/invalidate 用の共有トークン（未設定時はエンドポイント無効）
+    CACHE_INVALIDATION_TOKEN: str = ""
+    
+    # Scoreboard（起動時に submission_logs を一括走査し、以降はメモリ上で差分更新）
+    SCOREBOARD_BOOTSTRAP_PAGE_SIZE: int = 1000  # PostgREST の1リクエストあたりの最大行数
+    SCOREBOARD_MAX_LIMIT: int = 100
+    
+    # Health checks
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_CACHE_SECONDS: float = 5.0
+    HEALTH_REFRESH_INTERVAL_SECONDS: float = 5.0  # 0 = バックグラウンド更新なし
+    
+    # Prometheus形式の /metrics
+    METRICS_ENABLED: bool = True
+    
+    # Submission logs (write-behind)
+    SUBMISSION_LOG_BATCH_SIZE: int = 100
+    SUBMISSION_LOG_FLUSH_INTERVAL_MS: int = 500
+    SUBMISSION_LOG_QUEUE_SIZE: int = 10000
+    SUBMISSION_LOG_SPILL_PATH: str = "submission_logs.spill.jsonl"
     
     # CORS (環境変数 CORS_ORIGINS でカンマ区切りで指定、未設定時はワイルドカード)
     CORS_ORIGINS: str = "*"
@@ -44,6 +151,32 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
         case_sensitive = True
+    
+    @property
+    def warm_pool_sizes(self) -> Dict[str, int]:
+        """WARM_POOL_SIZES を {challenge_id: size} に変換"""
+        sizes = {}
+        for item in self.WARM_POOL_SIZES.split(","):
+            challenge_id, sep, size = item.partition("=")
+            if sep and challenge_id.strip() and size.strip().isdigit():
+                sizes[challenge_id.strip()] = int(size.strip())
+        return sizes
+    
+    @property
+    def docker_nodes(self) -> List[Dict[str, str]]:
+        """DOCKER_NODES を [{name, base_url, container_host}] に変換"""
+        nodes = []
+        for item in self.DOCKER_NODES.split(","):
+            name, sep, target = item.partition("=")
+            if not sep or not name.strip() or not target.strip():
+                continue
+            base_url, _, container_host = target.partition("|")
+            nodes.append({
+                "name": name.strip(),
+                "base_url": base_url.strip(),
+                "container_host": container_host.strip(),
+            })
+        return nodes
 
 
 settings = Settings()
@@ -0,0 +1,47 @@
+"""
+Dedicated bounded executor for blocking Docker SDK calls
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class DockerExecutor:
+    """
+    Runs blocking docker-py calls on their own thread pool.
+
+    Keeping Docker work off the shared anyio threadpool means slow container
+    starts cannot starve sync endpoints such as listing or flag submission.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docker")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Calls submitted and not yet finished (queued ones included)"""
+        return self._in_flight
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await ``func(*args, **kwargs)`` executed on the Docker pool"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Docker executor shut down")
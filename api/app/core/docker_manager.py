@@ -2,13 +2,19 @@
 Docker container management with atomic operations
 """
 
+import asyncio
 import docker
 from docker.errors import DockerException, APIError
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
+import io
 import logging
+import tarfile
+import time
 
 from app.core.config import settings
+from app.core.metrics import DOCKER_OPERATION_SECONDS, timed
+from app.core.ports import PortAllocator, is_port_conflict
 
 logger = logging.getLogger(__name__)
 
@@ -16,10 +22,18 @@ logger = logging.getLogger(__name__)
 class DockerManager:
     """Manages Docker containers with atomic startup strategy"""
     
-    def __init__(self):
-        """Initialize Docker client"""
+    def __init__(self, client: Optional[docker.DockerClient] = None, events=None, ports: Optional[PortAllocator] = None):
+        """
+        Initialize Docker client (reuses ``client`` when given)
+        
+        ``events`` is an optional ContainerEventWatcher used to detect the
+        start and readiness without polling. ``ports`` hands out the host
+        ports containers are published to (CONTAINER_PORT_RANGE by default).
+        """
+        self.events = events
+        self.ports = ports or PortAllocator.from_range(settings.CONTAINER_PORT_RANGE)
         try:
-            self.client = docker.from_env()
+            self.client = client or docker.from_env()
             self.client.ping()
             logger.info("Docker client connected successfully")
         except DockerException as e:
@@ -83,15 +97,17 @@ class DockerManager:
         
         container = None
         
+        assigned_port = None
         try:
-            # Atomic startup: Port 0 = Docker assigns available port
+            # Atomic startup: 割り当て範囲のポートに明示的に公開（起動後の問い合わせ不要）
             # CPU制限をnano_cpusに変換（0.5 -> 500000000）
             nano_cpus = int(float(settings.CONTAINER_CPU_LIMIT) * 1000000000)
+            assigned_port = self.ports.allocate()
             
             container = self.client.containers.run(
                 image=image,
                 name=f"ctf_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                ports={'8000/tcp': ('0.0.0.0', 0)},  # Internal port 8000, host port auto
+                ports={'8000/tcp': ('0.0.0.0', assigned_port)},  # Internal port 8000
                 network=settings.CONTAINER_NETWORK,
                 detach=True,
                 remove=False,
@@ -108,10 +124,6 @@ class DockerManager:
                 # Security: No docker.sock mount
             )
             
-            # Reload to get assigned port
-            container.reload()
-            assigned_port = container.ports['8000/tcp'][0]['HostPort']
-            
             # TODO: Save to DB
             # await save_to_db(user_id, container.id, assigned_port)
             
@@ -131,10 +143,160 @@ class DockerManager:
                     logger.warning(f"Rollback: Removed failed container {container.id[:12]}")
                 except:
                     pass
+            if assigned_port is not None:
+                self.ports.release(assigned_port)
             
             logger.error(f"Container startup failed: {e}")
             raise Exception(f"Mission Start Failed: {str(e)}")
     
+    def create_published(self, port_key: str, retries: int = 2, **create_kwargs):
+        """
+        Blocking helper: create and start a container with ``port_key``
+        published on a host port taken from ``ports``.
+        
+        With ``events`` the start watch is registered before starting, so the
+        returned Future[ContainerEndpoint] cannot miss the event (None without
+        ``events``). A port that turns out to be held outside this process
+        stays reserved and the next free port is tried.
+        Returns (container, host_port, started); cleans up on failure.
+        """
+        for attempt in range(retries + 1):
+            host_port = self.ports.allocate()
+            try:
+                with timed(DOCKER_OPERATION_SECONDS, operation="create"):
+                    container = self.client.containers.create(
+                        ports={port_key: ('0.0.0.0', host_port)}, **create_kwargs
+                    )
+            except Exception:
+                self.ports.release(host_port)
+                raise
+            started = self.events.watch_start(container.id, port_key) if self.events is not None else None
+            try:
+                with timed(DOCKER_OPERATION_SECONDS, operation="start"):
+                    container.start()
+                return container, host_port, started
+            except APIError as e:
+                if started is not None:
+                    started.cancel()
+                try:
+                    with timed(DOCKER_OPERATION_SECONDS, operation="remove"):
+                        container.remove(force=True)
+                except Exception:
+                    pass
+                if not is_port_conflict(e):
+                    self.ports.release(host_port)
+                    raise
+                if attempt == retries:
+                    raise
+                logger.warning(f"Host port {host_port} is already in use on the host, trying another port")
+    
+    def create_mission_container(
+        self,
+        image: str,
+        internal_port: int = 8000,
+        environment: Optional[Dict[str, str]] = None,
+        labels: Optional[Dict[str, str]] = None,
+        name: Optional[str] = None,
+    ):
+        """
+        Blocking helper: create and start a mission container with the
+        standard limits, published on a host port from ``ports``.
+        
+        Returns as soon as the container is started: (container, host_port,
+        started) as from ``create_published``.
+        """
+        if not self.client:
+            raise Exception("Docker client not available")
+        
+        nano_cpus = int(float(settings.CONTAINER_CPU_LIMIT) * 1000000000)
+        return self.create_published(
+            f"{internal_port}/tcp",
+            image=image,
+            name=name,
+            network=settings.CONTAINER_NETWORK,
+            detach=True,
+            # Resource Limits (Ver 10.2 Security Standards)
+            mem_limit=settings.CONTAINER_MEMORY_LIMIT,
+            nano_cpus=nano_cpus,
+            pids_limit=settings.CONTAINER_PIDS_LIMIT,
+            # Security Constraints (PROJECT_MASTER.md 5.A準拠)
+            user="ctfuser",
+            security_opt=["no-new-privileges"],
+            environment=environment or {},
+            labels=labels or {},
+        )
+    
+    async def run_mission_container(
+        self,
+        executor,
+        image: str,
+        internal_port: int = 8000,
+        environment: Optional[Dict[str, str]] = None,
+        labels: Optional[Dict[str, str]] = None,
+        name: Optional[str] = None,
+        port_timeout: float = 30.0,
+    ) -> Tuple["docker.models.containers.Container", int]:
+        """
+        Run a mission container and, with ``events``, wait until it accepts
+        connections.
+        
+        Only the create/start calls run on ``executor`` (a DockerExecutor);
+        the start event and readiness probe are awaited on the event loop,
+        so no executor thread is held while the container boots.
+        Returns (container, host_port); removes the container on failure.
+        """
+        container, host_port, started = await executor.run(
+            self.create_mission_container, image, internal_port,
+            environment=environment, labels=labels, name=name,
+        )
+        if started is None:
+            return container, host_port
+        
+        try:
+            endpoint = await asyncio.wait_for(asyncio.wrap_future(started), timeout=port_timeout)
+            if endpoint.ip_address:
+                await asyncio.wrap_future(self.events.wait_ready(
+                    endpoint.ip_address, internal_port, timeout=port_timeout, container_id=container.id
+                ))
+            return container, host_port
+        except (Exception, asyncio.CancelledError):
+            started.cancel()
+            try:
+                await executor.run(self._remove_quietly, container)
+            finally:
+                self.ports.release(host_port)
+            raise
+    
+    @staticmethod
+    def _remove_quietly(container) -> None:
+        try:
+            with timed(DOCKER_OPERATION_SECONDS, operation="remove"):
+                container.remove(force=True)
+        except Exception:
+            pass
+    
+    @staticmethod
+    def write_flag_file(container, flag: str, path: str) -> None:
+        """
+        Blocking helper: write a per-instance flag file into a running container.
+        
+        Uses put_archive, so it works for pre-started containers regardless of
+        the user the challenge process runs as.
+        """
+        directory, _, filename = path.rpartition("/")
+        data = (flag + "\n").encode("utf-8")
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            info = tarfile.TarInfo(name=filename)
+            info.size = len(data)
+            info.mode = 0o444
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+        with timed(DOCKER_OPERATION_SECONDS, operation="put_archive"):
+            written = container.put_archive(directory or "/", buffer.getvalue())
+        if not written:
+            raise Exception(f"Failed to write flag file {path}")
+    
     async def stop_container(self, container_id: str) -> bool:
         """Stop and remove container"""
         if not self.client:
@@ -150,30 +312,45 @@ class DockerManager:
             logger.error(f"Failed to stop container: {e}")
             return False
     
-    async def cleanup_expired_containers(self):
+    def cleanup_expired_containers(self, known_ids: Optional[set] = None) -> int:
         """
-        Cleanup containers older than TTL
+        Reconciliation sweep: remove mission containers older than TTL.
+        
+        Per-instance expiry is driven by ExpiryScheduler; this rare sweep is a
+        safety net for containers it does not know about (``known_ids`` are
+        skipped). Uses the sparse list endpoint so no per-container inspect is
+        needed. Blocking; returns the number of containers removed.
         """
         if not self.client:
-            return
+            return 0
         
+        removed = 0
         try:
-            containers = self.client.containers.list(all=True, filters={"name": "ctf_"})
+            containers = self.client.containers.list(
+                all=True, sparse=True, filters={"label": "sol.challenge_id"}
+            )
             ttl = timedelta(minutes=settings.CONTAINER_TTL_MINUTES)
             now = datetime.now()
+            known_ids = known_ids or set()
             
             for container in containers:
-                # Check creation time
+                if container.id in known_ids:
+                    continue
+                # Check creation time (sparse attrs carry a unix timestamp)
                 created = datetime.fromtimestamp(container.attrs['Created'])
                 if now - created > ttl:
                     try:
-                        container.stop()
-                        container.remove()
+                        container.remove(force=True)
+                        removed += 1
+                        for binding in container.attrs.get('Ports') or []:
+                            if binding.get('PublicPort'):
+                                self.ports.release(int(binding['PublicPort']))
                         logger.info(f"Cleaned up expired container: {container.id[:12]}")
                     except Exception as e:
                         logger.error(f"Failed to cleanup container: {e}")
         except Exception as e:
             logger.error(f"Cleanup expired containers failed: {e}")
+        return removed
     
     async def cleanup_all_containers(self):
         """Cleanup all ctf containers (shutdown)"""
@@ -0,0 +1,45 @@
+"""
+Stateless per-instance flags derived with HMAC (environment.flag_mode "dynamic")
+"""
+
+import hashlib
+import hmac
+from typing import Optional
+
+FLAG_MODES = ("static", "dynamic")
+FLAG_PREFIX = "SolCTF{"
+DIGEST_LENGTH = 32  # hex 文字数（128 bit）
+
+
+def parse_flag_mode(value: Optional[str]) -> str:
+    """Mission JSON ``environment.flag_mode`` -> "static" | "dynamic" (unknown = static)"""
+    mode = (value or "").strip().lower()
+    return mode if mode in FLAG_MODES else "static"
+
+
+class DynamicFlags:
+    """
+    Derives ``SolCTF{HMAC-SHA256(secret, challenge_id|user_id|salt)}`` per
+    user and challenge.
+
+    The flag is injected when the user's container starts and verified by
+    recomputing it, so no flag needs to be stored or looked up. Changing
+    ``salt`` (e.g. per event) invalidates every flag handed out before.
+    """
+
+    def __init__(self, secret: bytes, salt: str = ""):
+        self.secret = secret
+        self.salt = salt
+
+    def derive(self, challenge_id: str, user_id: str) -> str:
+        message = f"{challenge_id}|{user_id}|{self.salt}".encode("utf-8")
+        digest = hmac.new(self.secret, message, hashlib.sha256).hexdigest()[:DIGEST_LENGTH]
+        return f"{FLAG_PREFIX}{digest}}}"
+
+    def verify(self, challenge_id: str, user_id: str, submitted_flag: str) -> bool:
+        """Constant-time check of a submission against the user's derived flag"""
+        submitted = submitted_flag.strip()
+        # 形式が違うものは HMAC を計算しない
+        if not submitted.startswith(FLAG_PREFIX) or len(submitted) != len(FLAG_PREFIX) + DIGEST_LENGTH + 1:
+            return False
+        return hmac.compare_digest(self.derive(challenge_id, user_id).encode(), submitted.encode("utf-8"))
@@ -0,0 +1,82 @@
+"""
+Fast JSON encoding and response compression (orjson / brotli when installed)
+"""
+
+import gzip
+import json
+from typing import Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # 未導入時は標準 json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未導入時は gzip のみ
+    brotli = None
+
+
+def dumps(payload) -> bytes:
+    """Compact UTF-8 JSON (orjson when available, ~10x faster than json.dumps)"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported Content-Encoding for an Accept-Encoding header ("br" > "gzip" > None)"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def negotiate_encoding(size: int, accept_encoding: Optional[str], min_size: int) -> Optional[str]:
+    """
+    Content-Encoding actually applied to a ``size``-byte body: None below
+    ``min_size`` bytes (0 = never compress) or when the client accepts
+    neither br nor gzip.
+    """
+    if min_size <= 0 or size < min_size:
+        return None
+    return choose_encoding(accept_encoding)
+
+
+def apply_encoding(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    """Compress ``body`` with ``encoding`` (None = as is); returns (body, extra headers)"""
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def encode_json(payload, accept_encoding: Optional[str], min_size: int) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialise ``payload`` and compress it when it is at least ``min_size``
+    bytes (0 = never) and the client accepts br / gzip. Returns
+    (body, extra headers).
+    """
+    body = dumps(payload)
+    return apply_encoding(body, negotiate_encoding(len(body), accept_encoding, min_size))
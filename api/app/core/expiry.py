@@ -0,0 +1,116 @@
+"""
+Deadline-driven container expiry (priority queue instead of periodic scans)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Keeps container expiry deadlines in a min-heap.
+
+    A single task sleeps until the earliest deadline (or until an earlier one
+    is scheduled) and tears expired instances down concurrently, with at most
+    ``max_concurrency`` teardowns in flight. Deadlines use ``time.time()``.
+    Rescheduling (TTL extension) pushes a new entry; stale heap entries are
+    skipped lazily.
+    """
+
+    def __init__(self, on_expire: Callable[[str], Awaitable[None]], max_concurrency: int = 4):
+        self.on_expire = on_expire
+        self.max_concurrency = max_concurrency
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._teardowns: set = set()
+
+    def schedule(self, container_id: str, deadline: float) -> None:
+        """Set (or move) the expiry deadline of ``container_id``"""
+        self._deadlines[container_id] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), container_id))
+        if self._wakeup is not None and self._heap[0][2] == container_id:
+            self._wakeup.set()
+
+    def cancel(self, container_id: str) -> None:
+        """Forget a container (stopped by the user); its heap entry goes stale"""
+        self._deadlines.pop(container_id, None)
+
+    def deadline_for(self, container_id: str) -> Optional[float]:
+        return self._deadlines.get(container_id)
+
+    def scheduled_ids(self) -> set:
+        return set(self._deadlines)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Expiry scheduler started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._teardowns:
+            await asyncio.gather(*self._teardowns, return_exceptions=True)
+        logger.info("Expiry scheduler stopped")
+
+    def _pop_expired(self, now: float) -> List[str]:
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, container_id = heapq.heappop(self._heap)
+            if self._deadlines.get(container_id) == deadline:
+                del self._deadlines[container_id]
+                expired.append(container_id)
+        return expired
+
+    def _next_delay(self, now: float) -> Optional[float]:
+        # 古いエントリ（延長・キャンセル済み）を先頭から捨てる
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - now)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            for container_id in self._pop_expired(now):
+                task = asyncio.create_task(self._teardown(container_id))
+                self._teardowns.add(task)
+                task.add_done_callback(self._teardowns.discard)
+
+            delay = self._next_delay(time.time())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _teardown(self, container_id: str) -> None:
+        async with self._semaphore:
+            try:
+                await self.on_expire(container_id)
+                logger.info(f"Expired container torn down: {container_id[:12]}")
+            except Exception as e:
+                logger.error(f"Failed to tear down expired container {container_id[:12]}: {e}")
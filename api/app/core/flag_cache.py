@@ -0,0 +1,107 @@
+"""
+In-process cache of expected flag digests (and flag modes) for submit_flag
+"""
+
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from app.core.dynamic_flags import DynamicFlags
+
+logger = logging.getLogger(__name__)
+
+
+def flag_digest(flag: str) -> bytes:
+    """SHA-256 digest of a flag (surrounding whitespace ignored)"""
+    return hashlib.sha256(flag.strip().encode("utf-8")).digest()
+
+
+class FlagEntry(NamedTuple):
+    digest: bytes  # b"" = no static flag (never matches)
+    dynamic: bool  # True = verify the per-user HMAC flag instead of the digest
+
+
+class FlagCache:
+    """
+    Maps challenge_id to the SHA-256 digest of its expected flag and
+    whether the challenge uses dynamic (per-user) flags.
+
+    Only digests are kept in memory. Challenges without a static flag are
+    cached as an empty digest, which never matches. Entries are dropped on
+    ``invalidate()`` (redeploy) and after ``ttl_seconds`` as a safety net.
+    """
+
+    def __init__(self, ttl_seconds: float = 600):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[FlagEntry, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, challenge_id: str) -> Optional[FlagEntry]:
+        """Return the cached entry, or None if unknown or expired"""
+        cached = self._entries.get(challenge_id)
+        if cached is None:
+            return None
+        entry, loaded_at = cached
+        if time.monotonic() - loaded_at >= self.ttl_seconds:
+            with self._lock:
+                self._entries.pop(challenge_id, None)
+            return None
+        return entry
+
+    def set(self, challenge_id: str, flag: Optional[str], dynamic: bool = False) -> FlagEntry:
+        """Cache ``flag`` (None = no static flag) and the challenge's flag mode"""
+        entry = FlagEntry(flag_digest(flag) if flag else b"", dynamic)
+        with self._lock:
+            self._entries[challenge_id] = (entry, time.monotonic())
+        return entry
+
+    def preload(self, rows: Iterable[dict]) -> int:
+        """Bulk-load from ``challenges`` rows (id, flag_answer, dynamic); returns count"""
+        now = time.monotonic()
+        loaded = {
+            row["id"]: (
+                FlagEntry(flag_digest(row["flag_answer"]) if row.get("flag_answer") else b"", bool(row.get("dynamic"))),
+                now,
+            )
+            for row in rows
+            if row.get("id")
+        }
+        with self._lock:
+            self._entries = loaded
+        logger.info(f"Flag cache preloaded: {len(loaded)} challenges")
+        return len(loaded)
+
+    def invalidate(self, challenge_id: Optional[str] = None) -> None:
+        """Drop one challenge, or every challenge when ``challenge_id`` is None"""
+        with self._lock:
+            if challenge_id is None:
+                self._entries = {}
+            else:
+                self._entries.pop(challenge_id, None)
+
+    @staticmethod
+    def matches(expected_digest: bytes, submitted_flag: str) -> bool:
+        """Constant-time comparison of a submission against the expected digest"""
+        return hmac.compare_digest(expected_digest, flag_digest(submitted_flag))
+
+
+def verify_submission(
+    entry: FlagEntry,
+    challenge_id: str,
+    user_id: str,
+    submitted_flag: str,
+    dynamic_flags: Optional[DynamicFlags],
+) -> bool:
+    """
+    Check a submission against the challenge's flag mode.
+
+    Dynamic challenges accept only the submitting user's HMAC flag (never
+    the static flag or another user's flag, and nothing when dynamic flags
+    are disabled); static challenges only the stored flag.
+    """
+    if entry.dynamic:
+        return dynamic_flags is not None and dynamic_flags.verify(challenge_id, user_id, submitted_flag)
+    return FlagCache.matches(entry.digest, submitted_flag)
@@ -0,0 +1,96 @@
+"""
+Concurrent, cached dependency health checks
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Runs registered dependency checks concurrently, each with its own timeout,
+    and caches the results for ``cache_seconds``.
+
+    A check is a blocking callable that raises on failure. An optional
+    background task keeps the cache warm so probes never wait on a dependency.
+    """
+
+    def __init__(self, timeout_seconds: float = 2.0, cache_seconds: float = 5.0):
+        self.timeout_seconds = timeout_seconds
+        self.cache_seconds = cache_seconds
+        self._checks: Dict[str, Callable[[], None]] = {}
+        self._results: Dict[str, dict] = {}
+        self._checked_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, check: Callable[[], None]) -> None:
+        self._checks[name] = check
+
+    async def _run_check(self, name: str, check: Callable[[], None]) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.to_thread(check), timeout=self.timeout_seconds)
+            status, error = "connected", None
+        except asyncio.TimeoutError:
+            status, error = "disconnected", f"timeout after {self.timeout_seconds}s"
+        except Exception as e:
+            status, error = "disconnected", str(e)
+        result = {
+            "status": status,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "checked_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+        if error:
+            result["error"] = error
+        return result
+
+    async def refresh(self) -> Dict[str, dict]:
+        """Run every check now (concurrently) and update the cache"""
+        names = list(self._checks)
+        results = await asyncio.gather(*(self._run_check(n, self._checks[n]) for n in names))
+        self._results = dict(zip(names, results))
+        self._checked_at = time.monotonic()
+        return self._results
+
+    async def get(self) -> Dict[str, dict]:
+        """Cached results, refreshed (once, for all waiters) when older than cache_seconds"""
+        if self._is_fresh():
+            return self._results
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._is_fresh():
+                return self._results
+            return await self.refresh()
+
+    def _is_fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at < self.cache_seconds
+
+    def start(self, interval_seconds: float) -> None:
+        """Start the background refresher (interval <= 0 disables it)"""
+        if interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._refresh_loop(interval_seconds))
+
+    async def _refresh_loop(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Health refresh failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
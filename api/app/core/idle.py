@@ -0,0 +1,132 @@
+"""
+Idle detection for mission containers (pause instances nobody is using)
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from app.core.docker_executor import DockerExecutor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Activity:
+    last_active: float
+    traffic: Optional[int] = None  # 直近に観測した rx + tx バイト数
+
+
+def network_bytes(stats: dict) -> int:
+    """rx + tx bytes over every interface of a Docker stats sample"""
+    return sum(
+        (network.get("rx_bytes") or 0) + (network.get("tx_bytes") or 0)
+        for network in (stats.get("networks") or {}).values()
+    )
+
+
+class IdleMonitor:
+    """
+    Samples each running container's network counters every
+    ``interval_seconds`` and calls ``on_idle`` once they have not moved for
+    ``idle_seconds``.
+
+    ``candidates`` returns the container ids to watch (running, not paused);
+    ids that drop out are forgotten, so a resumed container starts a fresh
+    idle period. ``touch()`` records activity seen elsewhere (e.g. proxied
+    requests) without waiting for the next sample. ``sample`` is blocking
+    and runs on ``executor``, at most ``max_concurrency`` at once.
+    ``clock`` is a monotonic time source (injectable for tests).
+    """
+
+    def __init__(
+        self,
+        candidates: Callable[[], Iterable[str]],
+        sample: Callable[[str], Optional[int]],
+        on_idle: Callable[[str], Awaitable[None]],
+        executor: DockerExecutor,
+        idle_seconds: float,
+        interval_seconds: float = 60.0,
+        max_concurrency: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.candidates = candidates
+        self.sample = sample
+        self.on_idle = on_idle
+        self.executor = executor
+        self.idle_seconds = idle_seconds
+        self.interval_seconds = interval_seconds
+        self.max_concurrency = max_concurrency
+        self.clock = clock
+        self._activity: Dict[str, _Activity] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.paused = 0
+
+    def touch(self, container_id: str) -> None:
+        activity = self._activity.get(container_id)
+        if activity is None:
+            self._activity[container_id] = _Activity(last_active=self.clock())
+        else:
+            activity.last_active = self.clock()
+
+    def idle_for(self, container_id: str) -> Optional[float]:
+        activity = self._activity.get(container_id)
+        return self.clock() - activity.last_active if activity else None
+
+    def start(self) -> None:
+        if self._task is not None or self.idle_seconds <= 0:
+            return
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Idle monitor started (pause after {self.idle_seconds:.0f}s without traffic)")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Idle sweep failed: {e}")
+
+    async def sweep(self) -> None:
+        """Sample every candidate once and pause the ones idle for too long"""
+        watched = set(self.candidates())
+        for container_id in list(self._activity):
+            if container_id not in watched:
+                del self._activity[container_id]
+        await asyncio.gather(*(self._check(container_id) for container_id in watched))
+
+    async def _check(self, container_id: str) -> None:
+        async with self._semaphore:
+            try:
+                traffic = await self.executor.run(self.sample, container_id)
+            except Exception as e:
+                logger.debug(f"Stats sample failed for {container_id[:12]}: {e}")
+                return
+        now = self.clock()
+        activity = self._activity.setdefault(container_id, _Activity(last_active=now, traffic=traffic))
+        if traffic is not None and traffic != activity.traffic:
+            activity.traffic = traffic
+            activity.last_active = now
+            return
+        if now - activity.last_active < self.idle_seconds:
+            return
+        self._activity.pop(container_id, None)
+        try:
+            await self.on_idle(container_id)
+            self.paused += 1
+        except Exception as e:
+            logger.error(f"Failed to pause idle container {container_id[:12]}: {e}")
@@ -0,0 +1,256 @@
+"""
+Prometheus-style metrics (text exposition format 0.0.4)
+
+Standalone on purpose (stdlib only) so that tools/ can instrument its
+pipeline with the same helpers. Values are per process; with several
+uvicorn workers each worker reports its own series.
+"""
+
+import bisect
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (usually refreshed at scrape time)"""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def clear(self) -> None:
+        """Drop every label set (before re-populating per-challenge series)"""
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Bucketed observations (latencies in seconds)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels) -> "timed":
+        return timed(self, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class timed(contextlib.ContextDecorator):
+    """
+    Observe the wall time of a block or function into ``histogram``.
+
+        with timed(DOCKER_OPERATION_SECONDS, operation="run"):
+            ...
+
+        @timed(SUPABASE_QUERY_SECONDS, table="challenges", operation="select")
+        def load(): ...
+
+    The time is recorded whether or not the block raises.
+    """
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._started = threading.local()
+
+    def __enter__(self):
+        stack = getattr(self._started, "stack", None)
+        if stack is None:
+            stack = self._started.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        started = self._started.stack.pop()
+        self.histogram.observe(time.perf_counter() - started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically write the exposition to ``path`` (node_exporter textfile collector)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics.")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Shared metric definitions (API and tools/) ---
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "sol_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+DOCKER_OPERATION_SECONDS = Histogram(
+    "sol_docker_operation_duration_seconds", "Docker API call latency by operation", ("operation",)
+)
+SUPABASE_QUERY_SECONDS = Histogram(
+    "sol_supabase_query_duration_seconds", "Supabase query latency by table and operation", ("table", "operation")
+)
+RUNNING_CONTAINERS = Gauge(
+    "sol_running_mission_containers", "Running mission containers per challenge", ("challenge_id",)
+)
+PAUSED_CONTAINERS = Gauge("sol_paused_mission_containers", "Mission containers paused for inactivity")
+WARM_POOL_IDLE = Gauge("sol_warm_pool_idle_containers", "Idle warm-pool containers per challenge", ("challenge_id",))
+THREADPOOL_IN_USE = Gauge("sol_threadpool_in_use", "Busy worker threads", ("pool",))
+THREADPOOL_SIZE = Gauge("sol_threadpool_size", "Worker thread capacity", ("pool",))
+ADMISSION_QUEUE_DEPTH = Gauge("sol_admission_queue_depth", "Container starts waiting for capacity")
+ADMISSION_RESERVED = Gauge("sol_admission_reserved", "Capacity reserved by mission containers", ("resource",))
+NODE_RUNNING_CONTAINERS = Gauge(
+    "sol_node_running_containers", "Mission containers placed on each Docker node", ("node",)
+)
+NODE_START_LATENCY = Gauge(
+    "sol_node_start_latency_seconds", "Recent container start latency (EWMA) per Docker node", ("node",)
+)
+MISSION_STARTS = Counter("sol_mission_starts_total", "Mission container starts", ("source",))
+MISSION_START_FAILURES = Counter("sol_mission_start_failures_total", "Failed mission starts", ("reason",))
+CONTAINER_ROLLBACKS = Counter("sol_container_rollbacks_total", "Containers removed after a failed start")
+PROXY_REQUESTS = Counter("sol_proxy_requests_total", "Requests forwarded to mission containers", ("status",))
+PROXY_BYTES = Counter("sol_proxy_bytes_total", "Bytes streamed through the reverse proxy", ("direction",))
+FLAG_SUBMISSIONS = Counter("sol_flag_submissions_total", "Flag submissions", ("result",))
+PIPELINE_STEP_SECONDS = Histogram(
+    "sol_tools_pipeline_step_duration_seconds", "tools/ pipeline step latency", ("step",),
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
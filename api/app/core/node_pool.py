@@ -0,0 +1,301 @@
+"""
+Pool of Docker hosts with least-loaded placement for mission containers
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import docker
+
+from app.core.docker_manager import DockerManager
+from app.core.ports import PortAllocator, parse_port_range
+from app.core.readiness import ContainerEventWatcher
+
+logger = logging.getLogger(__name__)
+
+
+class NoNodeAvailable(Exception):
+    """No healthy node has room for another mission container"""
+
+
+def image_ref(image: str) -> str:
+    """Normalise an image reference for cache lookups ("nginx" -> "nginx:latest")"""
+    if "@" in image or ":" in image.rsplit("/", 1)[-1]:
+        return image
+    return f"{image}:latest"
+
+
+@dataclass
+class DockerNode:
+    """One Docker daemon and the load placed on it by this process"""
+    name: str
+    client: object
+    container_host: str
+    # ctf_net のコンテナIPに API から直接届くか（同一ホストの daemon のみ）
+    local: bool = True
+    events: Optional[ContainerEventWatcher] = None
+    manager: Optional[DockerManager] = None
+    ports: Optional[PortAllocator] = None
+    max_instances: int = 0  # 0 = 上限なし
+    memory_total: int = 0
+    cpus: int = 0
+    running: int = 0
+    reserved_memory: int = 0
+    start_latency: float = 0.0  # 起動時間の指数移動平均（秒）
+    healthy: bool = True
+    images: Set[str] = field(default_factory=set)
+    inventory_checked_at: float = 0.0
+
+    def has_image(self, image: str) -> bool:
+        return image_ref(image) in self.images
+
+    def fits(self, memory: int) -> bool:
+        if self.max_instances and self.running >= self.max_instances:
+            return False
+        return not self.memory_total or self.reserved_memory + memory <= self.memory_total
+
+    def load(self, latency_reference: float) -> float:
+        """Fraction of the node in use, plus a penalty for slow recent starts"""
+        memory = self.reserved_memory / self.memory_total if self.memory_total else 0.0
+        instances = self.running / self.max_instances if self.max_instances else 0.0
+        return max(memory, instances) + self.start_latency / latency_reference
+
+    def stats(self) -> dict:
+        return {
+            "container_host": self.container_host,
+            "healthy": self.healthy,
+            "running": self.running,
+            "max_instances": self.max_instances,
+            "reserved_memory": self.reserved_memory,
+            "memory_total": self.memory_total,
+            "start_latency_seconds": round(self.start_latency, 3),
+            "cached_images": len(self.images),
+            "ports": self.ports.stats() if self.ports is not None else None,
+        }
+
+
+def connect_node(
+    name: str,
+    base_url: Optional[str],
+    container_host: str,
+    port_range: str,
+    network: Optional[str] = None,
+    max_instances: int = 0,
+    timeout: int = 60,
+) -> DockerNode:
+    """
+    Blocking: connect to a Docker endpoint and build its node.
+
+    ``base_url`` None uses the environment (DOCKER_HOST / local socket).
+    Each node owns ``port_range`` on its host.
+    Any Docker Engine API works (remote daemons, dind stand-ins, fakes);
+    missing ``info()`` fields just disable the memory budget for the node.
+    """
+    if base_url:
+        client = docker.DockerClient(base_url=base_url, timeout=timeout)
+    else:
+        client = docker.from_env(timeout=timeout)
+    events = ContainerEventWatcher(client, network=network)
+    ports = PortAllocator(parse_port_range(port_range))
+    node = DockerNode(
+        name=name,
+        client=client,
+        container_host=container_host,
+        local=not base_url or base_url.startswith("unix://"),
+        events=events,
+        manager=DockerManager(client=client, events=events, ports=ports),
+        ports=ports,
+        max_instances=max_instances,
+    )
+    try:
+        info = client.info()
+        node.memory_total = int(info.get("MemTotal") or 0)
+        node.cpus = int(info.get("NCPU") or 0)
+    except Exception as e:
+        logger.warning(f"Node {name}: failed to read daemon info: {e}")
+    return node
+
+
+class NodePool:
+    """
+    Places mission containers on the least-loaded healthy node.
+
+    Nodes that already have the image cached are preferred; among those
+    the node with the lowest ``load()`` (memory / instance usage plus
+    recent start latency) wins. Placements are keyed like admission
+    reservations: ``place()`` under a pending key, ``transfer()`` to the
+    container id, ``release()`` on removal. Load is what this process
+    placed (plus containers recovered at startup), not a daemon query.
+    """
+
+    def __init__(
+        self,
+        nodes: List[DockerNode],
+        latency_reference: float = 30.0,
+        port_grace_seconds: float = 120.0,
+    ):
+        if not nodes:
+            raise ValueError("NodePool needs at least one node")
+        self.nodes: Dict[str, DockerNode] = {node.name: node for node in nodes}
+        self.latency_reference = latency_reference
+        self.port_grace_seconds = port_grace_seconds
+        self._lock = threading.Lock()
+        self._placements: Dict[str, tuple] = {}  # key -> (node name, memory)
+
+    @property
+    def primary(self) -> DockerNode:
+        """First configured node (warm pool and network bootstrap run here)"""
+        return next(iter(self.nodes.values()))
+
+    def __iter__(self):
+        return iter(list(self.nodes.values()))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    # --- Placement ---
+
+    def place(self, key: str, image: str, memory: int) -> DockerNode:
+        """
+        Pick a node for ``image`` and reserve ``memory`` on it under ``key``.
+
+        Raises:
+            NoNodeAvailable: every node is unhealthy or full
+        """
+        with self._lock:
+            if key in self._placements:
+                return self.nodes[self._placements[key][0]]
+            candidates = [n for n in self.nodes.values() if n.healthy and n.fits(memory)]
+            if not candidates:
+                raise NoNodeAvailable("No Docker node has capacity for another container")
+            node = min(
+                candidates,
+                key=lambda n: (not n.has_image(image), n.load(self.latency_reference), n.running, n.name),
+            )
+            self._assign_locked(key, node, memory)
+            return node
+
+    def assign(self, key: str, node_name: str, memory: int) -> None:
+        """Record a container already running on ``node_name`` (startup recovery, warm pool)"""
+        with self._lock:
+            if key not in self._placements and node_name in self.nodes:
+                self._assign_locked(key, self.nodes[node_name], memory)
+
+    def _assign_locked(self, key: str, node: DockerNode, memory: int) -> None:
+        self._placements[key] = (node.name, memory)
+        node.running += 1
+        node.reserved_memory += memory
+
+    def transfer(self, old_key: str, new_key: str) -> None:
+        with self._lock:
+            placement = self._placements.pop(old_key, None)
+            if placement is not None:
+                self._placements[new_key] = placement
+
+    def release(self, key: str, port: Optional[int] = None) -> Optional[DockerNode]:
+        """
+        Drop the placement for ``key`` and give ``port`` back to the node's
+        allocator; returns the node it was on.
+
+        The port must be released under the key the placement is held by
+        (the pending key until ``transfer()``), otherwise it stays allocated.
+        """
+        with self._lock:
+            placement = self._placements.pop(key, None)
+            if placement is None:
+                return None
+            node = self.nodes.get(placement[0])
+            if node is not None:
+                node.running = max(0, node.running - 1)
+                node.reserved_memory = max(0, node.reserved_memory - placement[1])
+        if node is not None and port is not None and node.ports is not None:
+            node.ports.release(port)
+        return node
+
+    def node_for(self, container_id: str) -> Optional[DockerNode]:
+        placement = self._placements.get(container_id)
+        return self.nodes.get(placement[0]) if placement else None
+
+    def client_for(self, container_id: str):
+        """Docker client of the node running ``container_id`` (primary if unknown)"""
+        node = self.node_for(container_id)
+        return (node or self.primary).client
+
+    def record_start(self, node: DockerNode, seconds: float) -> None:
+        node.start_latency = seconds if not node.start_latency else 0.8 * node.start_latency + 0.2 * seconds
+
+    def mark_image(self, node: DockerNode, image: str, present: bool = True) -> None:
+        if present:
+            node.images.add(image_ref(image))
+        else:
+            node.images.discard(image_ref(image))
+
+    # --- Health / inventory (blocking, run from worker threads) ---
+
+    def ping(self) -> None:
+        """
+        Ping every node; unreachable nodes are marked unhealthy and skipped
+        by ``place()`` until they answer again.
+
+        Raises:
+            Exception: no node is reachable
+        """
+        errors = []
+        for node in self:
+            try:
+                node.client.ping()
+                node.healthy = True
+            except Exception as e:
+                if node.healthy:
+                    logger.warning(f"Node {node.name} is unreachable: {e}")
+                node.healthy = False
+                errors.append(f"{node.name}: {e}")
+        if len(errors) == len(self.nodes):
+            raise Exception("; ".join(errors))
+
+    def refresh_inventories(self) -> None:
+        """Refresh the inventory of every healthy node (periodic job, not the health probe)"""
+        for node in self:
+            if node.healthy:
+                self.refresh_inventory(node)
+
+    def refresh_inventory(self, node: DockerNode) -> None:
+        """Re-read the node's cached images and reconcile its host ports with what is published"""
+        try:
+            images = node.client.images.list()
+            containers = node.client.containers.list(all=True, sparse=True)
+        except Exception as e:
+            logger.warning(f"Node {node.name}: failed to read inventory: {e}")
+            return
+        node.images = {tag for image in images for tag in (image.tags or [])}
+        if node.ports is not None:
+            published = {
+                int(binding["PublicPort"])
+                for container in containers
+                for binding in container.attrs.get("Ports") or []
+                if binding.get("PublicPort")
+            }
+            node.ports.reconcile(published, grace_seconds=self.port_grace_seconds)
+        node.inventory_checked_at = time.monotonic()
+
+    # --- Lifecycle ---
+
+    def start_events(self) -> None:
+        for node in self:
+            if node.events is not None:
+                node.events.start()
+
+    def close(self) -> None:
+        for node in self:
+            if node.events is not None:
+                node.events.stop()
+            try:
+                node.client.close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, dict]:
+        return {name: node.stats() for name, node in self.nodes.items()}
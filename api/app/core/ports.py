@@ -0,0 +1,126 @@
+"""
+Host port allocation for mission containers from a pre-configured range
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class PortsExhausted(Exception):
+    """Every port in the range is in use"""
+
+
+def parse_port_range(value: str) -> range:
+    """"20000-29999" -> range(20000, 30000)"""
+    start, sep, end = str(value).strip().partition("-")
+    first = int(start)
+    last = int(end) if sep else first
+    if not 0 < first <= last <= 65535:
+        raise ValueError(f"Invalid port range: {value!r}")
+    return range(first, last + 1)
+
+
+def is_port_conflict(error: Exception) -> bool:
+    """Docker start failed because the host port is taken by someone else"""
+    message = str(error)
+    return "port is already allocated" in message or "address already in use" in message
+
+
+class PortAllocator:
+    """
+    Owns a host port range and hands out free ports in O(1).
+
+    Containers are published to the returned port explicitly, so the URL is
+    known before the container starts. Ports go back to the free list with
+    ``release()`` on teardown; ``reconcile()`` re-syncs with the ports the
+    daemon actually publishes (containers removed behind our back, or ports
+    taken by other processes sharing the host).
+    """
+
+    def __init__(self, ports: range):
+        self.ports = ports
+        self._lock = threading.Lock()
+        self._free: Deque[int] = deque(ports)
+        self._queued: Set[int] = set(self._free)
+        self._used: Dict[int, float] = {}  # port -> allocated at (monotonic)
+
+    @classmethod
+    def from_range(cls, value: str) -> "PortAllocator":
+        return cls(parse_port_range(value))
+
+    def __contains__(self, port: int) -> bool:
+        return port in self.ports
+
+    @property
+    def in_use(self) -> int:
+        return len(self._used)
+
+    @property
+    def available(self) -> int:
+        return len(self._queued - self._used.keys())
+
+    def allocate(self) -> int:
+        """
+        Take the next free port.
+
+        Raises:
+            PortsExhausted: the range is fully allocated
+        """
+        with self._lock:
+            while self._free:
+                port = self._free.popleft()
+                self._queued.discard(port)
+                if port in self._used:
+                    continue  # reserve() で使用中にしたポート（遅延削除）
+                self._used[port] = time.monotonic()
+                return port
+        raise PortsExhausted("No free host port left in the configured range")
+
+    def reserve(self, port: int) -> None:
+        """Mark ``port`` as used (recovered containers, ports held by others)"""
+        with self._lock:
+            if port in self and port not in self._used:
+                self._used[port] = time.monotonic()
+
+    def release(self, port: int) -> None:
+        with self._lock:
+            if self._used.pop(port, None) is None:
+                return
+            if port not in self._queued:
+                self._free.append(port)
+                self._queued.add(port)
+
+    def reconcile(self, published: Iterable[int], grace_seconds: float = 120.0) -> int:
+        """
+        Sync with the host ports currently published on the daemon.
+
+        Published ports in the range become used; used ports that are not
+        published and were allocated more than ``grace_seconds`` ago (so not
+        a start still in flight) are reclaimed. Returns the number reclaimed.
+        """
+        published = {port for port in published if port in self}
+        now = time.monotonic()
+        for port in published:
+            self.reserve(port)
+        with self._lock:
+            stale = [
+                port for port, allocated_at in self._used.items()
+                if port not in published and now - allocated_at > grace_seconds
+            ]
+        for port in stale:
+            self.release(port)
+        if stale:
+            logger.info(f"Reclaimed {len(stale)} unpublished host ports")
+        return len(stale)
+
+    def stats(self) -> dict:
+        return {
+            "range": f"{self.ports.start}-{self.ports.stop - 1}" if len(self.ports) else "",
+            "in_use": self.in_use,
+            "available": self.available,
+        }
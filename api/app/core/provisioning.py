@@ -0,0 +1,444 @@
+"""
+Mission start orchestration (shared replica, warm pool claim or cold start on a node)
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+import docker
+
+from app.core import metrics
+from app.core.admission import AdmissionController, AdmissionRejected
+from app.core.docker_executor import DockerExecutor
+from app.core.dynamic_flags import DynamicFlags, parse_flag_mode
+from app.core.metrics import DOCKER_OPERATION_SECONDS, timed
+from app.core.node_pool import NodePool, NoNodeAvailable
+from app.core.ports import PortsExhausted
+from app.core.proxy import session_token, shared_token
+from app.core.session_registry import Session, SessionQuotaExceeded
+from app.core.sessions import SessionManager, kill_and_remove, upstream_address
+from app.core.shared_instances import SharedInstanceManager, SharedSpec, parse_instance_mode
+from app.core.start_jobs import Reporter
+from app.core.warm_pool import WarmPoolManager
+
+logger = logging.getLogger(__name__)
+
+# 起動に必要な challenges の列（instance_mode・flag_mode は mission JSON の environment）
+CHALLENGE_COLUMNS = (
+    "id, image_name, internal_port, title, flag_answer, "
+    "instance_mode:metadata->environment->>instance_mode, flag_mode:metadata->environment->>flag_mode"
+)
+
+
+class ProvisioningError(Exception):
+    """
+    A start that failed with an HTTP status; the start job publishes
+    ``status_code``, ``detail`` and the ``Retry-After`` header as its error event.
+    """
+
+    def __init__(self, status_code: int, detail: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def uses_dynamic_flag(challenge: dict) -> bool:
+    """Whether a challenge row uses per-user flags (dedicated containers only: shared replicas show everyone one flag)"""
+    return (
+        parse_flag_mode(challenge.get("flag_mode")) == "dynamic"
+        and parse_instance_mode(challenge.get("instance_mode")) != "shared"
+    )
+
+
+def _image_exists(docker_client, image_name: str) -> bool:
+    try:
+        docker_client.images.get(image_name)
+        return True
+    except docker.errors.ImageNotFound:
+        return False
+
+
+class MissionProvisioner:
+    """
+    Starts a user's mission environment and registers it with ``sessions``.
+
+    Shared challenges are routed to a replica, a running session is returned
+    as is (idempotent start), and otherwise capacity is acquired from
+    ``admission`` and the container comes from the warm pool or a cold start
+    on the node ``node_pool`` picks (image present, lowest load). Failures
+    raise ProvisioningError; a container created for a failed start is rolled
+    back and every reservation it held is released.
+
+    ``load_challenge`` is the blocking ``challenges`` lookup (row with
+    CHALLENGE_COLUMNS or None) and runs on a worker thread.
+    """
+
+    def __init__(
+        self,
+        sessions: SessionManager,
+        admission: AdmissionController,
+        executor: DockerExecutor,
+        node_pool: NodePool,
+        warm_pool: WarmPoolManager,
+        shared_instances: SharedInstanceManager,
+        load_challenge: Callable[[str], Optional[dict]],
+        ensure_network: Callable[[object], None],
+        dynamic_flags: Optional[DynamicFlags] = None,
+        cpu_limit: str = "0.5",
+        memory_limit: str = "512m",
+        pids_limit: int = 100,
+        start_timeout_seconds: float = 30.0,
+        wait_ready: bool = True,
+        admission_max_wait_seconds: float = 120.0,
+    ):
+        self.sessions = sessions
+        self.admission = admission
+        self.executor = executor
+        self.node_pool = node_pool
+        self.warm_pool = warm_pool
+        self.shared_instances = shared_instances
+        self.load_challenge = load_challenge
+        self.ensure_network = ensure_network
+        self.dynamic_flags = dynamic_flags
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.pids_limit = pids_limit
+        self.start_timeout_seconds = start_timeout_seconds
+        self.wait_ready = wait_ready
+        self.admission_max_wait_seconds = admission_max_wait_seconds
+
+    def shared_response(self, user_id: str, challenge_id: str) -> Optional[dict]:
+        """
+        Assign the user a replica of a shared challenge (sticky per user) and
+        return the start response, or None if no replica is running. The URL
+        carries a per-user proxy token (the replica's host port without proxy).
+        """
+        replica = self.shared_instances.route(challenge_id, user_id)
+        if replica is None:
+            return None
+        spec = self.shared_instances.spec_for(challenge_id)
+        token = shared_token(self.sessions.proxy_secret, f"shared:{challenge_id}:{user_id}")
+        self.shared_instances.register_token(token, challenge_id, user_id)
+        return {
+            "status": "success",
+            "container_id": replica.container.short_id,
+            "port": replica.port,
+            "url": self.sessions.url_for(token, self.node_pool.primary.container_host, replica.port),
+            "message": "SHARED MISSION ENVIRONMENT ASSIGNED.",
+            "challenge_name": spec.title,
+        }
+
+    async def acquire_capacity(self, admission_key: str, user_id: str, report: Reporter) -> None:
+        """Take an admission slot, reporting the queue position and ETA as ``queued`` every second"""
+        acquire = asyncio.ensure_future(self.admission.acquire(
+            admission_key, user_id, self.sessions.container_cpu, self.sessions.container_memory,
+            timeout=self.admission_max_wait_seconds,
+        ))
+        try:
+            while True:
+                done, _ = await asyncio.wait({acquire}, timeout=1.0)
+                if done:
+                    acquire.result()
+                    return
+                status = self.admission.queue_status(admission_key)
+                if status is not None:
+                    report("queued", **status)
+        except AdmissionRejected as rejected:
+            raise ProvisioningError(503, str(rejected), {"Retry-After": str(rejected.retry_after)})
+        finally:
+            if not acquire.done():
+                acquire.cancel()
+
+    async def provision(self, user_id: str, challenge_id: str, report: Optional[Reporter] = None) -> dict:
+        """
+        Start (or return) the user's environment for ``challenge_id``.
+
+        ``report(phase, **data)`` receives progress (queued -> pulling ->
+        creating -> port_bound -> healthy); the caller reports ``ready`` with
+        the returned response.
+        """
+        report = report or (lambda phase, **data: None)
+        registry = self.sessions.registry
+
+        # 共有インスタンス（instance_mode: shared）はレプリカが起動済みなら即時に割り当てる（DB参照なし）
+        shared = self.shared_response(user_id, challenge_id)
+        if shared is not None:
+            metrics.MISSION_STARTS.inc(source="shared")
+            return shared
+
+        # 起動済みなら既存インスタンスを返す（冪等）。未起動なら同時起動数の上限内で枠を確保
+        try:
+            existing = await self.sessions.reserve(user_id, challenge_id)
+        except SessionQuotaExceeded as e:
+            raise ProvisioningError(429, str(e))
+        if existing is not None:
+            try:
+                await self.sessions.resume(existing)
+            except docker.errors.DockerException as e:
+                raise ProvisioningError(500, f"Failed to resume container: {str(e)}")
+            logger.info(f"Returning existing container {existing.short_id} for user {user_id} (challenge: {challenge_id})")
+            return {
+                "status": "success",
+                "container_id": existing.short_id,
+                "port": existing.port,
+                "url": existing.url,
+                "message": "MISSION ENVIRONMENT ALREADY RUNNING.",
+                "challenge_name": existing.challenge_name,
+            }
+
+        if self.admission.blocked:
+            registry.release(user_id, challenge_id)
+            raise ProvisioningError(
+                503, f"New containers are blocked (state: {self.admission.state})", {"Retry-After": "300"}
+            )
+
+        container = None
+        warm = None
+        assigned_port = None
+        upstream = None  # ウォームプールの場合はプロキシの初回アクセス時に解決
+        admission_key = f"start:{user_id}:{challenge_id}"
+
+        try:
+            challenge = await asyncio.to_thread(self.load_challenge, challenge_id)
+            if not challenge:
+                raise ProvisioningError(404, f"Challenge '{challenge_id}' not found")
+
+            image_name = challenge.get("image_name")
+            internal_port = challenge.get("internal_port", 8000)
+            challenge_title = challenge.get("title", challenge_id)
+            flag_answer = challenge.get("flag_answer")
+            shared_mode = parse_instance_mode(challenge.get("instance_mode")) == "shared"
+            dynamic_flag = uses_dynamic_flag(challenge)
+
+            if not image_name:
+                raise ProvisioningError(500, "Challenge image_name not configured")
+            if dynamic_flag and self.dynamic_flags is None:
+                raise ProvisioningError(500, "Dynamic flags are not enabled (DYNAMIC_FLAGS_ENABLED / FLAG_HMAC_SECRET)")
+            if not flag_answer and not dynamic_flag:
+                raise ProvisioningError(500, "Challenge flag_answer not configured")
+
+            # コンテナに注入するFlag（動的Flagは challenge_id|user_id|salt の HMAC から導出、保存しない）
+            instance_flag = self.dynamic_flags.derive(challenge_id, user_id) if dynamic_flag else flag_answer
+
+            # 共有インスタンスの問題はユーザー専用コンテナを起動せず、問題ごとのレプリカに振り分ける
+            if shared_mode:
+                self.shared_instances.ensure(SharedSpec(
+                    challenge_id, image_name, internal_port, flag_answer, challenge_title,
+                    self.shared_instances.replicas,
+                ))
+                report("creating")
+                if await self.shared_instances.wait_ready(challenge_id, timeout=self.start_timeout_seconds):
+                    shared = self.shared_response(user_id, challenge_id)
+                    if shared is not None:
+                        report("healthy")
+                        metrics.MISSION_STARTS.inc(source="shared")
+                        return shared
+                raise ProvisioningError(
+                    503, "Shared mission environment is starting. Please retry shortly.", {"Retry-After": "10"}
+                )
+
+            # ホストの空き容量を確保（満杯なら公平なキューで待機、キューが深すぎれば即時 503）
+            await self.acquire_capacity(admission_key, user_id, report)
+
+            # ウォームプールに待機中のコンテナがあれば割り当てる（Flagファイルは割り当て時に書き込み）
+            # 動的Flagの問題は CTF_FLAG 環境変数を起動後に変えられないため、常にコールドスタート
+            if not dynamic_flag:
+                warm = await self.warm_pool.claim(challenge_id, image_name, internal_port, flag_answer)
+            if warm is not None:
+                # プールのコンテナは自身の予約を持っているため、起動用の予約は返す
+                self.admission.release(admission_key)
+                container = warm.container
+                assigned_port = warm.port
+                node = self.node_pool.primary
+                self.node_pool.assign(container.id, node.name, self.sessions.container_memory)
+                logger.info(f"Claimed warm container {container.short_id} for challenge {challenge_id}")
+                # プールのコンテナは起動待ち済み
+                report("port_bound", port=assigned_port)
+                report("healthy")
+            else:
+                # プール未使用・枯渇時はコールドスタート（Atomic Startup Strategy - Ver 10.2準拠）
+                create_started = time.monotonic()
+                node, container, assigned_port, started = await self._create(
+                    admission_key, user_id, challenge_id, image_name, internal_port, instance_flag, report
+                )
+                report("port_bound", port=assigned_port)
+                upstream = await self._wait_started(
+                    node, container, started, internal_port, assigned_port,
+                    create_started + self.start_timeout_seconds, report,
+                )
+                self.node_pool.record_start(node, time.monotonic() - create_started)
+
+            logger.info(f"Container {container.short_id} started on port {assigned_port} for user {user_id} (challenge: {challenge_id})")
+
+            # プロキシ有効時はトークンで振り分けるURL、無効時は配置先ノードのホストポート
+            token = session_token(self.sessions.proxy_secret, container.id)
+            session = Session(
+                user_id=user_id,
+                challenge_id=challenge_id,
+                container_id=container.id,
+                port=int(assigned_port),
+                url=self.sessions.url_for(token, node.container_host, assigned_port),
+                challenge_name=challenge_title,
+                token=token,
+                upstream=upstream,
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.sessions.ttl_seconds),
+            )
+            # セッションを登録（DBへの保存はバックグラウンドで実行）し、有効期限をスケジュール
+            registry.add(session)
+            self.sessions.expiry.schedule(session.container_id, self.sessions.deadline(session))
+            self.admission.transfer(admission_key, session.container_id)
+            self.node_pool.transfer(admission_key, session.container_id)
+            metrics.MISSION_STARTS.inc(source="warm" if warm is not None else "cold")
+
+            return {
+                "status": "success",
+                "container_id": container.short_id,
+                "port": int(assigned_port),
+                "url": session.url,
+                "message": "MISSION ENVIRONMENT DEPLOYED.",
+                "challenge_name": challenge_title,
+            }
+
+        except ProvisioningError as error:
+            metrics.MISSION_START_FAILURES.inc(reason=f"http_{error.status_code}")
+            await self._rollback(container)
+            raise
+        except docker.errors.DockerException as docker_error:
+            error_msg = f"Docker error: {str(docker_error)}"
+            logger.error(error_msg)
+            metrics.MISSION_START_FAILURES.inc(reason="docker")
+            await self._rollback(container)
+            raise ProvisioningError(500, error_msg)
+        except Exception as e:
+            error_msg = f"Mission Start Failed: {str(e)}"
+            logger.exception(error_msg)
+            metrics.MISSION_START_FAILURES.inc(reason="error")
+            await self._rollback(container)
+            raise ProvisioningError(500, error_msg)
+        finally:
+            # 登録済み・失敗いずれの場合も予約枠を解放（成功時の容量予約はコンテナIDに移譲済み）
+            registry.release(user_id, challenge_id)
+            if container is not None and registry.get_by_container(container.id) is None:
+                # ロールバックしたコンテナの予約と公開ポート（配置を持つキーで解放する:
+                # コールドスタートは起動用のキー、ウォームプールはコンテナID）
+                self.sessions.release_capacity(admission_key, assigned_port if warm is None else None)
+                self.sessions.release_capacity(container.id, assigned_port if warm is not None else None)
+            else:
+                self.sessions.release_capacity(admission_key)
+
+    async def _create(self, admission_key, user_id, challenge_id, image_name, internal_port, instance_flag, report):
+        """Create and start a container on the placed node; returns (node, container, host_port, started)"""
+        port_key = f"{internal_port}/tcp"
+
+        # 配置先ノードを選び、そのノードに負荷を予約（成功時にコンテナIDへ移譲）
+        try:
+            node = self.node_pool.place(admission_key, image_name, self.sessions.container_memory)
+        except NoNodeAvailable as e:
+            raise ProvisioningError(503, str(e), {"Retry-After": "30"})
+        docker_client = node.client
+
+        # ネットワークの確認（起動時に作成済みだが、念のため再確認）
+        try:
+            networks = await self.executor.run(docker_client.networks.list, names=["ctf_net"])
+            if not networks:
+                logger.warning(f"ctf_net network not found on node {node.name}, creating...")
+                await self.executor.run(self.ensure_network, docker_client)
+        except Exception as net_error:
+            logger.warning(f"Network check failed: {net_error}")
+
+        # ノードにイメージが無ければ取得を試みる（通常は build 済み）
+        if not await self.executor.run(_image_exists, docker_client, image_name):
+            report("pulling", image=image_name, node=node.name)
+            try:
+                await self.executor.run(
+                    timed(DOCKER_OPERATION_SECONDS, operation="pull")(docker_client.images.pull), image_name
+                )
+            except docker.errors.DockerException:
+                self.node_pool.mark_image(node, image_name, present=False)
+                raise ProvisioningError(500, f"Docker image '{image_name}' not found. Please build the image first.")
+        self.node_pool.mark_image(node, image_name)
+
+        report("creating", node=node.name)
+        try:
+            # ノードの割り当て範囲から空きポートを取り、明示的に公開して作成・起動する
+            # （URLは起動前に確定。start イベントの監視は起動前に登録される）
+            container, assigned_port, started = await self.executor.run(
+                node.manager.create_published,
+                port_key,
+                image=image_name,
+                detach=True,
+                # Resource Limits (Ver 10.2 Security Standards)
+                mem_limit=self.memory_limit,
+                nano_cpus=int(float(self.cpu_limit) * 1000000000),
+                pids_limit=self.pids_limit,
+                # Security Constraints (PROJECT_MASTER.md 5.A準拠)
+                user="ctfuser",  # UID >= 1000, Root prohibited
+                security_opt=["no-new-privileges"],  # Privilege escalation prevention
+                network="ctf_net",  # 隔離ネットワーク（internal, no internet access）
+                environment={
+                    "CTF_FLAG": instance_flag  # flag_answer または導出した動的Flagをコンテナに注入
+                },
+                # 再起動時にセッションレジストリを復元するためのラベル
+                labels={
+                    "sol.user_id": user_id,
+                    "sol.challenge_id": challenge_id,
+                    "sol.internal_port": str(internal_port),
+                },
+            )
+            logger.info(
+                f"Container {container.short_id} started successfully on node {node.name} port {assigned_port} "
+                f"(cpu={self.cpu_limit}, mem={self.memory_limit}, pids={self.pids_limit})"
+            )
+        except PortsExhausted as e:
+            raise ProvisioningError(503, str(e), {"Retry-After": "30"})
+        except docker.errors.ImageNotFound:
+            self.node_pool.mark_image(node, image_name, present=False)
+            raise ProvisioningError(500, f"Docker image '{image_name}' not found. Please build the image first.")
+        except docker.errors.APIError as api_error:
+            raise ProvisioningError(500, f"Docker API error: {str(api_error)}")
+        return node, container, assigned_port, started
+
+    async def _wait_started(self, node, container, started, internal_port, assigned_port, deadline, report) -> str:
+        """Wait for the start event and the app inside; returns the proxy upstream"""
+        # 起動確認（Docker events の start イベントでコンテナIPを取得、ポーリングなし）
+        try:
+            endpoint = await asyncio.wait_for(asyncio.wrap_future(started), timeout=self.start_timeout_seconds)
+        except asyncio.TimeoutError:
+            raise Exception(f"Container did not start within {self.start_timeout_seconds} seconds")
+        upstream = upstream_address(node, endpoint.ip_address, internal_port, assigned_port)
+
+        # アプリの起動待ち（ヘルスチェック or 接続確認、指数バックオフ）
+        # 同一ホストのノードは ctf_net のコンテナIPへ TCP 接続、他ノードは公開ポートへ HTTP で確認
+        # （公開ポートは docker-proxy が先に待ち受けるため TCP 接続だけでは起動済みと判定できない）
+        if self.wait_ready:
+            ready_host, ready_port = (
+                (endpoint.ip_address, internal_port) if node.local else (node.container_host, assigned_port)
+            )
+            if ready_host:
+                ready = await asyncio.wrap_future(node.events.wait_ready(
+                    ready_host,
+                    ready_port,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    container_id=container.id,
+                    http=not node.local,
+                ))
+                if ready:
+                    report("healthy")
+                else:
+                    logger.warning(f"Container {container.short_id} did not become ready within the start timeout")
+        return upstream
+
+    async def _rollback(self, container) -> None:
+        """Remove the container of a failed start (best effort)"""
+        if container is None:
+            return
+        try:
+            await self.executor.run(kill_and_remove, container)
+            metrics.CONTAINER_ROLLBACKS.inc()
+            logger.warning("Zombie container removed after a failed start")
+        except Exception as rollback_error:
+            logger.warning(f"Rollback failed: {str(rollback_error)}")
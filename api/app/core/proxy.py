@@ -0,0 +1,282 @@
+"""
+Built-in reverse proxy from the API to mission containers (path or subdomain routing)
+"""
+
+import hashlib
+import hmac
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.metrics import PROXY_BYTES
+
+logger = logging.getLogger(__name__)
+
+TOKEN_LENGTH = 32
+SHORT_ID_LENGTH = 12  # トークン先頭のコンテナ短縮ID、残りは署名
+_TOKEN_RE = re.compile(rf"^[0-9a-f]{{{TOKEN_LENGTH}}}$")
+
+# 接続ごとのヘッダー（転送しない）。Host は upstream 用に付け直す
+HOP_BY_HOP_HEADERS = frozenset({
+    b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+    b"te", b"trailer", b"transfer-encoding", b"upgrade", b"host",
+})
+# プレイヤーの API 認証情報はコンテナ（信頼できないコード）に渡さない
+CREDENTIAL_HEADERS = frozenset({b"authorization"})
+# Supabase の認証 Cookie（sb-<project>-auth-token, 分割時は .0 / .1 ...）
+AUTH_COOKIE_PREFIXES = ("sb-",)
+
+
+class UpstreamError(Exception):
+    """The container could not be reached (502) or did not answer in time (504)"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _sign(secret: bytes, value: str, length: int) -> str:
+    return hmac.new(secret, value.encode(), hashlib.sha256).hexdigest()[:length]
+
+
+def session_token(secret: bytes, container_id: str) -> str:
+    """
+    Routing token for a container: its short id followed by an HMAC of that
+    id (lowercase hex, usable as a DNS label).
+
+    The token is derived from the container id alone, so sessions rebuilt
+    from container labels at startup get the same token they were handed
+    out with, while the signature keeps it unguessable.
+    """
+    short_id = container_id[:SHORT_ID_LENGTH]
+    return short_id + _sign(secret, short_id, TOKEN_LENGTH - SHORT_ID_LENGTH)
+
+
+def shared_token(secret: bytes, key: str) -> str:
+    """Unguessable routing token for a non-container key (shared replica assignment)"""
+    return _sign(secret, key, TOKEN_LENGTH)
+
+
+def is_session_token(value: str) -> bool:
+    return bool(_TOKEN_RE.match(value))
+
+
+def upstream_request_headers(
+    headers: Iterable[Tuple[bytes, bytes]],
+    strip_cookie_prefixes: Iterable[str] = AUTH_COOKIE_PREFIXES,
+) -> List[Tuple[bytes, bytes]]:
+    """
+    Request headers forwarded to a container: hop-by-hop headers and
+    ``Authorization`` are dropped, and cookies whose name starts with one of
+    ``strip_cookie_prefixes`` are removed from ``Cookie``.
+    """
+    prefixes = tuple(prefix.encode() for prefix in strip_cookie_prefixes if prefix)
+    forwarded = []
+    for name, value in headers:
+        lowered = name.lower()
+        if lowered in HOP_BY_HOP_HEADERS or lowered in CREDENTIAL_HEADERS:
+            continue
+        if lowered == b"cookie" and prefixes:
+            cookies = [c.strip() for c in value.split(b";")]
+            cookies = [c for c in cookies if c and not c.startswith(prefixes)]
+            if not cookies:
+                continue
+            value = b"; ".join(cookies)
+        forwarded.append((name, value))
+    return forwarded
+
+
+def hostname(value: str) -> Optional[str]:
+    """Lowercase host name of a URL or a Host header ("https://Play.example.com:443" -> "play.example.com")"""
+    if not value:
+        return None
+    try:
+        return urlsplit(value if "://" in value else f"//{value}").hostname
+    except ValueError:
+        return None
+
+
+def token_from_host(host: str, domain: str) -> Optional[str]:
+    """"<token>.ctf.example.com:443" -> token when ``domain`` is "ctf.example.com\""""
+    if not host or not domain:
+        return None
+    hostname = host.split(":", 1)[0].lower()
+    suffix = "." + domain.strip(".").lower()
+    if not hostname.endswith(suffix):
+        return None
+    label = hostname[:-len(suffix)]
+    return label if is_session_token(label) else None
+
+
+@dataclass
+class Traffic:
+    """Per-session request and byte counters"""
+    requests: int = 0
+    bytes_in: int = 0  # クライアント -> コンテナ
+    bytes_out: int = 0  # コンテナ -> クライアント
+    in_flight: int = 0
+    last_seen: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "in_flight": self.in_flight,
+            "idle_seconds": round(time.monotonic() - self.last_seen, 1),
+        }
+
+
+class ReverseProxy:
+    """
+    Streams HTTP requests to mission containers over one pooled
+    ``httpx.AsyncClient``.
+
+    Request and response bodies are passed through chunk by chunk (never
+    buffered), so downloads and long polls cost no memory. Every chunk
+    updates the session's ``Traffic`` and calls ``on_activity(key)``,
+    which makes proxied traffic a free idle signal. WebSocket upgrades
+    are not proxied.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 200,
+        max_keepalive: int = 50,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        on_activity: Optional[Callable[[str], None]] = None,
+        strip_cookie_prefixes: Iterable[str] = AUTH_COOKIE_PREFIXES,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.on_activity = on_activity
+        self.strip_cookie_prefixes = tuple(strip_cookie_prefixes)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._traffic: Dict[str, Traffic] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # upstream の Location などはそのまま返す（リダイレクトはブラウザに任せる）
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, follow_redirects=False)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- Traffic accounting ---
+
+    def traffic(self, key: str) -> Optional[Traffic]:
+        return self._traffic.get(key)
+
+    def forget(self, key: str) -> None:
+        self._traffic.pop(key, None)
+
+    def _record(self, traffic: Traffic, key: str) -> None:
+        traffic.last_seen = time.monotonic()
+        if self.on_activity is not None:
+            self.on_activity(key)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._traffic),
+            "in_flight": sum(t.in_flight for t in self._traffic.values()),
+            "bytes_in": sum(t.bytes_in for t in self._traffic.values()),
+            "bytes_out": sum(t.bytes_out for t in self._traffic.values()),
+        }
+
+    # --- Forwarding ---
+
+    async def forward(
+        self,
+        key: str,
+        upstream: str,
+        method: str,
+        path: str,
+        query: str,
+        headers: Iterable[Tuple[bytes, bytes]],
+        body: AsyncIterator[bytes],
+        forwarded: Dict[str, str],
+        prefix: str = "",
+    ) -> Tuple[int, List[Tuple[bytes, bytes]], AsyncIterator[bytes]]:
+        """
+        Send one request to ``upstream`` ("host:port") and return
+        (status, headers, body iterator) as soon as the response headers
+        arrive. The body iterator closes the upstream response when it ends.
+
+        The player's credentials (``Authorization``, auth cookies) are not
+        forwarded. ``forwarded`` adds X-Forwarded-* headers; ``prefix`` (path
+        routing) is prepended to absolute-path redirects so they stay on the proxy.
+
+        Raises:
+            UpstreamError: connection failed (502) or timed out (504)
+        """
+        traffic = self._traffic.setdefault(key, Traffic())
+        traffic.requests += 1
+        self._record(traffic, key)
+
+        headers = list(headers)
+        request_headers = upstream_request_headers(headers, self.strip_cookie_prefixes)
+        request_headers.extend((f"x-forwarded-{name}".encode(), value.encode()) for name, value in forwarded.items())
+        if prefix:
+            request_headers.append((b"x-forwarded-prefix", prefix.encode()))
+
+        async def request_body() -> AsyncIterator[bytes]:
+            async for chunk in body:
+                if chunk:
+                    traffic.bytes_in += len(chunk)
+                    PROXY_BYTES.inc(len(chunk), direction="in")
+                    self._record(traffic, key)
+                    yield chunk
+
+        url = f"http://{upstream}{path}" + (f"?{query}" if query else "")
+        has_body = method not in ("GET", "HEAD", "OPTIONS") or any(
+            k.lower() in (b"content-length", b"transfer-encoding") for k, _ in headers
+        )
+        request = self.client.build_request(
+            method, url, headers=request_headers, content=request_body() if has_body else None
+        )
+        try:
+            response = await self.client.send(request, stream=True)
+        except httpx.TimeoutException as e:
+            raise UpstreamError(f"Mission container did not respond: {e}", status_code=504)
+        except httpx.HTTPError as e:
+            raise UpstreamError(f"Mission container is unreachable: {e}")
+
+        response_headers = []
+        for name, value in response.headers.raw:
+            lowered = name.lower()
+            if lowered in HOP_BY_HOP_HEADERS:
+                continue
+            if prefix and lowered == b"location" and value.startswith(b"/") and not value.startswith(b"//"):
+                value = prefix.encode() + value
+            response_headers.append((name, value))
+
+        async def response_body() -> AsyncIterator[bytes]:
+            traffic.in_flight += 1
+            try:
+                async for chunk in response.aiter_raw():
+                    traffic.bytes_out += len(chunk)
+                    PROXY_BYTES.inc(len(chunk), direction="out")
+                    self._record(traffic, key)
+                    yield chunk
+            except httpx.HTTPError as e:
+                logger.debug(f"Upstream stream for {key[:12]} ended early: {e}")
+            finally:
+                traffic.in_flight -= 1
+                await response.aclose()
+
+        return response.status_code, response_headers, response_body()
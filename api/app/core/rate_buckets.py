@@ -0,0 +1,194 @@
+"""
+Token bucket stores for the rate limiter
+
+Kept free of FastAPI imports so the bucket arithmetic can be used (and
+tested) on its own; ``app.core.rate_limiter`` wires a store into endpoints.
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """"5/minute" -> (capacity 5, refill 5/60 tokens per second)"""
+    count, _, period = rate.partition("/")
+    seconds = _PERIODS[period.strip().rstrip("s")]
+    capacity = int(count)
+    return capacity, capacity / seconds
+
+
+class MemoryBucketStore:
+    """
+    Buckets in process memory.
+
+    A bucket that has refilled to capacity behaves exactly like a missing
+    one, so buckets are evicted once full again (swept every
+    ``sweep_seconds``). Past ``max_buckets`` the least recently used are
+    dropped as well, which only ever errs on the side of allowing requests.
+    """
+
+    blocking = False
+
+    def __init__(self, max_buckets: int = 100_000, sweep_seconds: float = 60.0):
+        self.max_buckets = max_buckets
+        self.sweep_seconds = sweep_seconds
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # key -> (tokens, updated, full at)
+        self._next_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, keys: List[str], capacity: int, refill_rate: float, now: float) -> float:
+        with self._lock:
+            if now >= self._next_sweep or len(self._buckets) >= self.max_buckets:
+                self._evict_locked(now)
+            levels = []
+            for key in keys:
+                tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+                levels.append(min(capacity, tokens + (now - updated) * refill_rate))
+            wait = max((1 - level) / refill_rate for level in levels)
+            if wait > 0:
+                return wait
+            for key, level in zip(keys, levels):
+                tokens = level - 1
+                self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+            return 0.0
+
+    def _evict_locked(self, now: float) -> None:
+        self._next_sweep = now + self.sweep_seconds
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+        overflow = len(self._buckets) - self.max_buckets + 1
+        if overflow > 0:
+            # 上限を超えた分は最後の利用が古い順に破棄（満タン扱いになるだけ）
+            for key in sorted(self._buckets, key=lambda k: self._buckets[k][1])[:overflow]:
+                del self._buckets[key]
+
+
+class SQLiteBucketStore:
+    """
+    Buckets in a WAL-mode SQLite file shared by all workers on the host.
+
+    A decision is one ``BEGIN IMMEDIATE`` transaction (atomic across
+    processes); with ``synchronous=NORMAL`` WAL commits do not fsync, so this
+    stays well under a millisecond on a local disk.
+    """
+
+    PRUNE_PROBABILITY = 0.001
+    blocking = True  # ロック待ちがあるため、イベントループではなくスレッドプールで呼ぶ
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, keys: List[str], capacity: int, refill_rate: float, now: float) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            placeholders = ",".join("?" * len(keys))
+            rows = dict(
+                (key, (tokens, updated))
+                for key, tokens, updated in conn.execute(
+                    f"SELECT key, tokens, updated FROM buckets WHERE key IN ({placeholders})", keys
+                )
+            )
+            levels = []
+            for key in keys:
+                tokens, updated = rows.get(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated) * refill_rate))
+            wait = max((1 - level) / refill_rate for level in levels)
+            if wait <= 0:
+                conn.executemany(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    [(key, level - 1, now) for key, level in zip(keys, levels)],
+                )
+            if random.random() < self.PRUNE_PROBABILITY:
+                # 満タンに戻った古いバケットは削除しても結果が変わらない
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 86400,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return max(0.0, wait)
+
+
+class RedisBucketStore:
+    """
+    Buckets in a Redis-protocol server, shared by every node.
+
+    The refill-and-take step runs as one Lua script, so it is atomic on the
+    server. Requires the optional ``redis`` package.
+    """
+
+    blocking = True
+
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local bucket = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    local level = math.min(capacity, tokens + (now - updated) * rate)
+    levels[i] = level
+    wait = math.max(wait, (1 - level) / rate)
+end
+if wait <= 0 then
+    for i, key in ipairs(KEYS) do
+        redis.call('HSET', key, 'tokens', levels[i] - 1, 'updated', now)
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URI uses redis:// but the redis package is not installed") from e
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, keys: List[str], capacity: int, refill_rate: float, now: float) -> float:
+        ttl = int(math.ceil(capacity / refill_rate)) + 1
+        return max(0.0, float(self._script(keys=keys, args=[capacity, refill_rate, now, ttl])))
+
+
+def create_store(uri: str):
+    if uri.startswith("sqlite://"):
+        return SQLiteBucketStore(uri[len("sqlite://"):])
+    if uri.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketStore(uri)
+    if uri.startswith("memory://"):
+        return MemoryBucketStore()
+    raise ValueError(f"Unsupported RATE_LIMIT_STORAGE_URI: {uri}")
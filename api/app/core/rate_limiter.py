@@ -1,11 +1,125 @@
 """
-Rate limiting configuration using slowapi
+Rate limiting with token buckets
+
+Buckets live in a store selected by ``RATE_LIMIT_STORAGE_URI``:
+
+- ``memory://``               in the API process (default; the API runs as one process)
+- ``sqlite:///path/to/file``  WAL-mode SQLite file, shared by processes that
+                              see the same file (a volume mounted into every replica)
+- ``redis://host:port/db``    any Redis-protocol server, shared by every replica
+
+Each request is charged against a user bucket and an IP bucket in one atomic
+step; it is rejected (429 + Retry-After) if either is empty.
 """
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from fastapi import Request, Response
+import functools
+import inspect
+import logging
+import math
+import threading
+import time
+from typing import List, Optional
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.rate_buckets import create_store, parse_rate
+
+logger = logging.getLogger(__name__)
+
+
+def get_remote_address(request: Request) -> str:
+    return request.client.host if request.client else "127.0.0.1"
+
+
+class RateLimiter:
+    """
+    ``@limiter.limit("5/minute")`` for FastAPI endpoints (slowapi-compatible
+    usage: the endpoint must accept ``request: Request``).
+
+    The user id is taken from the endpoint's ``current_user`` argument when it
+    is authenticated, so the limit follows the account as well as the IP. If
+    the store is unreachable the request is allowed (fail open) and logged.
+    Stores that do I/O (SQLite, Redis) are called from the thread pool so
+    async endpoints never block the event loop on them.
+    """
+
+    def __init__(self, storage_uri: str = "memory://", key_by: str = "user,ip", key_prefix: str = "rl"):
+        self.storage_uri = storage_uri
+        self.key_by = {k.strip() for k in key_by.split(",") if k.strip()}
+        self.key_prefix = key_prefix
+        self._store = None
+        self._store_lock = threading.Lock()
+
+    @property
+    def store(self):
+        # フォーク後の各ワーカーで接続を作るため遅延生成
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = create_store(self.storage_uri)
+        return self._store
+
+    def _store_blocks(self) -> bool:
+        try:
+            return self.store.blocking
+        except Exception:
+            return False  # 生成に失敗した保存先は check() が記録して通す
+
+    def _keys(self, scope: str, request: Optional[Request], current_user: Optional[dict]) -> List[str]:
+        keys = []
+        if "user" in self.key_by and current_user and current_user.get("id"):
+            keys.append(f"{self.key_prefix}:{scope}:user:{current_user['id']}")
+        if "ip" in self.key_by and request is not None:
+            keys.append(f"{self.key_prefix}:{scope}:ip:{get_remote_address(request)}")
+        return keys
+
+    def check(self, scope: str, rate: str, request: Optional[Request], current_user: Optional[dict] = None) -> None:
+        """Charge one token; raises HTTPException(429) with Retry-After when empty"""
+        keys = self._keys(scope, request, current_user)
+        if not keys:
+            return
+        capacity, refill_rate = parse_rate(rate)
+        try:
+            wait = self.store.take(keys, capacity, refill_rate, time.time())
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded: {rate}",
+                headers={"Retry-After": str(int(math.ceil(wait)))},
+            )
+
+    def limit(self, rate: str):
+        def decorator(func):
+            scope = f"{func.__module__}.{func.__name__}"
+
+            def _check(args, kwargs):
+                request = kwargs.get("request")
+                if request is None:
+                    request = next((a for a in args if isinstance(a, Request)), None)
+                self.check(scope, rate, request, kwargs.get("current_user"))
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if self._store_blocks():
+                        await run_in_threadpool(_check, args, kwargs)
+                    else:
+                        _check(args, kwargs)
+                    return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def sync_wrapper(*args, **kwargs):
+                _check(args, kwargs)
+                return func(*args, **kwargs)
+            return sync_wrapper
+
+        return decorator
 
-limiter = Limiter(key_func=get_remote_address)
 
+limiter = RateLimiter(storage_uri=settings.RATE_LIMIT_STORAGE_URI, key_by=settings.RATE_LIMIT_KEY_BY)
@@ -0,0 +1,255 @@
+"""
+Container port/readiness detection driven by the Docker events API
+"""
+
+import http.client
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _accepts_tcp(host: str, port: int, timeout: float) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _answers_http(host: str, port: int, timeout: float) -> bool:
+    """Any HTTP response (including 4xx / 5xx) means the app is serving"""
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("GET", "/")
+        conn.getresponse()
+        return True
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+
+def _settle(future: Future, result=None, error: Optional[BaseException] = None) -> None:
+    """Resolve ``future`` unless another thread already did"""
+    if future.done():
+        return
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+@dataclass
+class ContainerEndpoint:
+    """Where a started container can be reached"""
+    container_id: str
+    host_port: Optional[int]
+    ip_address: Optional[str]
+
+
+class ContainerEventWatcher:
+    """
+    Subscribes to the Docker events stream once per process.
+
+    ``watch_start()`` returns a Future resolved from the container's ``start``
+    event (one inspect, no polling). ``wait_ready()`` returns a Future that
+    resolves once the container reports ``healthy`` or answers a probe
+    (TCP connect, or an HTTP request with ``http=True``) with a short
+    exponential backoff.
+    Register watches *before* starting the container to avoid missing events.
+    """
+
+    def __init__(self, client, network: Optional[str] = None, probe_workers: int = 16):
+        self.client = client
+        self.network = network
+        self._lock = threading.Lock()
+        self._start_watches: Dict[str, List[Tuple[str, Future]]] = {}
+        self._ready_watches: Dict[str, List[Future]] = {}
+        self._probe_executor = ThreadPoolExecutor(max_workers=probe_workers, thread_name_prefix="readiness")
+        self._thread: Optional[threading.Thread] = None
+        self._stream = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background event subscriber (idempotent)"""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="docker-events", daemon=True)
+        self._thread.start()
+        logger.info("Docker events watcher started")
+
+    def stop(self) -> None:
+        self._stopping.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._probe_executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Docker events watcher stopped")
+
+    def watch_start(self, container_id: str, port_key: str) -> Future:
+        """Future[ContainerEndpoint] resolved when ``container_id`` starts"""
+        future: Future = Future()
+        with self._lock:
+            self._start_watches.setdefault(container_id, []).append((port_key, future))
+        future.add_done_callback(lambda f: self._forget(self._start_watches, container_id, (port_key, f)))
+        if not self.running:
+            # イベント購読が無い場合はInspectのポーリングにフォールバック
+            self._probe_executor.submit(self._poll_start, future, container_id)
+        return future
+
+    def wait_ready(
+        self,
+        host: str,
+        port: int,
+        timeout: float = 30.0,
+        container_id: Optional[str] = None,
+        http: bool = False,
+    ) -> Future:
+        """
+        Future[bool]: True once ready, False on timeout.
+
+        Probe the container's own IP with TCP. A published host port
+        accepts connections as soon as docker-proxy listens, before the app
+        does, so probe those with ``http=True`` (any HTTP response counts).
+        Fails with RuntimeError if the watched container dies first.
+        """
+        future: Future = Future()
+        if container_id:
+            with self._lock:
+                self._ready_watches.setdefault(container_id, []).append(future)
+            future.add_done_callback(lambda f: self._forget(self._ready_watches, container_id, f))
+        check = _answers_http if http else _accepts_tcp
+        self._probe_executor.submit(self._probe, future, check, host, port, timeout)
+        return future
+
+    def _forget(self, registry: dict, container_id: str, item) -> None:
+        with self._lock:
+            entries = registry.get(container_id)
+            if entries and item in entries:
+                entries.remove(item)
+                if not entries:
+                    registry.pop(container_id, None)
+
+    def _poll_start(self, future: Future, container_id: str, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while not future.done() and time.monotonic() < deadline:
+            self._resolve_start(container_id)
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    def _run(self) -> None:
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                self._stream = self.client.events(
+                    decode=True,
+                    filters={"type": "container", "event": ["start", "die", "health_status"]},
+                )
+                backoff = 0.5
+                for event in self._stream:
+                    self._handle_event(event)
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                logger.warning(f"Docker events stream interrupted: {e}")
+            finally:
+                self._stream = None
+            if not self._stopping.wait(backoff):
+                backoff = min(backoff * 2, 10.0)
+                # 切断中に開始したコンテナを取りこぼさないよう保留中の監視を解決
+                with self._lock:
+                    pending = list(self._start_watches)
+                for container_id in pending:
+                    self._probe_executor.submit(self._resolve_start, container_id)
+
+    def _handle_event(self, event: dict) -> None:
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        action = event.get("Action") or event.get("status") or ""
+        if not container_id:
+            return
+
+        if action == "start":
+            if container_id in self._start_watches:
+                self._resolve_start(container_id)
+        elif action.startswith("health_status") and action.endswith("healthy") and "unhealthy" not in action:
+            self._complete(self._ready_watches, container_id, True)
+        elif action == "die":
+            error = RuntimeError(f"Container {container_id[:12]} exited before becoming ready")
+            self._fail(self._start_watches, container_id, error)
+            self._fail(self._ready_watches, container_id, error)
+
+    def _resolve_start(self, container_id: str) -> None:
+        with self._lock:
+            watches = list(self._start_watches.get(container_id, []))
+        if not watches:
+            return
+        try:
+            attrs = self.client.api.inspect_container(container_id)
+        except Exception as e:
+            for _, future in watches:
+                _settle(future, error=e)
+            return
+
+        if not attrs.get("State", {}).get("Running"):
+            return  # まだ起動していない（start イベントを待つ）
+
+        net_settings = attrs.get("NetworkSettings", {})
+        networks = net_settings.get("Networks") or {}
+        network = networks.get(self.network) if self.network else None
+        if network is None and networks:
+            network = next(iter(networks.values()))
+        ip_address = (network or {}).get("IPAddress") or None
+
+        for port_key, future in watches:
+            bindings = (net_settings.get("Ports") or {}).get(port_key)
+            host_port = int(bindings[0]["HostPort"]) if bindings else None
+            _settle(future, ContainerEndpoint(container_id, host_port, ip_address))
+
+    def _complete(self, registry: dict, container_id: str, result) -> None:
+        with self._lock:
+            futures = list(registry.get(container_id, []))
+        for future in futures:
+            _settle(future, result)
+
+    def _fail(self, registry: dict, container_id: str, error: Exception) -> None:
+        with self._lock:
+            entries = list(registry.get(container_id, []))
+        for entry in entries:
+            future = entry[1] if isinstance(entry, tuple) else entry
+            _settle(future, error=error)
+
+    @staticmethod
+    def _probe(future: Future, check, host: str, port: int, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while not future.done():
+            if check(host, port, min(1.0, timeout)):
+                _settle(future, True)
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+        _settle(future, False)
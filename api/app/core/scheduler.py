@@ -3,36 +3,75 @@ Scheduler for self-healing container cleanup
 """
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from typing import Callable, Iterable, Optional
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class SchedulerManager:
-    """Manages background tasks for container cleanup"""
+    """
+    Manages background tasks for container cleanup
     
-    def __init__(self, docker_manager):
-        self.docker_manager = docker_manager
+    Per-instance expiry is handled by ExpiryScheduler; this only runs the
+    rare reconciliation sweep for containers the heap does not track
+    (``known_ids`` returns the ids to skip), on every Docker node, and the
+    periodic node inventory refresh (cached images, published host ports)
+    that is kept out of the health probe.
+    """
+    
+    def __init__(
+        self,
+        docker_managers: Iterable,
+        known_ids: Optional[Callable[[], set]] = None,
+        interval_minutes: int = 30,
+        node_pool=None,
+        inventory_refresh_seconds: float = 60.0,
+    ):
+        self.docker_managers = list(docker_managers)
+        self.known_ids = known_ids
+        self.interval_minutes = interval_minutes
+        self.node_pool = node_pool
+        self.inventory_refresh_seconds = inventory_refresh_seconds
         self.scheduler = AsyncIOScheduler()
     
+    async def reconcile(self):
+        """Remove expired containers that are not tracked by the expiry heap"""
+        known = self.known_ids() if self.known_ids else set()
+        removed = 0
+        for docker_manager in self.docker_managers:
+            removed += await asyncio.to_thread(docker_manager.cleanup_expired_containers, known)
+        if removed:
+            logger.info(f"Reconciliation removed {removed} untracked expired containers")
+    
+    async def refresh_inventory(self):
+        """Re-read cached images and published host ports of every reachable node"""
+        await asyncio.to_thread(self.node_pool.refresh_inventories)
+    
     def start(self):
-        """Start scheduler with cleanup job"""
-        # Run cleanup every 5 minutes
+        """Start scheduler with cleanup and inventory jobs"""
         self.scheduler.add_job(
-            self.docker_manager.cleanup_expired_containers,
-            trigger=CronTrigger(minute="*/5"),
+            self.reconcile,
+            trigger=IntervalTrigger(minutes=self.interval_minutes),
             id="cleanup_expired_containers",
             replace_existing=True
         )
+        if self.node_pool is not None and self.inventory_refresh_seconds > 0:
+            self.scheduler.add_job(
+                self.refresh_inventory,
+                trigger=IntervalTrigger(seconds=self.inventory_refresh_seconds),
+                id="refresh_node_inventory",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
         
         self.scheduler.start()
-        logger.info("Scheduler started: Cleanup job scheduled (every 5 minutes)")
+        logger.info(f"Scheduler started: Reconciliation job scheduled (every {self.interval_minutes} minutes)")
     
     def shutdown(self):
         """Shutdown scheduler"""
         self.scheduler.shutdown()
         logger.info("Scheduler shut down")
-
-
-
@@ -0,0 +1,198 @@
+"""
+In-memory scoreboard and per-challenge solve statistics, maintained incrementally
+"""
+
+import bisect
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_timestamp(value) -> float:
+    """submission_logs.created_at (ISO 8601 string / datetime / epoch) -> epoch seconds"""
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time()
+
+
+@dataclass
+class _Player:
+    score: int = 0
+    solved: Set[str] = field(default_factory=set)
+    last_solve_at: float = 0.0
+
+    def key(self, user_id: str) -> Tuple[int, float, str]:
+        # 高得点順、同点なら先に到達した順
+        return (-self.score, self.last_solve_at, user_id)
+
+
+@dataclass
+class _ChallengeStats:
+    solvers: int = 0
+    attempted: Set[str] = field(default_factory=set)
+    first_blood_user: Optional[str] = None
+    first_blood_at: Optional[float] = None
+
+
+class Scoreboard:
+    """
+    Per-user scores and per-challenge solve stats, updated on each accepted
+    submission.
+
+    ``bootstrap()`` replays submission_logs once at startup; ``record()``
+    applies one submission (a user's first correct answer per challenge
+    scores, repeats are ignored). Players are kept in a list sorted by
+    (-score, last solve time, user id) with bisect, so ``top(k)`` is a
+    slice and ``rank_of()`` a binary search; a solve moves one entry.
+    State is per worker process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._points: Dict[str, int] = {}
+        self._players: Dict[str, _Player] = {}
+        self._challenges: Dict[str, _ChallengeStats] = {}
+        self._ranking: List[Tuple[int, float, str]] = []
+        self.loaded = False
+
+    # --- Loading ---
+
+    def bootstrap(self, points: Dict[str, int], submissions: Iterable[dict]) -> int:
+        """
+        Rebuild from challenge points and every submission (oldest first).
+
+        Rows need ``user_id``, ``challenge_id``, ``is_correct`` and
+        ``created_at``. Returns the number of rows replayed.
+        """
+        players: Dict[str, _Player] = {}
+        challenges: Dict[str, _ChallengeStats] = {cid: _ChallengeStats() for cid in points}
+        count = 0
+        for row in submissions:
+            user_id, challenge_id = row.get("user_id"), row.get("challenge_id")
+            if not user_id or not challenge_id:
+                continue
+            self._apply(players, challenges, points, user_id, challenge_id,
+                        bool(row.get("is_correct")), parse_timestamp(row.get("created_at")))
+            count += 1
+        ranking = sorted(p.key(uid) for uid, p in players.items() if p.solved)
+        with self._lock:
+            self._points = dict(points)
+            self._players = players
+            self._challenges = challenges
+            self._ranking = ranking
+            self.loaded = True
+        logger.info(f"Scoreboard bootstrapped: {count} submissions, {len(ranking)} players")
+        return count
+
+    def set_points(self, points: Dict[str, int]) -> None:
+        """Apply changed challenge points (redeploys); rescoring is O(players log players)"""
+        with self._lock:
+            if points == self._points:
+                return
+            self._points = dict(points)
+            for challenge_id in points:
+                self._challenges.setdefault(challenge_id, _ChallengeStats())
+            for player in self._players.values():
+                player.score = sum(points.get(cid, 0) for cid in player.solved)
+            self._ranking = sorted(p.key(uid) for uid, p in self._players.items() if p.solved)
+
+    # --- Updates ---
+
+    @staticmethod
+    def _apply(players, challenges, points, user_id, challenge_id, correct, at) -> Optional[_Player]:
+        """Apply one submission; returns the player if it was a new solve"""
+        stats = challenges.setdefault(challenge_id, _ChallengeStats())
+        stats.attempted.add(user_id)
+        if not correct:
+            return None
+        player = players.setdefault(user_id, _Player())
+        if challenge_id in player.solved:
+            return None
+        player.solved.add(challenge_id)
+        player.score += points.get(challenge_id, 0)
+        player.last_solve_at = max(player.last_solve_at, at)
+        stats.solvers += 1
+        if stats.first_blood_at is None or at < stats.first_blood_at:
+            stats.first_blood_user, stats.first_blood_at = user_id, at
+        return player
+
+    def record(self, user_id: str, challenge_id: str, correct: bool, at: Optional[float] = None) -> bool:
+        """Apply one submission; returns True if it was the user's first solve of the challenge"""
+        at = time.time() if at is None else at
+        with self._lock:
+            player = self._players.get(user_id)
+            old_key = player.key(user_id) if player is not None and player.solved else None
+            player = self._apply(self._players, self._challenges, self._points, user_id, challenge_id, correct, at)
+            if player is None:
+                return False
+            if old_key is not None:
+                index = bisect.bisect_left(self._ranking, old_key)
+                if index < len(self._ranking) and self._ranking[index] == old_key:
+                    del self._ranking[index]
+            bisect.insort(self._ranking, player.key(user_id))
+            return True
+
+    # --- Reads ---
+
+    def _entry(self, rank: int, key: Tuple[int, float, str]) -> dict:
+        user_id = key[2]
+        player = self._players[user_id]
+        return {
+            "rank": rank,
+            "user_id": user_id,
+            "score": player.score,
+            "solves": len(player.solved),
+            "last_solve_at": datetime.utcfromtimestamp(player.last_solve_at).isoformat() + "Z",
+        }
+
+    def top(self, k: int) -> List[dict]:
+        with self._lock:
+            return [self._entry(i + 1, key) for i, key in enumerate(self._ranking[:max(0, k)])]
+
+    def rank_of(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            player = self._players.get(user_id)
+            if player is None or not player.solved:
+                return None
+            key = player.key(user_id)
+            return self._entry(bisect.bisect_left(self._ranking, key) + 1, key)
+
+    def solved_by(self, user_id: str) -> Set[str]:
+        player = self._players.get(user_id)
+        return set(player.solved) if player is not None else set()
+
+    def solved_sets(self) -> List[Tuple[str, Set[str]]]:
+        """(user_id, solved challenge ids) for every player"""
+        with self._lock:
+            return [(user_id, set(player.solved)) for user_id, player in self._players.items()]
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def challenge_stats(self) -> Dict[str, dict]:
+        """Solves, attempts, solve rate (solvers / users who submitted) and first blood per challenge"""
+        with self._lock:
+            return {
+                challenge_id: {
+                    "solves": stats.solvers,
+                    "attempts": len(stats.attempted),
+                    "solve_rate": round(stats.solvers / len(stats.attempted), 4) if stats.attempted else 0.0,
+                    "first_blood": {
+                        "user_id": stats.first_blood_user,
+                        "at": datetime.utcfromtimestamp(stats.first_blood_at).isoformat() + "Z",
+                    } if stats.first_blood_at is not None else None,
+                }
+                for challenge_id, stats in self._challenges.items()
+            }
@@ -0,0 +1,276 @@
+"""
+Active-session registry mapping users to their running mission containers
+"""
+
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SHORT_ID_LENGTH = 12
+
+
+class SessionQuotaExceeded(Exception):
+    """Raised when a user already runs the maximum number of instances"""
+
+
+@dataclass
+class Session:
+    """One running mission instance owned by a user"""
+    user_id: str
+    challenge_id: str
+    container_id: str
+    port: int
+    url: str
+    challenge_name: Optional[str] = None
+    started_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    # 有効期限（延長時に更新してDBに保存し、再起動後も延長後の期限で期限切れにする）
+    expires_at: Optional[datetime] = None
+    # アイドル検出で docker pause 中（DBには保存せず、再起動時はコンテナの状態から復元）
+    paused: bool = False
+    # リバースプロキシ用のルーティングトークンと転送先 "host:port"（DBには保存せず起動時に再計算）
+    token: Optional[str] = None
+    upstream: Optional[str] = None
+
+    @property
+    def short_id(self) -> str:
+        return self.container_id[:SHORT_ID_LENGTH]
+
+    def to_row(self) -> dict:
+        """Row for the persisted sessions table"""
+        return {
+            "container_id": self.container_id,
+            "user_id": self.user_id,
+            "challenge_id": self.challenge_id,
+            "port": self.port,
+            "start_time": self.started_at.isoformat(),
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+        }
+
+
+class SessionRegistry:
+    """
+    In-memory index of running sessions with O(1) lookups by user,
+    by (user, challenge), by challenge, by container (full or short id)
+    and by proxy token.
+
+    Changes are persisted write-behind through ``persist_upsert`` /
+    ``persist_delete`` on a background thread; the in-memory state is the
+    source of truth and is rebuilt from container labels on restart.
+    """
+
+    def __init__(
+        self,
+        max_per_user: int = 3,
+        persist_upsert: Optional[Callable[[List[dict]], None]] = None,
+        persist_delete: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.max_per_user = max_per_user
+        self.persist_upsert = persist_upsert
+        self.persist_delete = persist_delete
+        self._lock = threading.Lock()
+        self._by_container: Dict[str, Session] = {}
+        self._by_short_id: Dict[str, Session] = {}
+        self._by_token: Dict[str, Session] = {}
+        self._by_user: Dict[str, Dict[str, Session]] = {}
+        self._by_challenge: Dict[str, Set[str]] = {}
+        self._pending: Set[Tuple[str, str]] = set()
+        self._persist_queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Lookups ---
+
+    def get(self, user_id: str, challenge_id: str) -> Optional[Session]:
+        return self._by_user.get(user_id, {}).get(challenge_id)
+
+    def get_by_container(self, container_id: str) -> Optional[Session]:
+        """Look up by full or short (12 char) container id"""
+        return self._by_container.get(container_id) or self._by_short_id.get(container_id)
+
+    def get_by_token(self, token: str) -> Optional[Session]:
+        return self._by_token.get(token)
+
+    def for_user(self, user_id: str) -> List[Session]:
+        return list(self._by_user.get(user_id, {}).values())
+
+    def for_challenge(self, challenge_id: str) -> List[Session]:
+        ids = self._by_challenge.get(challenge_id, set())
+        return [self._by_container[cid] for cid in list(ids) if cid in self._by_container]
+
+    def active(self) -> List[Session]:
+        """Sessions whose container is not paused"""
+        return [session for session in self._by_container.values() if not session.paused]
+
+    def count_for_challenge(self, challenge_id: str) -> int:
+        return len(self._by_challenge.get(challenge_id, ()))
+
+    def all(self) -> List[Session]:
+        return list(self._by_container.values())
+
+    def __len__(self) -> int:
+        return len(self._by_container)
+
+    # --- Start reservation (idempotency + quota) ---
+
+    def reserve(self, user_id: str, challenge_id: str) -> Optional[Session]:
+        """
+        Reserve a start slot for (user, challenge).
+
+        Returns the existing session if one is already running (the caller
+        should return it instead of starting a duplicate), otherwise None and
+        the slot is held until ``add()`` or ``release()``.
+
+        Raises:
+            SessionQuotaExceeded: user is at ``max_per_user`` instances, or a
+                start for the same challenge is already in progress
+        """
+        with self._lock:
+            existing = self.get(user_id, challenge_id)
+            if existing is not None:
+                return existing
+            key = (user_id, challenge_id)
+            if key in self._pending:
+                raise SessionQuotaExceeded("A start for this challenge is already in progress")
+            in_use = len(self._by_user.get(user_id, {})) + sum(1 for u, _ in self._pending if u == user_id)
+            if self.max_per_user > 0 and in_use >= self.max_per_user:
+                raise SessionQuotaExceeded(
+                    f"Concurrent instance limit reached ({self.max_per_user}). Stop a running mission first."
+                )
+            self._pending.add(key)
+            return None
+
+    def release(self, user_id: str, challenge_id: str) -> None:
+        with self._lock:
+            self._pending.discard((user_id, challenge_id))
+
+    # --- Mutations ---
+
+    def add(self, session: Session, persist: bool = True) -> None:
+        with self._lock:
+            self._pending.discard((session.user_id, session.challenge_id))
+            previous = self.get(session.user_id, session.challenge_id)
+            if previous is not None and previous.container_id != session.container_id:
+                self._remove_locked(previous.container_id)
+            self._by_container[session.container_id] = session
+            self._by_short_id[session.short_id] = session
+            if session.token:
+                self._by_token[session.token] = session
+            self._by_user.setdefault(session.user_id, {})[session.challenge_id] = session
+            self._by_challenge.setdefault(session.challenge_id, set()).add(session.container_id)
+        if persist:
+            self._persist_queue.put(("upsert", session.to_row()))
+
+    def set_paused(self, container_id: str, paused: bool) -> Optional[Session]:
+        """Record the pause state of a session's container (in memory only)"""
+        with self._lock:
+            session = self.get_by_container(container_id)
+            if session is not None:
+                session.paused = paused
+        return session
+
+    def set_expires_at(self, container_id: str, expires_at: datetime) -> Optional[Session]:
+        """Record a new deadline for a session and persist it"""
+        with self._lock:
+            session = self.get_by_container(container_id)
+            if session is not None:
+                session.expires_at = expires_at
+        if session is not None:
+            self._persist_queue.put(("upsert", session.to_row()))
+        return session
+
+    def remove(self, container_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._remove_locked(container_id)
+        if session is not None:
+            self._persist_queue.put(("delete", session.container_id))
+        return session
+
+    def _remove_locked(self, container_id: str) -> Optional[Session]:
+        session = self.get_by_container(container_id)
+        if session is None:
+            return None
+        self._by_container.pop(session.container_id, None)
+        self._by_short_id.pop(session.short_id, None)
+        if session.token:
+            self._by_token.pop(session.token, None)
+        user_sessions = self._by_user.get(session.user_id, {})
+        if user_sessions.get(session.challenge_id) is session:
+            del user_sessions[session.challenge_id]
+            if not user_sessions:
+                self._by_user.pop(session.user_id, None)
+        challenge_ids = self._by_challenge.get(session.challenge_id)
+        if challenge_ids is not None:
+            challenge_ids.discard(session.container_id)
+            if not challenge_ids:
+                self._by_challenge.pop(session.challenge_id, None)
+        return session
+
+    def rebuild(self, sessions: Iterable[Session]) -> int:
+        """Replace the in-memory state (startup recovery); nothing is persisted"""
+        with self._lock:
+            self._by_container.clear()
+            self._by_short_id.clear()
+            self._by_token.clear()
+            self._by_user.clear()
+            self._by_challenge.clear()
+        count = 0
+        for session in sessions:
+            self.add(session, persist=False)
+            count += 1
+        logger.info(f"Session registry rebuilt: {count} sessions")
+        return count
+
+    # --- Write-behind persistence ---
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._persist_loop, name="session-persist", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self._thread:
+            return
+        self._persist_queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _persist_loop(self) -> None:
+        while True:
+            op = self._persist_queue.get()
+            stopping = op is None
+            ops = [] if stopping else [op]
+            # 溜まっている操作をまとめて反映する
+            while True:
+                try:
+                    op = self._persist_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if op is None:
+                    stopping = True
+                else:
+                    ops.append(op)
+            self._apply(ops)
+            if stopping:
+                return
+
+    def _apply(self, ops: List[Tuple[str, object]]) -> None:
+        upserts: Dict[str, dict] = {}
+        deletes: List[str] = []
+        for kind, payload in ops:
+            if kind == "upsert":
+                upserts[payload["container_id"]] = payload
+            else:
+                upserts.pop(payload, None)
+                deletes.append(payload)
+        try:
+            if upserts and self.persist_upsert:
+                self.persist_upsert(list(upserts.values()))
+            if deletes and self.persist_delete:
+                self.persist_delete(deletes)
+        except Exception as e:
+            logger.warning(f"Failed to persist sessions (in-memory state kept): {e}")
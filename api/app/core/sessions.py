@@ -0,0 +1,322 @@
+"""
+Lifecycle of dedicated mission sessions (restore, expire, pause/resume, stop, extend)
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import docker
+
+from app.core.admission import AdmissionController
+from app.core.docker_executor import DockerExecutor
+from app.core.expiry import ExpiryScheduler
+from app.core.idle import IdleMonitor, network_bytes
+from app.core.metrics import DOCKER_OPERATION_SECONDS, timed
+from app.core.node_pool import NodePool
+from app.core.proxy import ReverseProxy, session_token
+from app.core.session_registry import Session, SessionRegistry
+
+logger = logging.getLogger(__name__)
+
+UrlBuilder = Callable[[str, str, int], str]  # (token, container_host, host_port) -> URL
+
+
+def container_ip(attrs: dict, network: str) -> Optional[str]:
+    """IP of the container on ``network`` (else its first network) from inspect attrs"""
+    networks = (attrs.get("NetworkSettings") or {}).get("Networks") or {}
+    settings = networks.get(network) or next(iter(networks.values()), None)
+    return (settings or {}).get("IPAddress") or None
+
+
+def upstream_address(node, ip_address: Optional[str], internal_port, port: int) -> str:
+    """Proxy target: the container IP for nodes on this host, the published port otherwise"""
+    if node.local and ip_address:
+        return f"{ip_address}:{internal_port}"
+    return f"{node.container_host}:{port}"
+
+
+def kill_and_remove(container) -> None:
+    """Force-stop and remove a container (rollback and stop; blocking)"""
+    if container.status == "paused":
+        # pause 中のコンテナは kill できないため強制削除する
+        with timed(DOCKER_OPERATION_SECONDS, operation="remove"):
+            container.remove(force=True)
+        return
+    with timed(DOCKER_OPERATION_SECONDS, operation="kill"):
+        container.kill()
+    with timed(DOCKER_OPERATION_SECONDS, operation="remove"):
+        container.remove()
+
+
+class SessionManager:
+    """
+    What happens to a user's container after it has started.
+
+    The registry is the source of truth once ``rebuild()`` has run at
+    startup: stop, extend, proxying and the per-user quota only consult it
+    and never scan the fleet for unknown sessions. Deadlines are kept by
+    ``expiry`` and idle containers are paused by ``idle``; both are created
+    here and started by the application. ``node_pool`` is attached once
+    Docker is connected. Releasing a session returns its admission
+    reservation, node placement, host port and proxy counters.
+    """
+
+    def __init__(
+        self,
+        registry: SessionRegistry,
+        executor: DockerExecutor,
+        admission: AdmissionController,
+        proxy: ReverseProxy,
+        proxy_secret: bytes,
+        url_for: UrlBuilder,
+        container_cpu: float,
+        container_memory: int,
+        ttl_seconds: float,
+        network: str,
+        idle_seconds: float,
+        idle_interval_seconds: float = 60.0,
+        expiry_max_concurrency: int = 8,
+        load_persisted: Optional[Callable[[], Dict[str, dict]]] = None,
+    ):
+        self.registry = registry
+        self.executor = executor
+        self.admission = admission
+        self.proxy = proxy
+        self.proxy_secret = proxy_secret
+        self.url_for = url_for
+        self.container_cpu = container_cpu
+        self.container_memory = container_memory
+        self.ttl_seconds = ttl_seconds
+        self.network = network
+        self.load_persisted = load_persisted
+        self.node_pool: Optional[NodePool] = None
+        self.expiry = ExpiryScheduler(self.expire, max_concurrency=expiry_max_concurrency)
+        self.idle = IdleMonitor(
+            candidates=lambda: [session.container_id for session in registry.active()],
+            sample=self._sample_network_bytes,
+            on_idle=self.pause,
+            executor=executor,
+            idle_seconds=idle_seconds,
+            interval_seconds=idle_interval_seconds,
+        )
+
+    # --- Deadlines and capacity ---
+
+    def deadline(self, session: Session) -> float:
+        """Unix time the session expires (the stored deadline once extended)"""
+        if session.expires_at is not None:
+            return session.expires_at.timestamp()
+        return session.started_at.timestamp() + self.ttl_seconds
+
+    def restore_deadlines(self) -> None:
+        """Schedule every registered session and re-take its reservation (startup)"""
+        for session in self.registry.all():
+            self.expiry.schedule(session.container_id, self.deadline(session))
+            self.admission.reserve(
+                session.container_id, 0.0 if session.paused else self.container_cpu, self.container_memory
+            )
+
+    def release_capacity(self, key: str, port: Optional[int] = None) -> None:
+        """Return the admission reservation, node placement, host port and proxy counters held by ``key``"""
+        self.admission.release(key)
+        self.proxy.forget(key)
+        if self.node_pool is not None:
+            self.node_pool.release(key, port)
+
+    def forget(self, session: Session) -> None:
+        """Drop a session whose container is gone"""
+        self.registry.remove(session.container_id)
+        self.expiry.cancel(session.container_id)
+        self.release_capacity(session.container_id, session.port)
+
+    # --- Docker calls (blocking, run on the executor) ---
+
+    def _remove_container(self, container_id: str) -> None:
+        try:
+            container = self.node_pool.client_for(container_id).containers.get(container_id)
+            with timed(DOCKER_OPERATION_SECONDS, operation="remove"):
+                container.remove(force=True)
+        except docker.errors.NotFound:
+            pass
+
+    def _sample_network_bytes(self, container_id: str) -> int:
+        with timed(DOCKER_OPERATION_SECONDS, operation="stats"):
+            stats = self.node_pool.client_for(container_id).api.stats(container_id, stream=False, one_shot=True)
+        return network_bytes(stats)
+
+    def is_running(self, container_id: str) -> bool:
+        try:
+            with timed(DOCKER_OPERATION_SECONDS, operation="inspect"):
+                status = self.node_pool.client_for(container_id).containers.get(container_id).status
+            return status in ("running", "paused")
+        except docker.errors.NotFound:
+            return False
+
+    def resolve_upstream(self, container_id: str, port: int) -> str:
+        """Proxy target of a container whose address is not known yet (warm pool, shared replica)"""
+        node = self.node_pool.node_for(container_id) or self.node_pool.primary
+        with timed(DOCKER_OPERATION_SECONDS, operation="inspect"):
+            container = node.client.containers.get(container_id)
+        return upstream_address(
+            node, container_ip(container.attrs, self.network), container.labels.get("sol.internal_port", "8000"), port
+        )
+
+    # --- Lifecycle ---
+
+    async def reserve(self, user_id: str, challenge_id: str) -> Optional[Session]:
+        """
+        Take a start slot for (user, challenge) in the registry.
+
+        Returns the running session if there is one (None means the slot is
+        reserved). A registered session whose container has vanished is
+        dropped and the slot re-reserved. Raises SessionQuotaExceeded.
+        """
+        existing = self.registry.reserve(user_id, challenge_id)
+        if existing is not None and not await self.executor.run(self.is_running, existing.container_id):
+            # コンテナが既に消えている場合は登録を破棄して新規起動
+            self.forget(existing)
+            existing = self.registry.reserve(user_id, challenge_id)
+        return existing
+
+    async def expire(self, container_id: str) -> None:
+        """Remove an expired session's container (ExpiryScheduler callback)"""
+        session = self.registry.remove(container_id)
+        try:
+            await self.executor.run(self._remove_container, container_id)
+        finally:
+            self.release_capacity(container_id, session.port if session else None)
+
+    async def pause(self, container_id: str) -> None:
+        """Pause a container without traffic and give back its CPU reservation (memory is kept)"""
+        session = self.registry.get_by_container(container_id)
+        if session is None or session.paused:
+            return
+        api = self.node_pool.client_for(container_id).api
+        await self.executor.run(timed(DOCKER_OPERATION_SECONDS, operation="pause")(api.pause), container_id)
+        self.registry.set_paused(container_id, True)
+        self.admission.resize(container_id, 0.0)
+        logger.info(f"Paused idle container {session.short_id} (user: {session.user_id}, challenge: {session.challenge_id})")
+        if self.idle.idle_for(container_id) is not None:
+            # pause 中にアクセスがあった場合はすぐに再開する
+            await self.resume(session)
+
+    async def resume(self, session: Session) -> None:
+        """Unpause a paused session (called transparently on start, extend and proxy access)"""
+        if session.paused:
+            api = self.node_pool.client_for(session.container_id).api
+            try:
+                await self.executor.run(
+                    timed(DOCKER_OPERATION_SECONDS, operation="unpause")(api.unpause), session.container_id
+                )
+            except docker.errors.APIError as e:
+                # 既に再開済み（409 Conflict）の場合は状態だけ戻す
+                if e.status_code != 409:
+                    raise
+            self.registry.set_paused(session.container_id, False)
+            self.admission.resize(session.container_id, self.container_cpu)
+            logger.info(f"Resumed container {session.short_id} (user: {session.user_id})")
+        self.idle.touch(session.container_id)
+
+    async def stop(self, session: Session) -> bool:
+        """Kill and remove the session's container; False if it was already gone"""
+        client = self.node_pool.client_for(session.container_id)
+        try:
+            container = await self.executor.run(
+                timed(DOCKER_OPERATION_SECONDS, operation="inspect")(client.containers.get), session.container_id
+            )
+            await self.executor.run(kill_and_remove, container)
+        except docker.errors.NotFound:
+            self.forget(session)
+            return False
+        self.forget(session)
+        return True
+
+    async def extend(self, session: Session) -> float:
+        """
+        Push the deadline to now + TTL (never earlier than the current one),
+        resuming the container if it is paused. The new deadline is
+        persisted so a restart does not expire the session early.
+        """
+        await self.resume(session)
+        deadline = max(
+            time.time() + self.ttl_seconds,
+            self.expiry.deadline_for(session.container_id) or 0,
+            self.deadline(session),
+        )
+        self.registry.set_expires_at(session.container_id, datetime.fromtimestamp(deadline, timezone.utc))
+        self.expiry.schedule(session.container_id, deadline)
+        return deadline
+
+    # --- Startup ---
+
+    def session_from_container(self, node, container, row: dict) -> Optional[Session]:
+        """Session from a container's labels and its persisted row (None if owner or port is unknown)"""
+        labels = container.labels or {}
+        user_id = labels.get("sol.user_id") or row.get("user_id")
+        if not user_id or "sol.challenge_id" not in labels:
+            return None
+        internal_port = labels.get("sol.internal_port", "8000")
+        bindings = (container.attrs.get("NetworkSettings", {}).get("Ports") or {}).get(f"{internal_port}/tcp")
+        if not bindings:
+            return None
+        port = int(bindings[0]["HostPort"])
+        token = session_token(self.proxy_secret, container.id)
+        session = Session(
+            user_id=user_id,
+            challenge_id=labels["sol.challenge_id"],
+            container_id=container.id,
+            port=port,
+            url=self.url_for(token, node.container_host, port),
+            token=token,
+            upstream=upstream_address(node, container_ip(container.attrs, self.network), internal_port, port),
+        )
+        if row.get("start_time"):
+            session.started_at = datetime.fromisoformat(row["start_time"])
+        if row.get("expires_at"):
+            session.expires_at = datetime.fromisoformat(row["expires_at"])
+        session.paused = container.status == "paused"
+        return session
+
+    def rebuild(self) -> int:
+        """
+        Restore the registry from container labels on every node (startup, blocking).
+
+        This is the only fleet scan; afterwards the registry is trusted.
+        Restored containers are recorded as placed on their node. Containers
+        claimed from the warm pool (no user label) are completed from the
+        persisted rows, and idle pool or shared containers that belong to
+        nobody are removed (the pools are rebuilt after startup).
+        """
+        persisted: Dict[str, dict] = {}
+        if self.load_persisted is not None:
+            try:
+                persisted = self.load_persisted()
+            except Exception as e:
+                logger.warning(f"Failed to load persisted sessions: {e}")
+
+        sessions: List[Session] = []
+        for node in self.node_pool:
+            try:
+                containers = node.client.containers.list(filters={"label": "sol.challenge_id"})
+            except Exception as e:
+                logger.warning(f"Failed to list containers on node {node.name}: {e}")
+                continue
+            for container in containers:
+                labels = container.labels or {}
+                row = persisted.get(container.id, {})
+                if not (labels.get("sol.user_id") or row.get("user_id")):
+                    if labels.get("sol.pool") in ("warm", "shared"):
+                        try:
+                            container.remove(force=True)
+                        except Exception:
+                            pass
+                    continue
+                session = self.session_from_container(node, container, row)
+                if session is None:
+                    continue
+                sessions.append(session)
+                self.node_pool.assign(container.id, node.name, self.container_memory)
+                node.ports.reserve(session.port)
+        return self.registry.rebuild(sessions)
@@ -0,0 +1,327 @@
+"""
+Shared multi-tenant replica sets for stateless challenges (instance_mode "shared")
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.admission import AdmissionController
+from app.core.docker_executor import DockerExecutor
+from app.core.docker_manager import DockerManager
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_MODES = ("dedicated", "shared")
+
+
+def parse_instance_mode(value: Optional[str]) -> str:
+    """Mission JSON ``environment.instance_mode`` -> "dedicated" | "shared" (unknown = dedicated)"""
+    mode = (value or "").strip().lower()
+    return mode if mode in INSTANCE_MODES else "dedicated"
+
+
+@dataclass
+class SharedSpec:
+    """How to start the replicas of one shared challenge"""
+    challenge_id: str
+    image: str
+    internal_port: int
+    flag: str
+    title: str
+    replicas: int
+
+
+@dataclass
+class Replica:
+    """One running container serving every player routed to it"""
+    container: object
+    port: int
+    upstream: Optional[str] = None  # プロキシの転送先（初回アクセス時に解決）
+    users: int = 0
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _ReplicaSet:
+    spec: SharedSpec
+    replicas: List[Replica] = field(default_factory=list)
+    affinity: Dict[str, Replica] = field(default_factory=dict)  # user_id -> replica
+    last_seen: Dict[str, float] = field(default_factory=dict)  # user_id -> 最後に割り当て・転送した時刻
+    starting: int = 0
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    routed: int = 0
+
+
+class SharedInstanceManager:
+    """
+    Runs ``replicas`` containers per shared challenge and routes players to
+    them.
+
+    ``route()`` keeps each user on the replica they were first given
+    (session affinity) and assigns new users to the replica with the fewest
+    users. Replicas that stop running are replaced by a periodic check and
+    their users are re-routed. A user's assignment and proxy token expire
+    after ``assignment_ttl_seconds`` without a start or proxied request, so
+    per-user state is bounded by the players active within that window.
+
+    Each replica holds an admission reservation keyed by its container id
+    (taken regardless of the budget, like recovered sessions). Replica sets
+    live in the worker process that created them.
+    """
+
+    def __init__(
+        self,
+        docker_manager: DockerManager,
+        executor: DockerExecutor,
+        replicas: int = 2,
+        check_interval_seconds: float = 30.0,
+        admission: Optional[AdmissionController] = None,
+        container_cpu: float = 0.0,
+        container_memory: int = 0,
+        assignment_ttl_seconds: float = 3600.0,
+    ):
+        self.docker_manager = docker_manager
+        self.executor = executor
+        self.replicas = replicas
+        self.check_interval_seconds = check_interval_seconds
+        self.assignment_ttl_seconds = assignment_ttl_seconds
+        self.admission = admission
+        self.container_cpu = container_cpu
+        self.container_memory = container_memory
+        self._sets: Dict[str, _ReplicaSet] = {}
+        self._tokens: Dict[str, Tuple[str, str]] = {}  # proxy token -> (challenge_id, user_id)
+        self._owner_tokens: Dict[Tuple[str, str], str] = {}  # (challenge_id, user_id) -> proxy token
+        self._tasks: Set[asyncio.Task] = set()
+        self._monitor: Optional[asyncio.Task] = None
+
+    # --- Routing ---
+
+    def spec_for(self, challenge_id: str) -> Optional[SharedSpec]:
+        replica_set = self._sets.get(challenge_id)
+        return replica_set.spec if replica_set is not None else None
+
+    def route(self, challenge_id: str, user_id: str) -> Optional[Replica]:
+        """Replica serving ``user_id`` (sticky), or None if the challenge has none running"""
+        replica_set = self._sets.get(challenge_id)
+        if replica_set is None or not replica_set.replicas:
+            return None
+        replica = replica_set.affinity.get(user_id)
+        if replica is None or replica not in replica_set.replicas:
+            replica = min(replica_set.replicas, key=lambda r: r.users)
+            replica.users += 1
+            replica_set.affinity[user_id] = replica
+        replica_set.last_seen[user_id] = time.monotonic()
+        replica_set.routed += 1
+        return replica
+
+    def register_token(self, token: str, challenge_id: str, user_id: str) -> None:
+        self._tokens[token] = (challenge_id, user_id)
+        self._owner_tokens[(challenge_id, user_id)] = token
+
+    def route_token(self, token: str) -> Optional[Replica]:
+        """Replica behind a proxy token handed out by the start endpoint"""
+        owner = self._tokens.get(token)
+        return self.route(*owner) if owner is not None else None
+
+    def find(self, container_id: str) -> Optional[Tuple[str, Replica]]:
+        """(challenge_id, replica) for a full or short container id"""
+        for challenge_id, replica_set in self._sets.items():
+            for replica in replica_set.replicas:
+                if container_id in (replica.container.id, replica.container.short_id):
+                    return challenge_id, replica
+        return None
+
+    def release(self, challenge_id: str, user_id: str) -> None:
+        """Forget the user's affinity and proxy token (the replica keeps running for others)"""
+        token = self._owner_tokens.pop((challenge_id, user_id), None)
+        if token is not None:
+            self._tokens.pop(token, None)
+        replica_set = self._sets.get(challenge_id)
+        if replica_set is None:
+            return
+        replica_set.last_seen.pop(user_id, None)
+        replica = replica_set.affinity.pop(user_id, None)
+        if replica is not None:
+            replica.users = max(0, replica.users - 1)
+
+    def expire_idle(self, now: Optional[float] = None) -> int:
+        """Release assignments unused for ``assignment_ttl_seconds``; returns how many"""
+        now = time.monotonic() if now is None else now
+        expired = [
+            (challenge_id, user_id)
+            for challenge_id, replica_set in self._sets.items()
+            for user_id, seen in replica_set.last_seen.items()
+            if now - seen > self.assignment_ttl_seconds
+        ]
+        for challenge_id, user_id in expired:
+            self.release(challenge_id, user_id)
+        return len(expired)
+
+    def container_ids(self) -> Set[str]:
+        return {replica.container.id for s in self._sets.values() for replica in s.replicas}
+
+    # --- Replica lifecycle ---
+
+    def ensure(self, spec: SharedSpec) -> None:
+        """Register (or update) the replica set for a challenge and start missing replicas"""
+        replica_set = self._sets.get(spec.challenge_id)
+        if replica_set is None:
+            replica_set = _ReplicaSet(spec=spec)
+            self._sets[spec.challenge_id] = replica_set
+        elif replica_set.spec != spec:
+            # イメージやFlagが変わった場合は作り直す
+            self._discard_set(replica_set)
+            replica_set = _ReplicaSet(spec=spec)
+            self._sets[spec.challenge_id] = replica_set
+        self._schedule_starts(replica_set)
+
+    async def wait_ready(self, challenge_id: str, timeout: float) -> bool:
+        """Wait until the challenge has at least one running replica"""
+        replica_set = self._sets.get(challenge_id)
+        if replica_set is None:
+            return False
+        try:
+            await asyncio.wait_for(replica_set.ready.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _schedule_starts(self, replica_set: _ReplicaSet) -> None:
+        missing = replica_set.spec.replicas - len(replica_set.replicas) - replica_set.starting
+        for _ in range(max(0, missing)):
+            replica_set.starting += 1
+            self._spawn(self._start_one(replica_set))
+
+    async def _start_one(self, replica_set: _ReplicaSet) -> None:
+        spec = replica_set.spec
+        try:
+            container, port = await self.docker_manager.run_mission_container(
+                self.executor,
+                spec.image,
+                spec.internal_port,
+                environment={"CTF_FLAG": spec.flag},
+                labels={
+                    "sol.pool": "shared",
+                    "sol.challenge_id": spec.challenge_id,
+                    "sol.internal_port": str(spec.internal_port),
+                },
+                name=f"ctf_shared_{uuid.uuid4().hex[:12]}",
+            )
+        except Exception as e:
+            logger.error(f"Shared replica start failed for {spec.challenge_id}: {e}")
+            return
+        finally:
+            replica_set.starting -= 1
+        if self.admission is not None:
+            self.admission.reserve(container.id, self.container_cpu, self.container_memory)
+
+        replica = Replica(container=container, port=port)
+        if self._sets.get(spec.challenge_id) is not replica_set:
+            # 起動中にセットが破棄・更新された
+            self._discard(replica)
+            return
+        replica_set.replicas.append(replica)
+        replica_set.ready.set()
+        logger.info(f"Shared replica {container.short_id} ready for {spec.challenge_id} (port {port})")
+
+    def _drop(self, replica_set: _ReplicaSet, replica: Replica) -> None:
+        """Take a replica out of rotation; its users are re-routed on their next request"""
+        if replica in replica_set.replicas:
+            replica_set.replicas.remove(replica)
+        for user_id in [u for u, r in replica_set.affinity.items() if r is replica]:
+            del replica_set.affinity[user_id]
+        if not replica_set.replicas:
+            replica_set.ready.clear()
+        self._discard(replica)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _discard(self, replica: Replica) -> None:
+        self._spawn(self._remove(replica))
+
+    async def _remove(self, replica: Replica) -> None:
+        try:
+            await self.executor.run(replica.container.remove, force=True)
+        except Exception as e:
+            logger.debug(f"Shared replica {replica.container.short_id} already gone: {e}")
+        finally:
+            self.docker_manager.ports.release(replica.port)
+            if self.admission is not None:
+                self.admission.release(replica.container.id)
+
+    def _discard_set(self, replica_set: _ReplicaSet) -> None:
+        for replica in list(replica_set.replicas):
+            self._drop(replica_set, replica)
+
+    def invalidate(self, challenge_id: Optional[str] = None) -> None:
+        """Drop replica sets (all, or one); they are recreated on the next start request"""
+        targets = [challenge_id] if challenge_id else list(self._sets)
+        for cid in targets:
+            replica_set = self._sets.pop(cid, None)
+            if replica_set is not None:
+                self._discard_set(replica_set)
+        self._tokens = {token: owner for token, owner in self._tokens.items() if owner[0] in self._sets}
+        self._owner_tokens = {owner: token for token, owner in self._tokens.items()}
+
+    # --- Health ---
+
+    def start(self) -> None:
+        if self._monitor is None:
+            self._monitor = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval_seconds)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Shared replica check failed: {e}")
+
+    async def check(self) -> None:
+        """Replace replicas whose container is no longer running and expire idle assignments"""
+        self.expire_idle()
+        for replica_set in list(self._sets.values()):
+            for replica in list(replica_set.replicas):
+                try:
+                    await self.executor.run(replica.container.reload)
+                    running = replica.container.status == "running"
+                except Exception:
+                    running = False
+                if not running:
+                    logger.warning(f"Shared replica {replica.container.short_id} for {replica_set.spec.challenge_id} is down, replacing")
+                    self._drop(replica_set, replica)
+            self._schedule_starts(replica_set)
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            cid: {
+                "replicas": len(replica_set.replicas),
+                "target": replica_set.spec.replicas,
+                "starting": replica_set.starting,
+                "users": len(replica_set.affinity),
+                "routed": replica_set.routed,
+                "users_per_replica": [replica.users for replica in replica_set.replicas],
+            }
+            for cid, replica_set in self._sets.items()
+        }
+
+    async def shutdown(self) -> None:
+        """Remove every replica and wait for pending tasks"""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+        self.invalidate()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        logger.info("Shared replica sets shut down")
@@ -0,0 +1,83 @@
+"""
+Per-user solved-challenge bitsets for personalising the cached catalog
+"""
+
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SolvedBitsets:
+    """
+    One integer bitset per user over challenge ordinals.
+
+    Ordinals are handed out the first time a challenge id is seen and never
+    reused, so bitsets stay valid when the catalog is reloaded or
+    re-sorted. ``merge()`` personalises a catalog snapshot with one dict
+    lookup per request plus one bit test per item; the ordinal list for a
+    snapshot is computed once per ETag.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ordinals: Dict[str, int] = {}
+        self._bits: Dict[str, Tuple[int, Optional[datetime]]] = {}  # user_id -> (bitset, 最終更新)
+        self._layouts: Dict[str, List[int]] = {}  # catalog ETag -> items の並びの ordinal
+
+    def ordinal(self, challenge_id: str) -> int:
+        ordinal = self._ordinals.get(challenge_id)
+        if ordinal is None:
+            with self._lock:
+                ordinal = self._ordinals.setdefault(challenge_id, len(self._ordinals))
+        return ordinal
+
+    def rebuild(self, solved: Iterable[Tuple[str, Iterable[str]]]) -> int:
+        """Replace every bitset from (user_id, solved challenge ids) pairs (startup)"""
+        bits = {}
+        for user_id, challenge_ids in solved:
+            mask = 0
+            for challenge_id in challenge_ids:
+                mask |= 1 << self.ordinal(challenge_id)
+            if mask:
+                bits[user_id] = (mask, None)
+        with self._lock:
+            self._bits = bits
+        return len(bits)
+
+    def mark(self, user_id: str, challenge_id: str) -> None:
+        bit = 1 << self.ordinal(challenge_id)
+        with self._lock:
+            mask, _ = self._bits.get(user_id, (0, None))
+            self._bits[user_id] = (mask | bit, datetime.now(timezone.utc).replace(microsecond=0))
+
+    def get(self, user_id: str) -> Tuple[int, Optional[datetime]]:
+        return self._bits.get(user_id, (0, None))
+
+    def is_solved(self, user_id: str, challenge_id: str) -> bool:
+        ordinal = self._ordinals.get(challenge_id)
+        return ordinal is not None and bool(self.get(user_id)[0] >> ordinal & 1)
+
+    def layout(self, etag: str, items: List[dict]) -> List[int]:
+        """Ordinals of ``items`` in catalog order (cached per snapshot ETag)"""
+        layout = self._layouts.get(etag)
+        if layout is None:
+            layout = [self.ordinal(item["challenge_id"]) for item in items]
+            # 古いスナップショットの並びは捨てる（通常は1つだけ保持）
+            self._layouts = {etag: layout}
+        return layout
+
+    def merge(self, user_id: str, etag: str, items: List[dict]) -> Tuple[List[dict], str, Optional[datetime]]:
+        """
+        Catalog items with a ``solved`` flag for ``user_id``.
+
+        Returns (items, personalised ETag, time of the user's last solve
+        seen by this process or None).
+        """
+        mask, updated_at = self.get(user_id)
+        layout = self.layout(etag, items)
+        merged = [{**item, "solved": bool(mask >> ordinal & 1)} for item, ordinal in zip(items, layout)]
+        if mask:
+            digest = hashlib.blake2s(mask.to_bytes((mask.bit_length() + 7) // 8, "big"), digest_size=6).hexdigest()
+            etag = f'{etag[:-1]}-{digest}"'
+        return merged, etag, updated_at
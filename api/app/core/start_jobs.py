@@ -0,0 +1,159 @@
+"""
+Background container start jobs with a replayable progress event log (SSE)
+"""
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 進捗フェーズ（この順に進む。ウォームプール割り当て時は pulling / creating を省略することがある）
+PHASES = ("queued", "pulling", "creating", "port_bound", "healthy", "ready")
+TERMINAL_PHASES = ("ready", "error")
+
+Reporter = Callable[..., None]
+
+
+@dataclass
+class StartJob:
+    """One start request; ``events`` is append-only so late subscribers can replay it"""
+    id: str
+    user_id: str
+    challenge_id: str
+    events: List[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def phase(self) -> Optional[str]:
+        return self.events[-1]["phase"] if self.events else None
+
+    def publish(self, phase: str, **data) -> None:
+        if self.done:
+            return
+        self.events.append({"phase": phase, "at": time.time(), **data})
+        if phase in TERMINAL_PHASES:
+            self.finished_at = time.monotonic()
+        # 待機中の購読者を起こし、次の待機用に新しいイベントへ差し替える
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "challenge_id": self.challenge_id,
+            "phase": self.phase,
+            "done": self.done,
+            "events": list(self.events),
+        }
+
+    async def follow(self, start: int = 0, keepalive_seconds: float = 15.0) -> AsyncIterator[Tuple[int, Optional[dict]]]:
+        """Yield (index, event) from ``start`` until a terminal phase; (index, None) is a keepalive"""
+        index = start
+        while True:
+            while index < len(self.events):
+                yield index, self.events[index]
+                index += 1
+            if self.done:
+                return
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield index, None
+
+
+class StartJobManager:
+    """
+    Runs start jobs as event-loop tasks, one per (user, challenge) at a time.
+
+    Finished jobs are kept for ``retention_seconds`` so clients can reconnect
+    (``Last-Event-ID``) or fetch the final result. Jobs live in the worker
+    process that created them.
+    """
+
+    def __init__(self, retention_seconds: float = 300.0):
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, StartJob] = {}
+        self._active: Dict[Tuple[str, str], StartJob] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, job_id: str) -> Optional[StartJob]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def get_owned(self, job_id: str, user_id: str) -> Optional[StartJob]:
+        """The job if ``user_id`` created it (other users' jobs look missing)"""
+        job = self.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def submit(
+        self,
+        user_id: str,
+        challenge_id: str,
+        run: Callable[[Reporter], Awaitable[dict]],
+    ) -> StartJob:
+        """
+        Start ``run(report)`` in the background (or return the in-flight job).
+
+        ``run`` reports progress via ``report(phase, **data)``; its return value
+        is published as ``ready`` and an HTTPException-like error as ``error``.
+        """
+        self._prune()
+        existing = self._active.get((user_id, challenge_id))
+        if existing is not None and not existing.done:
+            return existing
+
+        job = StartJob(id=secrets.token_urlsafe(16), user_id=user_id, challenge_id=challenge_id)
+        self._jobs[job.id] = job
+        self._active[(user_id, challenge_id)] = job
+        job.publish("queued")
+        task = asyncio.create_task(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: StartJob, run: Callable[[Reporter], Awaitable[dict]]) -> None:
+        try:
+            result = await run(job.publish)
+            job.publish("ready", **result)
+        except Exception as e:
+            status_code = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or str(e)
+            retry_after = (getattr(e, "headers", None) or {}).get("Retry-After")
+            job.publish("error", status_code=status_code, detail=detail, retry_after=retry_after)
+        finally:
+            if self._active.get((job.user_id, job.challenge_id)) is job:
+                del self._active[(job.user_id, job.challenge_id)]
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and now - job.finished_at > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def format_sse(index: int, event: Optional[dict]) -> str:
+    """Server-Sent Events frame (``event: <phase>``, ``id`` for Last-Event-ID replay)"""
+    if event is None:
+        return ": keepalive\n\n"
+    return f"id: {index}\nevent: {event['phase']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
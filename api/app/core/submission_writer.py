@@ -0,0 +1,184 @@
+"""
+Write-behind batching for submission_logs inserts
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SubmissionLogWriter:
+    """
+    Buffers submission log records on a bounded queue and bulk-inserts them
+    from a background thread every ``batch_size`` records or ``flush_interval_ms``.
+
+    Records that do not fit in the queue, or whose batch insert fails, are
+    appended to ``spill_path`` (JSON Lines) and replayed on the next start.
+    Spilling and replaying hold an ``flock`` on ``spill_path + ".lock"`` so
+    processes sharing the file never replay or truncate each other's records.
+    """
+
+    def __init__(
+        self,
+        insert_batch: Callable[[List[dict]], None],
+        batch_size: int = 100,
+        flush_interval_ms: int = 500,
+        max_queue_size: int = 10000,
+        spill_path: str = "submission_logs.spill.jsonl",
+    ):
+        self.insert_batch = insert_batch
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self.spill_path = spill_path
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the background flusher and replay any spilled records"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="submission-log-writer", daemon=True)
+        self._thread.start()
+        self._replay_spill()
+        logger.info("Submission log writer started")
+
+    def submit(self, record: dict) -> bool:
+        """Enqueue a record without blocking; returns False if it was spilled"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._spill([record])
+            return False
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Drain the queue, flush the remaining records and stop the thread"""
+        if not self._thread:
+            return
+        # 満杯でも停止できるようブロッキングで番兵を投入する
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Submission log writer did not stop in time")
+        self._thread = None
+        logger.info("Submission log writer stopped")
+
+    def _run(self) -> None:
+        while True:
+            batch: List[dict] = []
+            stopping = False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._flush(batch)
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self) -> None:
+        batch: List[dict] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: List[dict]) -> None:
+        try:
+            self.insert_batch(batch)
+            logger.debug(f"Flushed {len(batch)} submission logs")
+        except Exception as e:
+            logger.error(f"Failed to insert {len(batch)} submission logs: {e}")
+            self._spill(batch)
+
+    @contextmanager
+    def _locked_spill(self) -> Iterator[None]:
+        """Thread lock plus an ``flock`` shared with other processes using the same spill file"""
+        with self._spill_lock, open(f"{self.spill_path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _spill(self, records: List[dict]) -> None:
+        try:
+            with self._locked_spill(), open(self.spill_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            logger.warning(f"Spilled {len(records)} submission logs to {self.spill_path}")
+        except OSError as e:
+            logger.error(f"Failed to spill submission logs (dropped {len(records)}): {e}")
+
+    def _replay_spill(self) -> None:
+        """Re-enqueue records spilled by a previous run"""
+        records: List[dict] = []
+        try:
+            # ロック中に読み込んで削除し、再投入（キュー満杯時は再 spill）はロック解放後に行う
+            with self._locked_spill():
+                if not os.path.exists(self.spill_path):
+                    return
+                with open(self.spill_path, "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if isinstance(record, dict):
+                            records.append(record)
+                os.remove(self.spill_path)
+        except OSError as e:
+            logger.error(f"Failed to replay spilled submission logs from {self.spill_path}: {e}")
+            return
+
+        for record in records:
+            self.submit(record)
+        if records:
+            logger.info(f"Replayed {len(records)} spilled submission logs")
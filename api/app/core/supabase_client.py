@@ -0,0 +1,73 @@
+"""
+Process-wide Supabase clients backed by a keep-alive HTTP connection pool
+"""
+
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+import httpx
+from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_clients: Dict[Tuple[str, str], Client] = {}
+_http_clients: List[httpx.Client] = []
+_lock = threading.Lock()
+
+
+def _create_client(supabase_url: str, supabase_key: str) -> Client:
+    """Create a Supabase client with pool limits and per-call timeouts"""
+    options_kwargs = {"postgrest_client_timeout": settings.SUPABASE_TIMEOUT_SECONDS}
+
+    # supabase-py >= 2.10 accepts a caller-owned httpx client; older versions
+    # keep their own (still keep-alive) session with default pool limits.
+    if "httpx_client" in getattr(ClientOptions, "__dataclass_fields__", {}):
+        http_client = httpx.Client(
+            timeout=settings.SUPABASE_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _http_clients.append(http_client)
+        options_kwargs["httpx_client"] = http_client
+    else:
+        logger.info("supabase-py does not accept httpx_client; using default pool limits")
+
+    return create_client(supabase_url, supabase_key, options=ClientOptions(**options_kwargs))
+
+
+def get_client(supabase_url: str, supabase_key: str) -> Client:
+    """
+    Return the shared client for (url, key), creating it on first use.
+
+    The client is reused for the lifetime of the process so every request
+    shares the same HTTP connection pool.
+    """
+    cache_key = (supabase_url, supabase_key)
+    client = _clients.get(cache_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                client = _create_client(supabase_url, supabase_key)
+                _clients[cache_key] = client
+                logger.info("Supabase client created (pooled)")
+    return client
+
+
+def close_clients() -> None:
+    """Close pooled HTTP connections (called on application shutdown)"""
+    with _lock:
+        for http_client in _http_clients:
+            try:
+                http_client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close Supabase HTTP client: {e}")
+        _http_clients.clear()
+        _clients.clear()
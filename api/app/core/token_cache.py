@@ -0,0 +1,74 @@
+"""
+Bounded LRU cache for verified JWT claims
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class TokenCache:
+    """
+    Caches verified user info keyed by a SHA-256 hash of the bearer token.
+
+    Entries expire at the token's own ``exp`` claim, so a cached token is never
+    accepted for longer than the token itself is valid. ``set(..., ttl=...)``
+    additionally caps the lifetime, e.g. for remotely verified tokens whose
+    revocation is only visible to the auth server.
+    """
+
+    def __init__(self, maxsize: int = 10000, clock: Callable[[], float] = time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return cached user info, or None if missing or expired"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(
+        self,
+        token: str,
+        user: dict,
+        expires_at: Optional[float],
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Store user info until ``expires_at`` (UNIX time), at most ``ttl`` seconds; no-op without exp"""
+        now = self.clock()
+        if self.maxsize <= 0 or not expires_at or expires_at <= now:
+            return
+        expires_at = float(expires_at)
+        if ttl is not None:
+            if ttl <= 0:
+                return
+            expires_at = min(expires_at, now + ttl)
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,232 @@
+"""
+Pre-warmed mission container pools (one pool per active challenge)
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Set
+
+from app.core.admission import AdmissionController
+from app.core.docker_executor import DockerExecutor
+from app.core.docker_manager import DockerManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmPoolSpec:
+    """How to start containers for one challenge's pool"""
+    challenge_id: str
+    image: str
+    internal_port: int
+    flag: str
+    size: int
+
+
+@dataclass
+class WarmContainer:
+    """An idle, already-started container waiting to be claimed"""
+    container: object
+    port: int
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Pool:
+    spec: WarmPoolSpec
+    idle: Deque[WarmContainer] = field(default_factory=deque)
+    starting: int = 0
+    hits: int = 0
+    misses: int = 0
+
+
+class WarmPoolManager:
+    """
+    Keeps ``size`` started but unassigned containers per challenge.
+
+    ``claim()`` hands out an idle container (writing the per-instance flag file
+    first) and schedules an asynchronous refill. A miss returns None so the
+    caller falls back to a cold start.
+
+    With ``admission``, each pool container holds a reservation (keyed by its
+    container id) and refills are skipped while the host is full or users are
+    queued.
+    """
+
+    def __init__(
+        self,
+        docker_manager: DockerManager,
+        executor: DockerExecutor,
+        default_size: int = 0,
+        pool_sizes: Optional[Dict[str, int]] = None,
+        flag_path: str = "/home/ctfuser/flag.txt",
+        max_age_seconds: float = 600,
+        admission: Optional[AdmissionController] = None,
+        container_cpu: float = 0.0,
+        container_memory: int = 0,
+    ):
+        self.docker_manager = docker_manager
+        self.executor = executor
+        self.default_size = default_size
+        self.pool_sizes = pool_sizes or {}
+        self.flag_path = flag_path
+        self.max_age_seconds = max_age_seconds
+        self.admission = admission
+        self.container_cpu = container_cpu
+        self.container_memory = container_memory
+        self._pools: Dict[str, _Pool] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def size_for(self, challenge_id: str) -> int:
+        return self.pool_sizes.get(challenge_id, self.default_size)
+
+    def ensure_pool(self, challenge_id: str, image: str, internal_port: int, flag: str) -> Optional[_Pool]:
+        """Register (or update) the pool for a challenge; None if pooling is disabled"""
+        size = self.size_for(challenge_id)
+        if size <= 0:
+            return None
+        spec = WarmPoolSpec(challenge_id, image, internal_port, flag, size)
+        pool = self._pools.get(challenge_id)
+        if pool is None:
+            pool = _Pool(spec=spec)
+            self._pools[challenge_id] = pool
+        elif pool.spec != spec:
+            # イメージやFlagが変わった場合は古いコンテナを破棄する
+            pool.spec = spec
+            self._discard_all(pool)
+        self._schedule_refill(pool)
+        return pool
+
+    async def claim(
+        self,
+        challenge_id: str,
+        image: str,
+        internal_port: int,
+        flag: str,
+    ) -> Optional[WarmContainer]:
+        """
+        Take an idle container for ``challenge_id``.
+
+        ``flag`` is written to ``flag_path`` inside the container before it
+        is returned.
+        """
+        pool = self.ensure_pool(challenge_id, image, internal_port, flag)
+        if pool is None:
+            return None
+
+        while pool.idle:
+            warm = pool.idle.popleft()
+            self._schedule_refill(pool)
+            if time.monotonic() - warm.created_at > self.max_age_seconds:
+                self._discard(warm)
+                continue
+            try:
+                await self.executor.run(
+                    self.docker_manager.write_flag_file, warm.container, flag, self.flag_path
+                )
+            except Exception as e:
+                logger.warning(f"Discarding warm container for {challenge_id}: {e}")
+                self._discard(warm)
+                continue
+            pool.hits += 1
+            return warm
+
+        pool.misses += 1
+        return None
+
+    def _schedule_refill(self, pool: _Pool) -> None:
+        missing = pool.spec.size - len(pool.idle) - pool.starting
+        for _ in range(max(0, missing)):
+            pool.starting += 1
+            self._spawn(self._start_one(pool, pool.spec))
+
+    async def _start_one(self, pool: _Pool, spec: WarmPoolSpec) -> None:
+        name = f"ctf_pool_{uuid.uuid4().hex[:12]}"
+        if self.admission is not None and not self.admission.try_reserve(
+            name, self.container_cpu, self.container_memory
+        ):
+            pool.starting -= 1
+            return
+        try:
+            container, port = await self.docker_manager.run_mission_container(
+                self.executor,
+                spec.image,
+                spec.internal_port,
+                environment={"CTF_FLAG": spec.flag},
+                labels={
+                    "sol.pool": "warm",
+                    "sol.challenge_id": spec.challenge_id,
+                    "sol.internal_port": str(spec.internal_port),
+                },
+                name=name,
+            )
+        except Exception as e:
+            logger.error(f"Warm pool start failed for {spec.challenge_id}: {e}")
+            if self.admission is not None:
+                self.admission.release(name)
+            return
+        finally:
+            pool.starting -= 1
+        if self.admission is not None:
+            self.admission.transfer(name, container.id)
+
+        warm = WarmContainer(container=container, port=port)
+        if pool.spec != spec or self._pools.get(spec.challenge_id) is not pool:
+            # 起動中に仕様が変わった・プールが破棄された
+            self._discard(warm)
+            return
+        pool.idle.append(warm)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _discard(self, warm: WarmContainer) -> None:
+        self._spawn(self._remove(warm))
+
+    async def _remove(self, warm: WarmContainer) -> None:
+        try:
+            await self.executor.run(warm.container.remove, force=True)
+        finally:
+            self.docker_manager.ports.release(warm.port)
+            if self.admission is not None:
+                self.admission.release(warm.container.id)
+
+    def _discard_all(self, pool: _Pool) -> None:
+        while pool.idle:
+            self._discard(pool.idle.popleft())
+
+    def invalidate(self, challenge_id: Optional[str] = None) -> None:
+        """Drop idle containers (all pools, or one) so they are rebuilt on next use"""
+        targets = [challenge_id] if challenge_id else list(self._pools)
+        for cid in targets:
+            pool = self._pools.pop(cid, None)
+            if pool:
+                self._discard_all(pool)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-challenge depth and hit/miss counters"""
+        result = {}
+        for cid, pool in self._pools.items():
+            total = pool.hits + pool.misses
+            result[cid] = {
+                "size": pool.spec.size,
+                "idle": len(pool.idle),
+                "starting": pool.starting,
+                "hits": pool.hits,
+                "misses": pool.misses,
+                "hit_rate": round(pool.hits / total, 4) if total else None,
+            }
+        return result
+
+    async def shutdown(self) -> None:
+        """Remove every idle container and wait for pending pool tasks"""
+        self.invalidate()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        logger.info("Warm pools shut down")
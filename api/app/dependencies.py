@@ -5,18 +5,44 @@ Supabase JWT検証とユーザー取得
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client, Client
+from supabase import Client
+import httpx
 import os
-import requests
-from jose import jwt, JWTError
+from jose import jwt, JWTError, ExpiredSignatureError
 from typing import Optional
 
+from app.core.config import settings
+from app.core import supabase_client
+from app.core.token_cache import TokenCache
+
 # Security scheme
 security = HTTPBearer()
 
+# 検証済みトークンのキャッシュ（token hash -> user, exp まで有効）
+token_cache = TokenCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE)
+
+# /auth/v1/user 問い合わせ用の keep-alive クライアント（初回のリモート検証時に作成）
+_auth_client: Optional[httpx.AsyncClient] = None
+
+
+def get_auth_client() -> httpx.AsyncClient:
+    """リモート検証用の非同期 HTTP クライアントを取得（プロセス内で共有）"""
+    global _auth_client
+    if _auth_client is None:
+        _auth_client = httpx.AsyncClient(timeout=settings.SUPABASE_TIMEOUT_SECONDS)
+    return _auth_client
+
+
+async def close_auth_client() -> None:
+    """リモート検証用クライアントの接続を閉じる（シャットダウン時）"""
+    global _auth_client
+    if _auth_client is not None:
+        await _auth_client.aclose()
+        _auth_client = None
+
 # Supabase client for JWT verification
 def get_supabase_client() -> Client:
-    """Supabaseクライアントを取得"""
+    """Supabaseクライアントを取得（プロセス内で共有）"""
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_ANON_KEY")
     
@@ -26,7 +52,7 @@ def get_supabase_client() -> Client:
             detail="Supabase configuration missing"
         )
     
-    return create_client(supabase_url, supabase_key)
+    return supabase_client.get_client(supabase_url, supabase_key)
 
 
 def get_supabase_jwt_secret() -> str:
@@ -42,12 +68,144 @@ def get_supabase_jwt_secret() -> str:
     return jwt_secret
 
 
+def _user_from_claims(claims: dict) -> dict:
+    """JWTクレームからユーザー情報を組み立てる"""
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "user_metadata": claims.get("user_metadata", {}),
+    }
+
+
+def _verify_token_locally(token: str) -> Optional[dict]:
+    """
+    SUPABASE_JWT_SECRET でJWTをローカル検証する
+
+    Returns:
+        dict: 検証済みクレーム / None: ローカル検証不可（リモートにフォールバック）
+
+    Raises:
+        HTTPException: トークンが不正・期限切れの場合
+    """
+    jwt_secret = os.getenv("SUPABASE_JWT_SECRET")
+    if not jwt_secret:
+        if settings.AUTH_REMOTE_FALLBACK:
+            return None
+        # フォールバック無効時は設定エラーとして扱う
+        get_supabase_jwt_secret()
+
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # 非対称鍵（ES256/RS256）で署名されたトークンは共有シークレットでは検証できない
+    if header.get("alg") != "HS256":
+        if settings.AUTH_REMOTE_FALLBACK:
+            return None
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Unsupported token algorithm: {header.get('alg')}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    try:
+        claims = jwt.decode(
+            token,
+            jwt_secret,
+            algorithms=["HS256"],
+            audience=settings.SUPABASE_JWT_AUDIENCE or None,
+        )
+    except ExpiredSignatureError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has expired",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if not claims.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
+
+async def _verify_token_remotely(token: str) -> dict:
+    """Supabase Auth (/auth/v1/user) に問い合わせてユーザー情報を取得"""
+    # 環境変数のチェック
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_anon_key = os.getenv("SUPABASE_ANON_KEY")
+    
+    if not supabase_url:
+        print("[ERROR] SUPABASE_URL environment variable is not set")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Server configuration error: SUPABASE_URL is not set. Please contact administrator."
+        )
+    
+    if not supabase_anon_key:
+        print("[ERROR] SUPABASE_ANON_KEY environment variable is not set")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Server configuration error: SUPABASE_ANON_KEY is not set. Please contact administrator."
+        )
+    
+    # Supabase REST APIを使ってユーザー情報を取得
+    # この方法は、JWTトークンが有効な場合にユーザー情報を返す
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "apikey": supabase_anon_key,
+    }
+    
+    # イベントループをブロックしないよう非同期クライアントで問い合わせる
+    response = await get_auth_client().get(f"{supabase_url}/auth/v1/user", headers=headers)
+    
+    if response.status_code != 200:
+        error_detail = "Invalid authentication credentials"
+        try:
+            error_data = response.json()
+            error_detail = error_data.get("message", error_detail)
+        except:
+            pass
+        
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=error_detail,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user_data = response.json()
+    
+    return {
+        "id": user_data.get("id"),
+        "email": user_data.get("email"),
+        "user_metadata": user_data.get("user_metadata", {}),
+    }
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """
     JWTトークンを検証してユーザー情報を取得
     
+    AUTH_VERIFY_MODE=local の場合は SUPABASE_JWT_SECRET でローカル検証し、
+    検証できない場合のみ AUTH_REMOTE_FALLBACK に従って /auth/v1/user に問い合わせる。
+    検証済みのユーザー情報はトークンの exp まで TokenCache に保持する。
+    リモート検証の結果は失効（ログアウト等）を反映できるよう AUTH_REMOTE_CACHE_SECONDS までに制限する。
+    
     Args:
         credentials: HTTP Bearerトークン
     
@@ -59,64 +217,33 @@ async def get_current_user(
     """
     token = credentials.credentials
     
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+    
     try:
-        # 環境変数のチェック
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_anon_key = os.getenv("SUPABASE_ANON_KEY")
+        claims = None
+        if settings.AUTH_VERIFY_MODE == "local":
+            claims = _verify_token_locally(token)
         
-        if not supabase_url:
-            print("[ERROR] SUPABASE_URL environment variable is not set")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Server configuration error: SUPABASE_URL is not set. Please contact administrator."
-            )
-        
-        if not supabase_anon_key:
-            print("[ERROR] SUPABASE_ANON_KEY environment variable is not set")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Server configuration error: SUPABASE_ANON_KEY is not set. Please contact administrator."
-            )
-        
-        # Supabase REST APIを使ってユーザー情報を取得
-        # この方法は、JWTトークンが有効な場合にユーザー情報を返す
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "apikey": supabase_anon_key,
-        }
-        
-        response = requests.get(
-            f"{supabase_url}/auth/v1/user",
-            headers=headers,
-            timeout=5
-        )
-        
-        if response.status_code != 200:
-            error_detail = "Invalid authentication credentials"
-            try:
-                error_data = response.json()
-                error_detail = error_data.get("message", error_detail)
-            except:
-                pass
-            
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=error_detail,
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        user_data = response.json()
-        
-        return {
-            "id": user_data.get("id"),
-            "email": user_data.get("email"),
-            "user_metadata": user_data.get("user_metadata", {}),
-        }
+        if claims is not None:
+            user = _user_from_claims(claims)
+            token_cache.set(token, user, claims.get("exp"))
+            return user
+
+        user = await _verify_token_remotely(token)
+        # 署名未検証の exp は信用しきれず、失効もサーバー側でしか分からないため短時間だけキャッシュする
+        try:
+            expires_at = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            expires_at = None
+        token_cache.set(token, user, expires_at, ttl=settings.AUTH_REMOTE_CACHE_SECONDS)
+        return user
     
     except HTTPException:
         # HTTPExceptionはそのまま再発生
         raise
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"[ERROR] Request exception during authentication: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -131,4 +258,3 @@ async def get_current_user(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error during authentication: {str(e)}",
         )
-
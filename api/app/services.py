@@ -0,0 +1,587 @@
+"""
+アプリケーション全体で共有するリソースの生成と配線（API ルーターとライフサイクルから参照する）
+
+Docker 関連のリソースは import 時には接続せず、startup() の init_docker_resources で生成して
+このモジュールの変数を差し替える。ルーターからは ``services.X`` として参照すること
+（``from app.services import X`` では差し替え前の None を掴んでしまう）。
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Optional
+
+import docker
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from supabase import Client
+
+from app.core import supabase_client
+from app.core.admission import AdmissionController, host_memory_bytes, parse_memory
+from app.core.catalog_cache import CatalogCache
+from app.core.catalog_query import sort_key
+from app.core.config import settings
+from app.core.docker_executor import DockerExecutor
+from app.core.docker_manager import DockerManager
+from app.core.dynamic_flags import DynamicFlags
+from app.core.flag_cache import FlagCache
+from app.core.health import HealthMonitor
+from app.core.metrics import SUPABASE_QUERY_SECONDS, timed
+from app.core.node_pool import NodePool, connect_node
+from app.core.provisioning import CHALLENGE_COLUMNS, MissionProvisioner, uses_dynamic_flag
+from app.core.proxy import ReverseProxy, hostname
+from app.core.readiness import ContainerEventWatcher
+from app.core.scheduler import SchedulerManager
+from app.core.scoreboard import Scoreboard
+from app.core.session_registry import SessionRegistry
+from app.core.sessions import SessionManager
+from app.core.shared_instances import SharedInstanceManager
+from app.core.solved_state import SolvedBitsets
+from app.core.start_jobs import Reporter, StartJobManager
+from app.core.submission_writer import SubmissionLogWriter
+from app.core.warm_pool import WarmPoolManager
+from app.dependencies import close_auth_client
+
+
+# Docker SDK のブロッキング呼び出し専用スレッドプール
+docker_executor = DockerExecutor(max_workers=settings.DOCKER_EXECUTOR_WORKERS)
+
+# Docker 関連リソース（import 時には接続せず、lifespan の init_docker_resources で生成）
+client: Optional[docker.DockerClient] = None
+container_events: Optional[ContainerEventWatcher] = None
+docker_manager: Optional[DockerManager] = None
+warm_pool: Optional[WarmPoolManager] = None
+shared_instances: Optional[SharedInstanceManager] = None
+scheduler_manager: Optional[SchedulerManager] = None
+node_pool: Optional[NodePool] = None
+provisioner: Optional[MissionProvisioner] = None
+
+def supabase_query(table: str, operation: str) -> timed:
+    """Supabase クエリのレイテンシ計測（sol_supabase_query_duration_seconds）"""
+    return timed(SUPABASE_QUERY_SECONDS, table=table, operation=operation)
+
+# API プロセスは1つだけ（状態をプロセス内に持つため）
+
+# 実行中セッション（ユーザー ⇔ コンテナ）のレジストリ。DBへはバックグラウンドで書き込み
+def _persist_sessions(rows: list[dict]) -> None:
+    with supabase_query(settings.SESSION_TABLE, "upsert"):
+        get_supabase_db_client().table(settings.SESSION_TABLE).upsert(rows, on_conflict="container_id").execute()
+
+
+def _delete_sessions(container_ids: list[str]) -> None:
+    with supabase_query(settings.SESSION_TABLE, "delete"):
+        get_supabase_db_client().table(settings.SESSION_TABLE).delete().in_("container_id", container_ids).execute()
+
+
+session_registry = SessionRegistry(
+    max_per_user=settings.SESSION_MAX_PER_USER,
+    persist_upsert=_persist_sessions,
+    persist_delete=_delete_sessions,
+)
+
+
+def _load_persisted_sessions() -> dict:
+    """active_sessions の全行を container_id ごとに取得する"""
+    with supabase_query(settings.SESSION_TABLE, "select"):
+        rows = get_supabase_db_client().table(settings.SESSION_TABLE).select("*").execute().data or []
+    return {row["container_id"]: row for row in rows if row.get("container_id")}
+
+
+# ホスト容量に基づく起動の受付制御（予算超過時は公平なキューで待機、THROTTLED 時は新規起動を停止）
+CONTAINER_CPU = float(settings.CONTAINER_CPU_LIMIT)
+CONTAINER_MEMORY = parse_memory(settings.CONTAINER_MEMORY_LIMIT)
+admission = AdmissionController(
+    cpu_budget=settings.ADMISSION_CPU_BUDGET or float(os.cpu_count() or 1),
+    memory_budget=(
+        parse_memory(settings.ADMISSION_MEMORY_BUDGET) if settings.ADMISSION_MEMORY_BUDGET
+        else int(host_memory_bytes() * 0.8)
+    ),
+    max_queue_depth=settings.ADMISSION_MAX_QUEUE_DEPTH,
+)
+admission.set_state(settings.PIPELINE_STATE)
+
+# 起動ジョブ（POST /api/containers/start）と進捗イベントの保持
+start_jobs = StartJobManager(retention_seconds=settings.START_JOB_RETENTION_SECONDS)
+
+
+def init_docker_resources() -> None:
+    """
+    Docker クライアントと関連リソースを生成する（lifespan から1度だけ呼ぶ、ブロッキング）
+    
+    - Docker ノードプール（DOCKER_NODES、未設定時は DOCKER_HOST の1台）。ノードごとに
+      Docker events 購読（ポート割り当て・起動完了の検出）とイメージキャッシュを持つ
+    - 問題ごとの起動済みコンテナプール（WARM_POOL_SIZES で問題別にサイズ指定、先頭ノードで実行）
+    - instance_mode: shared の問題の共有レプリカ（SHARED_INSTANCE_REPLICAS 台、先頭ノードで実行）
+    - 取りこぼし回収（ヒープ・レジストリが把握していない期限切れコンテナのみ削除、全ノード）
+    """
+    global client, container_events, docker_manager, warm_pool, shared_instances, scheduler_manager, node_pool
+    global provisioner
+    nodes = []
+    for spec in settings.docker_nodes or [{"name": "local", "base_url": None, "container_host": ""}]:
+        try:
+            nodes.append(connect_node(
+                spec["name"],
+                spec["base_url"],
+                spec["container_host"] or resolve_container_host(),
+                settings.CONTAINER_PORT_RANGE,
+                network=settings.CONTAINER_NETWORK,
+                max_instances=settings.DOCKER_NODE_MAX_INSTANCES,
+            ))
+        except Exception as e:
+            print(f"[WARNING] Docker node {spec['name']} is not available: {str(e)}")
+    if not nodes:
+        raise Exception("No Docker node is available")
+    node_pool = NodePool(nodes, port_grace_seconds=settings.CONTAINER_START_TIMEOUT_SECONDS * 4)
+    sessions.node_pool = node_pool
+    node_pool.refresh_inventories()
+    if len(node_pool) > 1:
+        # 受付制御の予算が未指定なら全ノードの合計を使う
+        if not settings.ADMISSION_CPU_BUDGET and sum(n.cpus for n in node_pool):
+            admission.cpu_budget = float(sum(n.cpus for n in node_pool))
+        if not settings.ADMISSION_MEMORY_BUDGET and sum(n.memory_total for n in node_pool):
+            admission.memory_budget = int(sum(n.memory_total for n in node_pool) * 0.8)
+    
+    primary = node_pool.primary
+    client, container_events, docker_manager = primary.client, primary.events, primary.manager
+    warm_pool = WarmPoolManager(
+        docker_manager,
+        docker_executor,
+        default_size=settings.WARM_POOL_DEFAULT_SIZE,
+        pool_sizes=settings.warm_pool_sizes,
+        flag_path=settings.WARM_POOL_FLAG_PATH,
+        max_age_seconds=settings.WARM_POOL_MAX_AGE_SECONDS,
+        admission=admission,
+        container_cpu=CONTAINER_CPU,
+        container_memory=CONTAINER_MEMORY,
+    )
+    shared_instances = SharedInstanceManager(
+        docker_manager,
+        docker_executor,
+        replicas=settings.SHARED_INSTANCE_REPLICAS,
+        check_interval_seconds=settings.SHARED_INSTANCE_CHECK_SECONDS,
+        # 割り当て・プロキシトークンは最後の起動・アクセスからコンテナと同じ有効期限で失効
+        assignment_ttl_seconds=settings.CONTAINER_TTL_MINUTES * 60,
+        admission=admission,
+        container_cpu=CONTAINER_CPU,
+        container_memory=CONTAINER_MEMORY,
+    )
+    provisioner = MissionProvisioner(
+        sessions,
+        admission,
+        docker_executor,
+        node_pool,
+        warm_pool,
+        shared_instances,
+        load_challenge=load_start_challenge,
+        ensure_network=ensure_ctf_network,
+        dynamic_flags=dynamic_flags,
+        cpu_limit=os.getenv("CONTAINER_CPU_LIMIT", settings.CONTAINER_CPU_LIMIT),
+        memory_limit=os.getenv("CONTAINER_MEMORY_LIMIT", settings.CONTAINER_MEMORY_LIMIT),
+        pids_limit=int(os.getenv("CONTAINER_PIDS_LIMIT", str(settings.CONTAINER_PIDS_LIMIT))),
+        start_timeout_seconds=settings.CONTAINER_START_TIMEOUT_SECONDS,
+        wait_ready=settings.CONTAINER_WAIT_READY,
+        admission_max_wait_seconds=settings.ADMISSION_MAX_WAIT_SECONDS,
+    )
+    scheduler_manager = SchedulerManager(
+        [node.manager for node in node_pool],
+        known_ids=lambda: (
+            sessions.expiry.scheduled_ids()
+            | {s.container_id for s in session_registry.all()}
+            | shared_instances.container_ids()
+        ),
+        interval_minutes=settings.EXPIRY_RECONCILE_MINUTES,
+        node_pool=node_pool,
+        inventory_refresh_seconds=settings.NODE_INVENTORY_REFRESH_SECONDS,
+    )
+
+# 組み込みリバースプロキシ（トークンでセッションを引き、ctf_net のコンテナIPへストリーミング転送）
+# 転送した通信はアイドル検出のアクティビティとして記録する
+# プレイヤーの Authorization と認証 Cookie はコンテナへ転送しない
+PROXY_ENABLED = bool(settings.PROXY_PUBLIC_URL or settings.PROXY_DOMAIN)
+PROXY_SECRET = settings.PROXY_TOKEN_SECRET.encode()
+# パス方式（PROXY_DOMAIN 未設定時）のホスト名。問題のJSがAPIと同じオリジンで動かないよう、
+# このホストではプロキシのパスだけを返し、プロキシのパスはこのホストでしか返さない
+PROXY_PATH_HOST = hostname(settings.PROXY_PUBLIC_URL) if not settings.PROXY_DOMAIN else None
+reverse_proxy = ReverseProxy(
+    max_connections=settings.PROXY_MAX_CONNECTIONS,
+    max_keepalive=settings.PROXY_MAX_KEEPALIVE,
+    connect_timeout=settings.PROXY_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=settings.PROXY_READ_TIMEOUT_SECONDS,
+    strip_cookie_prefixes=[p.strip() for p in settings.PROXY_STRIP_COOKIE_PREFIXES.split(",") if p.strip()],
+)
+
+
+def session_url(token: str, container_host: str, port: int) -> str:
+    """
+    セッションのURL
+    
+    PROXY_DOMAIN 設定時は {token}.PROXY_DOMAIN、PROXY_PUBLIC_URL 設定時は
+    PROXY_PUBLIC_URL + PROXY_PATH_PREFIX/{token}/、どちらも未設定ならノードのホストポートを直接返す。
+    """
+    if settings.PROXY_DOMAIN:
+        scheme = settings.PROXY_PUBLIC_URL.split("://", 1)[0] if "://" in settings.PROXY_PUBLIC_URL else "http"
+        return f"{scheme}://{token}.{settings.PROXY_DOMAIN.strip('.')}/"
+    if settings.PROXY_PUBLIC_URL:
+        return f"{settings.PROXY_PUBLIC_URL.rstrip('/')}{settings.PROXY_PATH_PREFIX}/{token}/"
+    return f"http://{container_host}:{port}"
+
+
+# セッションのライフサイクル（期限切れ削除・アイドル時の pause と再開・停止・延長・起動時の復元）
+# 期限のヒープで直近の期限まで待機し、通信量が IDLE_PAUSE_MINUTES 分変化しないコンテナを pause する
+sessions = SessionManager(
+    session_registry,
+    docker_executor,
+    admission,
+    reverse_proxy,
+    PROXY_SECRET,
+    session_url,
+    container_cpu=CONTAINER_CPU,
+    container_memory=CONTAINER_MEMORY,
+    ttl_seconds=settings.CONTAINER_TTL_MINUTES * 60,
+    network=settings.CONTAINER_NETWORK,
+    idle_seconds=settings.IDLE_PAUSE_MINUTES * 60,
+    idle_interval_seconds=settings.IDLE_SAMPLE_INTERVAL_SECONDS,
+    expiry_max_concurrency=settings.EXPIRY_MAX_CONCURRENCY,
+    load_persisted=_load_persisted_sessions,
+)
+# プロキシが転送した通信はアイドル検出のアクティビティとして記録する
+reverse_proxy.on_activity = sessions.idle.touch
+
+
+# ctf_netネットワークの確保
+def ensure_ctf_network(docker_client=None):
+    """ctf_netネットワークが存在することを確認し、なければ作成（docker_client 省略時は先頭ノード）"""
+    docker_client = docker_client or client
+    try:
+        networks = docker_client.networks.list(names=["ctf_net"])
+        if not networks:
+            print("[INFO] Creating ctf_net network (internal)")
+            docker_client.networks.create(
+                name="ctf_net",
+                driver="bridge",
+                internal=True  # 外部インターネットアクセス不可
+            )
+            print("[SUCCESS] ctf_net network created")
+        else:
+            print("[INFO] ctf_net network already exists")
+    except Exception as e:
+        print(f"[WARNING] Failed to ensure ctf_net network: {str(e)}")
+        # ネットワーク作成に失敗しても続行（既存のネットワークを使用）
+
+def resolve_container_host() -> str:
+    """
+    コンテナURL用のホスト名を解決する（優先順位: CONTAINER_HOST > API_HOST > localhost）
+    
+    環境非依存（ローカル/本番両対応）のURL生成ロジック
+    """
+    container_host = os.getenv("CONTAINER_HOST") or os.getenv("API_HOST") or "localhost"
+    
+    # 空文字列の場合は localhost にフォールバック
+    container_host = container_host.strip()
+    # 0.0.0.0 の場合は localhost に置換（ブラウザでアクセス可能にするため）
+    if not container_host or container_host == "0.0.0.0":
+        container_host = "localhost"
+    
+    # CONTAINER_HOSTがプロトコル（http:// や https://）を含む場合は除去
+    # また、末尾のスラッシュも除去
+    if container_host.startswith("http://"):
+        container_host = container_host[7:]
+    elif container_host.startswith("https://"):
+        container_host = container_host[8:]
+    if container_host.endswith("/"):
+        container_host = container_host[:-1]
+    return container_host
+
+# 問題一覧キャッシュ（ソート・writeup置換済み）
+catalog_cache = CatalogCache(ttl_seconds=settings.CATALOG_CACHE_TTL_SECONDS)
+
+# 正解Flagダイジェストのキャッシュ（submit_flag のDB読み込みを省略）
+flag_cache = FlagCache(ttl_seconds=settings.FLAG_CACHE_TTL_SECONDS)
+
+# ユーザーごとの動的Flag（environment.flag_mode が "dynamic" の問題、提出時は HMAC を再計算して照合）
+# 無効時（DYNAMIC_FLAGS_ENABLED=false）は None で、動的Flagの問題は起動・正解できない
+dynamic_flags: Optional[DynamicFlags] = (
+    DynamicFlags(settings.FLAG_HMAC_SECRET.encode(), settings.FLAG_HMAC_SALT)
+    if settings.DYNAMIC_FLAGS_ENABLED and settings.FLAG_HMAC_SECRET else None
+)
+
+# Flag照合に必要な challenges の列（flag_mode・instance_mode は mission JSON の environment）
+FLAG_COLUMNS = (
+    "id, flag_answer, "
+    "instance_mode:metadata->environment->>instance_mode, flag_mode:metadata->environment->>flag_mode"
+)
+
+
+def check_secrets(cors_origins: list[str]) -> None:
+    """
+    署名鍵の設定を検証し、不足していれば起動を中止する
+    
+    SECRET_KEY は既定値が公開されているため、Flag・プロキシトークンの鍵には流用しない。
+    パス方式のプロキシはフロントエンド（CORS_ORIGINS）と同じホスト名では起動しない。
+    """
+    if settings.DYNAMIC_FLAGS_ENABLED and not settings.FLAG_HMAC_SECRET:
+        raise RuntimeError("DYNAMIC_FLAGS_ENABLED requires FLAG_HMAC_SECRET")
+    if PROXY_ENABLED and not settings.PROXY_TOKEN_SECRET:
+        raise RuntimeError("PROXY_PUBLIC_URL / PROXY_DOMAIN require PROXY_TOKEN_SECRET")
+    if PROXY_PATH_HOST and PROXY_PATH_HOST in {hostname(origin) for origin in cors_origins}:
+        raise RuntimeError("PROXY_PUBLIC_URL needs a host name of its own, not the frontend's (CORS_ORIGINS)")
+
+# スコアボード（起動時に submission_logs を1度だけ走査し、以降は正解提出ごとに差分更新）
+scoreboard = Scoreboard()
+
+# ユーザーごとの正解済み問題（問題の通し番号のビット集合、問題一覧のレスポンスに合成）
+solved_bitsets = SolvedBitsets()
+
+
+def _iter_submission_logs(page_size: int):
+    """submission_logs を古い順にページ単位で読み出す（起動時の一括走査）"""
+    supabase = get_supabase_db_client()
+    offset = 0
+    while True:
+        with supabase_query("submission_logs", "select"):
+            rows = supabase.table("submission_logs").select(
+                "user_id, challenge_id, is_correct, created_at"
+            ).order("created_at").range(offset, offset + page_size - 1).execute().data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def load_scoreboard() -> None:
+    """問題の配点と全提出履歴からスコアボードを構築する（lifespan から1度だけ呼ぶ、ブロッキング）"""
+    with supabase_query("challenges", "select"):
+        rows = get_supabase_db_client().table("challenges").select("id, points").execute().data or []
+    points = {row["id"]: row.get("points") or 0 for row in rows}
+    count = scoreboard.bootstrap(points, _iter_submission_logs(settings.SCOREBOARD_BOOTSTRAP_PAGE_SIZE))
+    solved_bitsets.rebuild(scoreboard.solved_sets())
+    print(f"[INFO] Scoreboard loaded: {count} submissions, {len(scoreboard)} players")
+
+# submission_logs の書き込みバッファ（バックグラウンドで一括insert）
+def _insert_submission_logs(rows: list[dict]) -> None:
+    with supabase_query("submission_logs", "insert"):
+        get_supabase_db_client().table("submission_logs").insert(rows).execute()
+
+
+submission_log_writer = SubmissionLogWriter(
+    insert_batch=_insert_submission_logs,
+    batch_size=settings.SUBMISSION_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.SUBMISSION_LOG_FLUSH_INTERVAL_MS,
+    max_queue_size=settings.SUBMISSION_LOG_QUEUE_SIZE,
+    spill_path=settings.SUBMISSION_LOG_SPILL_PATH,
+)
+
+# Supabase Client (Service Key for database access)
+def get_supabase_db_client() -> Client:
+    """Supabaseデータベースアクセス用クライアント（Service Key使用、プロセス内で共有）"""
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_service_key = os.getenv("SUPABASE_SERVICE_KEY")
+    
+    if not supabase_url or not supabase_service_key:
+        raise HTTPException(
+            status_code=500,
+            detail="Supabase configuration missing (SUPABASE_URL or SUPABASE_SERVICE_KEY)"
+        )
+    
+    return supabase_client.get_client(supabase_url, supabase_service_key)
+
+
+def _check_docker() -> None:
+    """全ノードに ping のみ（応答しないノードは配置対象から外す）。イメージ・ポートの棚卸しは scheduler_manager で定期実行"""
+    if node_pool is None:
+        raise Exception("Docker client not initialized")
+    node_pool.ping()
+
+
+def _check_database() -> None:
+    # 簡単なクエリで接続確認
+    with supabase_query("challenges", "health"):
+        get_supabase_db_client().table("challenges").select("id").limit(1).execute()
+
+
+# 依存サービスのヘルスチェック（並列実行・個別タイムアウト・結果キャッシュ）
+health_monitor = HealthMonitor(
+    timeout_seconds=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+    cache_seconds=settings.HEALTH_CACHE_SECONDS,
+)
+health_monitor.register("database", _check_database)
+health_monitor.register("docker", _check_docker)
+
+
+def load_challenge_catalog() -> list[dict]:
+    """
+    Supabaseから問題一覧を取得し、レスポンス用に整形する（CatalogCacheのローダー）
+    
+    pointsの昇順ソート（同点はID順）と writeup 内のホスト名置換をここで1度だけ行う。
+    """
+    supabase = get_supabase_db_client()
+    # 存在するカラムのみを取得（categoryカラムは存在しないため除外）
+    # 実際のDBスキーマ: id, title, description, difficulty, points, image_name, internal_port, flag, writeup など
+    with supabase_query("challenges", "select"):
+        response = supabase.table("challenges").select(
+            "id, title, description, difficulty, points, writeup"
+        ).execute()
+    
+    print(f"[INFO] Supabase response: {len(response.data) if response.data else 0} challenges found")
+    
+    if not response.data:
+        print("[WARNING] No challenges found in database")
+        return []
+    
+    # 配点の変更をスコアボードに反映（変わっていなければ何もしない）
+    scoreboard.set_points({c["id"]: c.get("points") or 0 for c in response.data if c.get("id")})
+    
+    # CONTAINER_HOSTを取得して、writeup内のプレースホルダーまたはlocalhostを置換
+    container_host = resolve_container_host()
+    
+    result = []
+    for challenge in response.data:
+        writeup = challenge.get("writeup")
+        # writeup内のプレースホルダーまたはlocalhostを実際のホスト名に置換
+        if writeup:
+            # {{CONTAINER_HOST}} プレースホルダーを置換
+            writeup = writeup.replace("{{CONTAINER_HOST}}", container_host)
+            # http://localhost: パターンを置換（既存のデータ対応）
+            writeup = re.sub(r'http://localhost:', f'http://{container_host}:', writeup)
+        
+        # DBのidカラムをchallenge_idとしてマッピング
+        result.append({
+            "challenge_id": challenge.get("id"),  # DBのidをchallenge_idとして設定
+            "title": challenge.get("title", ""),
+            "description": challenge.get("description"),
+            "difficulty": challenge.get("difficulty"),
+            "points": challenge.get("points"),
+            "category": None,  # 存在しないカラムのため明示的にNone
+            "has_writeup": bool(writeup),
+            "writeup": writeup,  # 置換済みの writeup
+        })
+    
+    # pointsの昇順でソート（None値は最後、同点はID順。カーソルページングの順序になる）
+    result.sort(key=sort_key)
+    return result
+
+
+def load_start_challenge(challenge_id: str) -> Optional[dict]:
+    """起動に必要な問題情報（イメージ・ポート・flag_answer・Flag モード）を取得する（ない場合は None）"""
+    supabase = get_supabase_db_client()
+    with supabase_query("challenges", "select"):
+        response = supabase.table("challenges").select(CHALLENGE_COLUMNS).eq("id", challenge_id).execute()
+    return response.data[0] if response.data else None
+
+
+def load_flag_answer(challenge_id: str) -> tuple[Optional[str], bool]:
+    """challengesテーブルから正解Flag（flag_answer、ない場合は None）と動的Flagの問題かを取得する"""
+    supabase = get_supabase_db_client()
+    # flag_answerカラムのみを取得（flagカラムは存在しないため削除）
+    with supabase_query("challenges", "select"):
+        challenge_response = supabase.table("challenges").select(FLAG_COLUMNS).eq("id", challenge_id).execute()
+    
+    if not challenge_response.data or len(challenge_response.data) == 0:
+        raise HTTPException(status_code=404, detail=f"Challenge '{challenge_id}' not found")
+    
+    challenge = challenge_response.data[0]
+    return challenge.get("flag_answer") or None, uses_dynamic_flag(challenge)
+
+
+def preload_flag_cache() -> None:
+    """起動時に全問題の正解Flagダイジェストと Flag モードを一括ロードする"""
+    supabase = get_supabase_db_client()
+    with supabase_query("challenges", "select"):
+        response = supabase.table("challenges").select(FLAG_COLUMNS).execute()
+    count = flag_cache.preload({**row, "dynamic": uses_dynamic_flag(row)} for row in response.data or [])
+    print(f"[INFO] Flag cache preloaded: {count} challenges")
+
+
+def init_supabase_resources() -> None:
+    """Supabaseクライアントを起動時に1度だけ生成（接続プールを全リクエストで共有）"""
+    if not (os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_SERVICE_KEY")):
+        return
+    try:
+        get_supabase_db_client()
+        if settings.FLAG_CACHE_PRELOAD:
+            preload_flag_cache()
+    except Exception as e:
+        print(f"[WARNING] Failed to initialize Supabase resources: {str(e)}")
+    try:
+        load_scoreboard()
+    except Exception as e:
+        print(f"[WARNING] Failed to bootstrap scoreboard: {str(e)}")
+
+
+def start_background_tasks() -> None:
+    """ネットワーク作成と取りこぼし回収スケジューラの開始"""
+    if node_pool is None:
+        return
+    for node in node_pool:
+        ensure_ctf_network(node.client)
+    scheduler_manager.start()
+
+
+async def provision_mission(user_id: str, challenge_id: str, report: Optional[Reporter] = None) -> dict:
+    """ミッション環境を起動し、MissionStartResponse 相当の dict を返す（失敗時は ProvisioningError）"""
+    if provisioner is None:
+        raise HTTPException(status_code=503, detail="Docker is not available")
+    return await provisioner.provision(user_id, challenge_id, report)
+
+
+async def startup() -> None:
+    """
+    共有リソースの生成とバックグラウンドタスクの開始（lifespan から1度だけ呼ぶ）
+    
+    Docker / Supabase の初期化は import 時ではなくここで並行して行う。
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(
+            run_in_threadpool(init_supabase_resources),
+            docker_executor.run(init_docker_resources),
+        )
+    except Exception as e:
+        print(f"[WARNING] Docker is not available: {str(e)}")
+    
+    try:
+        # spill ファイルの再投入でファイル I/O があるためスレッドで実行
+        await run_in_threadpool(submission_log_writer.start)
+    except Exception as e:
+        print(f"[WARNING] Failed to start submission log writer: {str(e)}")
+    if node_pool is not None:
+        node_pool.start_events()
+        try:
+            await docker_executor.run(sessions.rebuild)
+        except Exception as e:
+            print(f"[WARNING] Failed to rebuild session registry: {str(e)}")
+    session_registry.start()
+    # 復元したセッションの有効期限をヒープに積んでから期限監視を開始
+    sessions.restore_deadlines()
+    sessions.expiry.start()
+    sessions.idle.start()
+    if shared_instances is not None:
+        shared_instances.start()
+    start_background_tasks()
+    health_monitor.start(settings.HEALTH_REFRESH_INTERVAL_SECONDS)
+    print(f"[INFO] Startup completed in {(time.perf_counter() - started) * 1000:.0f} ms (pid={os.getpid()})")
+
+
+async def shutdown() -> None:
+    """バックグラウンドタスクの停止と共有リソースの解放（startup の逆順）"""
+    await health_monitor.stop()
+    await sessions.idle.stop()
+    # 進行中の起動ジョブを打ち切る（ロールバックは DockerExecutor で実行されるため先に行う）
+    await start_jobs.shutdown()
+    if scheduler_manager is not None and scheduler_manager.scheduler.running:
+        scheduler_manager.shutdown()
+    await sessions.expiry.stop()
+    session_registry.stop()
+    # 未送信の submission_logs を書き出してから接続プールを閉じる
+    await run_in_threadpool(submission_log_writer.stop)
+    supabase_client.close_clients()
+    await reverse_proxy.close()
+    await close_auth_client()
+    if warm_pool is not None:
+        await warm_pool.shutdown()
+    if shared_instances is not None:
+        await shared_instances.shutdown()
+    if node_pool is not None:
+        node_pool.close()
+    docker_executor.shutdown()
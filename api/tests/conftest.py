@@ -0,0 +1,8 @@
+"""
+API 単体テストの共通設定（api/ をインポートパスに追加）
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
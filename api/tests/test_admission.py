@@ -0,0 +1,129 @@
+"""
+AdmissionController（ユーザー間ラウンドロビン・失敗時の解放）のテスト
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejected, parse_memory
+
+MB = 1024 ** 2
+
+
+def test_parse_memory():
+    assert parse_memory("128m") == 128 * MB
+    assert parse_memory("1g") == 1024 * MB
+    assert parse_memory("512") == 512
+
+
+def test_queue_admits_users_round_robin():
+    async def scenario():
+        admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 * MB)
+        await admission.acquire("running", "owner", 1.0, MB, timeout=1)
+
+        order = []
+
+        async def start(key, user_id):
+            await admission.acquire(key, user_id, 1.0, MB, timeout=5)
+            order.append(key)
+
+        # alice が3件、bob が1件並ぶ: alice を続けて通さずに交互に許可する
+        tasks = [
+            asyncio.create_task(start("a1", "alice")),
+            asyncio.create_task(start("a2", "alice")),
+            asyncio.create_task(start("a3", "alice")),
+            asyncio.create_task(start("b1", "bob")),
+        ]
+        await asyncio.sleep(0)
+        assert [admission.position(key) for key in ("a1", "b1", "a2", "a3")] == [1, 2, 3, 4]
+
+        previous = "running"
+        for admitted in range(1, len(tasks) + 1):
+            admission.release(previous)
+            while len(order) < admitted:
+                await asyncio.sleep(0)
+            previous = order[-1]
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["a1", "b1", "a2", "a3"]
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    async def scenario():
+        admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 * MB)
+        await admission.acquire("running", "owner", 1.0, MB, timeout=1)
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire("late", "alice", 1.0, MB, timeout=0.01)
+        assert admission.position("late") is None
+        assert admission.stats()["queue_depth"] == 0
+
+        # 空いた枠はタイムアウトした要求に割り当てられない
+        admission.release("running")
+        assert admission.stats()["reservations"] == 0
+        return admission.stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
+
+
+def test_cancelled_start_releases_its_reservation():
+    async def scenario():
+        admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 * MB)
+        await admission.acquire("running", "owner", 1.0, MB, timeout=1)
+        task = asyncio.create_task(admission.acquire("pending", "alice", 1.0, MB, timeout=5))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert admission.position("pending") is None
+
+        admission.release("running")
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["reservations"] == 0
+    assert stats["cpu_reserved"] == 0
+
+
+def test_release_after_failed_start_admits_the_next_waiter():
+    async def scenario():
+        admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 * MB)
+        await admission.acquire("start:alice", "alice", 1.0, MB, timeout=1)
+        waiter = asyncio.create_task(admission.acquire("start:bob", "bob", 1.0, MB, timeout=5))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        # 起動失敗時は起動用のキーで解放する
+        admission.release("start:alice")
+        await waiter
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["reservations"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_transfer_moves_the_reservation_to_the_container_id():
+    admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 * MB)
+    assert admission.try_reserve("start:alice", 0.5, MB)
+    admission.transfer("start:alice", "container-1")
+    admission.release("start:alice")
+    assert admission.stats()["reservations"] == 1
+    admission.release("container-1")
+    assert admission.stats()["reservations"] == 0
+
+
+def test_blocking_state_rejects_queued_starts():
+    async def scenario():
+        admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 * MB)
+        await admission.acquire("running", "owner", 1.0, MB, timeout=1)
+        waiter = asyncio.create_task(admission.acquire("queued", "alice", 1.0, MB, timeout=5))
+        await asyncio.sleep(0)
+        admission.set_state("THROTTLED")
+        with pytest.raises(AdmissionRejected):
+            await waiter
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire("new", "bob", 0.1, MB, timeout=1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,80 @@
+"""
+CatalogCache（TTL・無効化・ETag と条件付きリクエスト）のテスト
+"""
+
+from datetime import timedelta
+from email.utils import format_datetime
+
+from app.core.catalog_cache import CatalogCache, is_not_modified
+
+ITEMS = [{"challenge_id": "c1", "title": "One", "points": 100}]
+
+
+class CountingLoader:
+    def __init__(self, items):
+        self.items = items
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.items)
+
+
+def test_snapshot_is_served_from_memory_until_invalidated():
+    cache = CatalogCache(ttl_seconds=60)
+    loader = CountingLoader(ITEMS)
+    first = cache.get(loader)
+    assert cache.get(loader) is first
+    assert loader.calls == 1
+
+    cache.invalidate()
+    assert cache.get(loader) is not first
+    assert loader.calls == 2
+
+
+def test_expired_snapshot_is_reloaded():
+    cache = CatalogCache(ttl_seconds=0)
+    loader = CountingLoader(ITEMS)
+    cache.get(loader)
+    cache.get(loader)
+    assert loader.calls == 2
+
+
+def test_unchanged_reload_keeps_the_validators():
+    cache = CatalogCache(ttl_seconds=60)
+    loader = CountingLoader(ITEMS)
+    first = cache.get(loader)
+    cache.invalidate()
+    second = cache.get(loader)
+    assert (second.etag, second.last_modified) == (first.etag, first.last_modified)
+
+
+def test_changed_catalog_gets_a_new_etag():
+    cache = CatalogCache(ttl_seconds=60)
+    loader = CountingLoader(ITEMS)
+    first = cache.get(loader)
+    loader.items = ITEMS + [{"challenge_id": "c2", "title": "Two", "points": 200}]
+    cache.invalidate()
+    assert cache.get(loader).etag != first.etag
+
+
+def test_if_none_match_returns_not_modified_for_the_current_etag():
+    snapshot = CatalogCache().get(CountingLoader(ITEMS))
+    etag = snapshot.etag
+    assert is_not_modified({"if-none-match": etag}, etag, snapshot.last_modified)
+    assert is_not_modified({"if-none-match": f'"other", {etag}'}, etag, snapshot.last_modified)
+    assert is_not_modified({"if-none-match": "*"}, etag, snapshot.last_modified)
+    assert not is_not_modified({"if-none-match": '"stale"'}, etag, snapshot.last_modified)
+    assert not is_not_modified({}, etag, snapshot.last_modified)
+
+
+def test_if_modified_since_is_used_only_without_if_none_match():
+    snapshot = CatalogCache().get(CountingLoader(ITEMS))
+    modified = snapshot.last_modified
+    same = format_datetime(modified, usegmt=True)
+    earlier = format_datetime(modified - timedelta(seconds=1), usegmt=True)
+    assert is_not_modified({"if-modified-since": same}, snapshot.etag, modified)
+    assert not is_not_modified({"if-modified-since": earlier}, snapshot.etag, modified)
+    assert not is_not_modified({"if-modified-since": "not a date"}, snapshot.etag, modified)
+    # If-None-Match が優先される
+    assert not is_not_modified({"if-none-match": '"stale"', "if-modified-since": same}, snapshot.etag, modified)
@@ -0,0 +1,38 @@
+"""
+カタログの射影・ページング・ETag のテスト
+"""
+
+from app.core.catalog_query import LIST_FIELDS, parse_fields, variant_etag
+from app.core.encoding import negotiate_encoding
+
+ETAG = '"abc123-def456"'
+
+
+def test_default_representation_keeps_the_catalog_etag():
+    assert variant_etag(ETAG, LIST_FIELDS, None, None, None) == ETAG
+
+
+def test_each_representation_gets_its_own_etag():
+    variants = {
+        variant_etag(ETAG, LIST_FIELDS, None, None, None),
+        variant_etag(ETAG, parse_fields("title,points"), None, None, None),
+        variant_etag(ETAG, LIST_FIELDS, None, 10, None),
+        variant_etag(ETAG, LIST_FIELDS, "cursor-1", 10, None),
+        variant_etag(ETAG, LIST_FIELDS, "cursor-2", 10, None),
+        variant_etag(ETAG, LIST_FIELDS, None, None, "gzip"),
+        variant_etag(ETAG, LIST_FIELDS, None, None, "br"),
+    }
+    assert len(variants) == 7
+    for etag in variants:
+        assert etag.startswith('"abc123-def456') and etag.endswith('"')
+
+
+def test_variant_etag_is_stable():
+    fields = parse_fields("title")
+    assert variant_etag(ETAG, fields, "c", 5, "gzip") == variant_etag(ETAG, fields, "c", 5, "gzip")
+
+
+def test_uncompressed_body_shares_the_etag_across_accept_encodings():
+    # しきい値未満の本文は圧縮されないため、Accept-Encoding が違っても同じ ETag になる
+    small = [negotiate_encoding(10, accept, 1024) for accept in ("gzip", "br", None)]
+    assert len({variant_etag(ETAG, LIST_FIELDS, None, None, enc) for enc in small}) == 1
@@ -0,0 +1,77 @@
+"""
+DockerExecutor（専用スレッドプール・実行中の件数・イベントループを塞がないこと）のテスト
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.core.docker_executor import DockerExecutor
+
+
+def test_calls_run_on_the_docker_pool_with_arguments():
+    async def scenario():
+        executor = DockerExecutor(max_workers=2)
+        try:
+            return await executor.run(lambda a, b=0: (threading.current_thread().name, a + b), 1, b=2)
+        finally:
+            executor.shutdown()
+
+    thread_name, result = asyncio.run(scenario())
+    assert thread_name.startswith("docker")
+    assert result == 3
+
+
+def test_blocking_call_does_not_block_the_event_loop():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        executor = DockerExecutor(max_workers=1)
+        release = threading.Event()
+        try:
+            call = asyncio.create_task(executor.run(release.wait, 5))
+            started = loop.time()
+            # Docker 呼び出しの実行中もループは他の処理を進められる
+            await asyncio.sleep(0.05)
+            elapsed = loop.time() - started
+            pending, in_flight = not call.done(), executor.in_flight
+            release.set()
+            assert await call is True
+            return elapsed < 1, pending, in_flight, executor.in_flight
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(scenario()) == (True, True, 1, 0)
+
+
+def test_pool_is_bounded_and_queued_calls_count_as_in_flight():
+    async def scenario():
+        executor = DockerExecutor(max_workers=1)
+        release = threading.Event()
+        try:
+            calls = [asyncio.create_task(executor.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            in_flight = executor.in_flight
+            release.set()
+            await asyncio.gather(*calls)
+            return in_flight, executor.in_flight
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(scenario()) == (3, 0)
+
+
+def test_exceptions_propagate_and_release_the_slot():
+    def fail():
+        raise RuntimeError("docker down")
+
+    async def scenario():
+        executor = DockerExecutor(max_workers=1)
+        try:
+            with pytest.raises(RuntimeError, match="docker down"):
+                await executor.run(fail)
+            return executor.in_flight
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(scenario()) == 0
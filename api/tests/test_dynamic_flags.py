@@ -0,0 +1,53 @@
+"""
+動的Flag（HMAC による導出）と Flag モードに応じた照合のテスト
+"""
+
+from app.core.dynamic_flags import DIGEST_LENGTH, FLAG_PREFIX, DynamicFlags, parse_flag_mode
+from app.core.flag_cache import FlagCache, verify_submission
+
+FLAGS = DynamicFlags(b"hmac-secret", salt="event-1")
+
+
+def test_derived_flags_are_per_user_and_per_challenge():
+    alice = FLAGS.derive("c1", "alice")
+    assert alice.startswith(FLAG_PREFIX) and alice.endswith("}")
+    assert len(alice) == len(FLAG_PREFIX) + DIGEST_LENGTH + 1
+    assert FLAGS.derive("c1", "alice") == alice
+    assert len({alice, FLAGS.derive("c1", "bob"), FLAGS.derive("c2", "alice")}) == 3
+
+
+def test_secret_and_salt_change_every_flag():
+    alice = FLAGS.derive("c1", "alice")
+    assert DynamicFlags(b"other-secret", salt="event-1").derive("c1", "alice") != alice
+    assert DynamicFlags(b"hmac-secret", salt="event-2").derive("c1", "alice") != alice
+
+
+def test_verify_accepts_only_the_users_own_flag():
+    alice = FLAGS.derive("c1", "alice")
+    assert FLAGS.verify("c1", "alice", f"  {alice}\n")
+    assert not FLAGS.verify("c1", "bob", alice)
+    assert not FLAGS.verify("c2", "alice", alice)
+    assert not FLAGS.verify("c1", "alice", alice.upper())
+    assert not FLAGS.verify("c1", "alice", "SolCTF{short}")
+
+
+def test_parse_flag_mode():
+    assert parse_flag_mode("Dynamic") == "dynamic"
+    assert parse_flag_mode(None) == "static"
+    assert parse_flag_mode("per-user") == "static"
+
+
+def test_dynamic_challenge_ignores_the_static_flag():
+    entry = FlagCache().set("c1", "FLAG{static}", dynamic=True)
+    alice = FLAGS.derive("c1", "alice")
+    assert verify_submission(entry, "c1", "alice", alice, FLAGS)
+    assert not verify_submission(entry, "c1", "alice", "FLAG{static}", FLAGS)
+    assert not verify_submission(entry, "c1", "bob", alice, FLAGS)
+    # 動的Flagが無効な場合は何も受け付けない
+    assert not verify_submission(entry, "c1", "alice", alice, None)
+
+
+def test_static_challenge_ignores_derived_flags():
+    entry = FlagCache().set("c1", "FLAG{static}")
+    assert verify_submission(entry, "c1", "alice", "FLAG{static}", FLAGS)
+    assert not verify_submission(entry, "c1", "alice", FLAGS.derive("c1", "alice"), FLAGS)
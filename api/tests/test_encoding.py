@@ -0,0 +1,43 @@
+"""
+レスポンスの圧縮形式の選択（サイズしきい値・Accept-Encoding）のテスト
+"""
+
+import gzip
+
+from app.core import encoding
+from app.core.encoding import apply_encoding, choose_encoding, encode_json, negotiate_encoding
+
+
+def test_small_bodies_are_never_compressed():
+    assert negotiate_encoding(99, "gzip, br", 100) is None
+    assert negotiate_encoding(100, "gzip", 100) == "gzip"
+
+
+def test_zero_threshold_disables_compression():
+    assert negotiate_encoding(10_000, "gzip", 0) is None
+
+
+def test_q_zero_excludes_an_encoding():
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+
+
+def test_apply_encoding_sets_content_encoding():
+    body, headers = apply_encoding(b"x" * 100, "gzip")
+    assert gzip.decompress(body) == b"x" * 100
+    assert headers == {"Vary": "Accept-Encoding", "Content-Encoding": "gzip"}
+
+    body, headers = apply_encoding(b"{}", None)
+    assert body == b"{}"
+    assert headers == {"Vary": "Accept-Encoding"}
+
+
+def test_encode_json_compresses_only_above_the_threshold(monkeypatch):
+    monkeypatch.setattr(encoding, "brotli", None)
+    body, headers = encode_json({"a": 1}, "gzip", 1000)
+    assert "Content-Encoding" not in headers
+
+    payload = [{"title": "challenge"}] * 100
+    body, headers = encode_json(payload, "gzip", 100)
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == encoding.dumps(payload)
@@ -0,0 +1,79 @@
+"""
+ExpiryScheduler（期限の延長・古いヒープエントリの読み飛ばし）のテスト
+"""
+
+import asyncio
+import time
+
+from app.core.expiry import ExpiryScheduler
+
+
+def make_scheduler(expired):
+    async def on_expire(container_id):
+        expired.append(container_id)
+
+    return ExpiryScheduler(on_expire)
+
+
+def test_pop_expired_skips_rescheduled_and_cancelled_entries():
+    scheduler = make_scheduler([])
+    scheduler.schedule("extended", 10.0)
+    scheduler.schedule("cancelled", 20.0)
+    scheduler.schedule("due", 30.0)
+    scheduler.schedule("extended", 100.0)
+    scheduler.cancel("cancelled")
+
+    assert scheduler._pop_expired(50.0) == ["due"]
+    assert scheduler.deadline_for("extended") == 100.0
+    assert scheduler.scheduled_ids() == {"extended"}
+    assert scheduler._pop_expired(100.0) == ["extended"]
+    assert len(scheduler) == 0
+
+
+def test_next_delay_drops_stale_heap_entries():
+    scheduler = make_scheduler([])
+    scheduler.schedule("a", 10.0)
+    scheduler.schedule("a", 40.0)
+    scheduler.schedule("b", 20.0)
+    scheduler.cancel("b")
+
+    assert scheduler._next_delay(0.0) == 40.0
+    assert len(scheduler._heap) == 1
+    scheduler.cancel("a")
+    assert scheduler._next_delay(0.0) is None
+
+
+def test_running_scheduler_tears_down_only_current_deadlines():
+    async def scenario():
+        expired = []
+        scheduler = make_scheduler(expired)
+        scheduler.start()
+        now = time.time()
+        scheduler.schedule("short", now + 0.05)
+        scheduler.schedule("extended", now + 0.05)
+        scheduler.schedule("extended", now + 60)
+        scheduler.schedule("stopped", now + 0.05)
+        scheduler.cancel("stopped")
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        return expired, scheduler
+
+    expired, scheduler = asyncio.run(scenario())
+    assert expired == ["short"]
+    assert scheduler.scheduled_ids() == {"extended"}
+
+
+def test_earlier_deadline_wakes_the_scheduler():
+    async def scenario():
+        expired = []
+        scheduler = make_scheduler(expired)
+        scheduler.start()
+        scheduler.schedule("later", time.time() + 60)
+        await asyncio.sleep(0.01)
+        # 眠っているタスクはより早い期限の追加で起こされる
+        scheduler.schedule("sooner", time.time() + 0.05)
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        return expired
+
+    assert asyncio.run(scenario()) == ["sooner"]
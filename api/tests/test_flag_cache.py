@@ -0,0 +1,71 @@
+"""
+FlagCache（ダイジェストの照合・失効・フラグ差し替え）のテスト
+"""
+
+from app.core.flag_cache import FlagCache, FlagEntry, flag_digest
+
+
+def test_miss_then_hit():
+    cache = FlagCache()
+    assert cache.get("c1") is None
+    entry = cache.set("c1", "FLAG{one}")
+    assert cache.get("c1") == entry == FlagEntry(flag_digest("FLAG{one}"), False)
+
+
+def test_only_the_digest_is_kept_and_whitespace_is_ignored():
+    cache = FlagCache()
+    entry = cache.set("c1", "FLAG{one}")
+    assert b"FLAG{one}" not in entry.digest
+    assert FlagCache.matches(entry.digest, "  FLAG{one}\n")
+    assert not FlagCache.matches(entry.digest, "FLAG{two}")
+
+
+def test_challenge_without_a_flag_never_matches():
+    entry = FlagCache().set("c1", None)
+    assert entry.digest == b""
+    assert not FlagCache.matches(entry.digest, "")
+    assert not FlagCache.matches(entry.digest, "FLAG{anything}")
+
+
+def test_expired_entries_are_dropped():
+    cache = FlagCache(ttl_seconds=0)
+    cache.set("c1", "FLAG{one}")
+    assert cache.get("c1") is None
+    assert "c1" not in cache._entries
+
+
+def test_invalidate_one_or_all():
+    cache = FlagCache()
+    cache.set("c1", "FLAG{one}")
+    cache.set("c2", "FLAG{two}")
+    cache.invalidate("c1")
+    assert cache.get("c1") is None and cache.get("c2") is not None
+    cache.invalidate()
+    assert cache.get("c2") is None
+
+
+def test_rotated_flag_replaces_the_old_one_after_invalidation():
+    cache = FlagCache()
+    cache.preload([{"id": "c1", "flag_answer": "FLAG{old}"}])
+    old = cache.get("c1")
+    assert FlagCache.matches(old.digest, "FLAG{old}")
+
+    # 再デプロイで無効化され、次の提出で DB から新しいフラグを読み直す
+    cache.invalidate()
+    new = cache.set("c1", "FLAG{new}")
+    assert not FlagCache.matches(new.digest, "FLAG{old}")
+    assert FlagCache.matches(new.digest, "FLAG{new}")
+
+
+def test_preload_replaces_every_entry_and_records_the_mode():
+    cache = FlagCache()
+    cache.set("gone", "FLAG{gone}")
+    count = cache.preload([
+        {"id": "c1", "flag_answer": "FLAG{one}"},
+        {"id": "c2", "flag_answer": None, "dynamic": True},
+        {"flag_answer": "FLAG{no-id}"},
+    ])
+    assert count == 2
+    assert cache.get("gone") is None
+    assert cache.get("c1").dynamic is False
+    assert cache.get("c2") == FlagEntry(b"", True)
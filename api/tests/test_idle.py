@@ -0,0 +1,124 @@
+"""
+IdleMonitor（通信量による pause 判定・アクセスでの活動記録）のテスト
+"""
+
+import asyncio
+
+from app.core.docker_executor import DockerExecutor
+from app.core.idle import IdleMonitor, network_bytes
+from app.core.session_registry import Session, SessionRegistry
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Harness:
+    """サンプル値・pause 対象を制御する IdleMonitor の組み立て"""
+
+    def __init__(self, candidates=("c1",), idle_seconds=300):
+        self.clock = FakeClock()
+        self.candidates = list(candidates)
+        self.traffic = {cid: 0 for cid in candidates}
+        self.paused = []
+        self.executor = DockerExecutor(max_workers=2)
+        self.monitor = IdleMonitor(
+            candidates=lambda: self.candidates,
+            sample=self.sample,
+            on_idle=self.on_idle,
+            executor=self.executor,
+            idle_seconds=idle_seconds,
+            clock=self.clock,
+        )
+
+    def sample(self, container_id):
+        traffic = self.traffic[container_id]
+        if isinstance(traffic, Exception):
+            raise traffic
+        return traffic
+
+    async def on_idle(self, container_id):
+        self.paused.append(container_id)
+
+    def sweep_at(self, now):
+        async def sweep():
+            # start() を使わずに1回分の巡回だけ実行する
+            self.monitor._semaphore = asyncio.Semaphore(2)
+            await self.monitor.sweep()
+
+        self.clock.now = now
+        asyncio.run(sweep())
+
+
+def test_container_without_traffic_is_paused_after_the_idle_period():
+    harness = Harness()
+    harness.sweep_at(1000)
+    harness.sweep_at(1299)
+    assert harness.paused == []
+    harness.sweep_at(1300)
+    assert harness.paused == ["c1"] and harness.monitor.paused == 1
+    # pause 後は状態を忘れ、再開後は新しい期間として数える
+    assert harness.monitor.idle_for("c1") is None
+
+
+def test_traffic_restarts_the_idle_period():
+    harness = Harness()
+    harness.sweep_at(1000)
+    harness.traffic["c1"] = 4096
+    harness.sweep_at(1200)
+    harness.sweep_at(1450)
+    assert harness.paused == []
+    harness.sweep_at(1500)
+    assert harness.paused == ["c1"]
+
+
+def test_proxied_requests_count_as_activity():
+    harness = Harness()
+    harness.sweep_at(1000)
+    harness.clock.now = 1250
+    harness.monitor.touch("c1")
+    assert harness.monitor.idle_for("c1") == 0
+    harness.sweep_at(1400)
+    assert harness.paused == []
+
+
+def test_containers_that_stop_being_candidates_are_forgotten():
+    harness = Harness(candidates=("c1", "c2"))
+    harness.sweep_at(1000)
+    harness.candidates = ["c2"]
+    harness.sweep_at(1100)
+    assert harness.monitor.idle_for("c1") is None
+    harness.candidates = ["c1", "c2"]
+    harness.sweep_at(1300)
+    assert harness.paused == ["c2"]
+
+
+def test_failed_samples_never_pause():
+    harness = Harness()
+    harness.traffic["c1"] = RuntimeError("stats unavailable")
+    harness.sweep_at(1000)
+    harness.sweep_at(5000)
+    assert harness.paused == []
+
+
+def test_network_bytes_sums_every_interface():
+    stats = {"networks": {"eth0": {"rx_bytes": 10, "tx_bytes": 5}, "eth1": {"rx_bytes": 1, "tx_bytes": None}}}
+    assert network_bytes(stats) == 16
+    assert network_bytes({}) == 0
+
+
+def test_paused_sessions_are_not_idle_candidates():
+    registry = SessionRegistry()
+    for container_id in ("a" * 64, "b" * 64):
+        registry.add(
+            Session(user_id="alice", challenge_id=container_id[0], container_id=container_id, port=20000, url=""),
+            persist=False,
+        )
+    registry.set_paused("a" * 64, True)
+    assert [session.container_id for session in registry.active()] == ["b" * 64]
+    registry.set_paused("a" * 64, False)
+    assert len(registry.active()) == 2
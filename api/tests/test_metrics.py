@@ -0,0 +1,85 @@
+"""
+メトリクス（Prometheus テキスト形式 0.0.4 の出力）のテスト
+"""
+
+import pytest
+
+from app.core.metrics import Counter, Gauge, Histogram, Registry, timed
+
+
+def test_counter_and_gauge_exposition():
+    registry = Registry()
+    starts = Counter("sol_starts_total", "Starts", ("source",), registry=registry)
+    running = Gauge("sol_running", "Running", registry=registry)
+    starts.inc(source="warm")
+    starts.inc(2, source="cold")
+    running.set(3)
+    running.dec()
+
+    assert registry.render().splitlines() == [
+        "# HELP sol_starts_total Starts",
+        "# TYPE sol_starts_total counter",
+        'sol_starts_total{source="warm"} 1',
+        'sol_starts_total{source="cold"} 2',
+        "# HELP sol_running Running",
+        "# TYPE sol_running gauge",
+        "sol_running 2",
+    ]
+    assert starts.value(source="cold") == 2
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = Registry()
+    latency = Histogram("sol_op_seconds", "Latency", ("op",), buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, op="run")
+
+    assert registry.render().splitlines()[2:] == [
+        'sol_op_seconds_bucket{op="run",le="0.1"} 2',
+        'sol_op_seconds_bucket{op="run",le="1"} 3',
+        'sol_op_seconds_bucket{op="run",le="+Inf"} 4',
+        'sol_op_seconds_sum{op="run"} 2.65',
+        'sol_op_seconds_count{op="run"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    gauge = Gauge("sol_g", "G", ("challenge_id",), registry=registry)
+    gauge.set(1, challenge_id='a"b\\c\nd')
+    assert 'sol_g{challenge_id="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_wrong_labels_and_duplicate_names_are_rejected():
+    registry = Registry()
+    counter = Counter("sol_c", "C", ("source",), registry=registry)
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    with pytest.raises(ValueError):
+        Counter("sol_c", "Again", registry=registry)
+
+
+def test_timed_records_even_when_the_block_raises():
+    registry = Registry()
+    latency = Histogram("sol_t_seconds", "T", ("op",), registry=registry)
+    with pytest.raises(RuntimeError):
+        with timed(latency, op="fail"):
+            raise RuntimeError("boom")
+
+    @timed(latency, op="ok")
+    def work():
+        return "done"
+
+    assert work() == "done"
+    text = registry.render()
+    assert 'sol_t_seconds_count{op="fail"} 1' in text
+    assert 'sol_t_seconds_count{op="ok"} 1' in text
+
+
+def test_write_textfile_replaces_the_file(tmp_path):
+    registry = Registry()
+    Gauge("sol_g", "G", registry=registry).set(5)
+    path = tmp_path / "sol.prom"
+    registry.write_textfile(str(path))
+    assert path.read_text() == registry.render()
+    assert [p.name for p in tmp_path.iterdir()] == ["sol.prom"]
@@ -0,0 +1,116 @@
+"""
+DockerManager.run_mission_container（起動待ちでスレッドを占有しない・失敗時の後始末）のテスト
+"""
+
+import asyncio
+import itertools
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("docker")
+
+from app.core.docker_executor import DockerExecutor
+from app.core.docker_manager import DockerManager
+from app.core.ports import PortAllocator
+from app.core.readiness import ContainerEndpoint
+
+_ids = itertools.count(1)
+
+
+class FakeContainer:
+    def __init__(self):
+        self.id = f"container-{next(_ids)}"
+        self.short_id = self.id[:12]
+        self.removed = False
+
+    def start(self):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeClient:
+    def __init__(self):
+        self.containers = self
+        self.created = []
+
+    def ping(self):
+        return True
+
+    def create(self, **kwargs):
+        container = FakeContainer()
+        self.created.append(container)
+        return container
+
+
+class FakeEvents:
+    """start / ready をテストから解決する ContainerEventWatcher の代わり"""
+
+    def __init__(self):
+        self.started = {}
+        self.ready = {}
+
+    def watch_start(self, container_id, port_key):
+        self.started[container_id] = Future()
+        return self.started[container_id]
+
+    def wait_ready(self, host, port, timeout=30.0, container_id=None, http=False):
+        self.ready[container_id] = Future()
+        return self.ready[container_id]
+
+
+def make_manager():
+    events = FakeEvents()
+    client = FakeClient()
+    manager = DockerManager(client=client, events=events, ports=PortAllocator(range(20000, 20004)))
+    return manager, client, events
+
+
+async def wait_for(condition):
+    while not condition():
+        await asyncio.sleep(0.001)
+
+
+def test_waiting_for_readiness_does_not_hold_an_executor_thread():
+    async def scenario():
+        manager, client, events = make_manager()
+        executor = DockerExecutor(max_workers=1)
+        task = asyncio.create_task(manager.run_mission_container(executor, "web:latest", 8000))
+        await wait_for(lambda: client.created)
+        container = client.created[0]
+        await wait_for(lambda: executor.in_flight == 0)
+
+        # 唯一のワーカーは起動待ちの間も他の Docker 呼び出しに使える
+        assert await executor.run(lambda: "free") == "free"
+
+        events.started[container.id].set_result(ContainerEndpoint(container.id, 20000, "10.0.0.2"))
+        await wait_for(lambda: container.id in events.ready)
+        assert not task.done()
+        events.ready[container.id].set_result(True)
+        result = await task
+        executor.shutdown()
+        return result, container
+
+    (container, port), created = asyncio.run(scenario())
+    assert container is created and port == 20000
+    assert not container.removed
+
+
+def test_failed_start_removes_the_container_and_releases_the_port():
+    async def scenario():
+        manager, client, events = make_manager()
+        executor = DockerExecutor(max_workers=1)
+        task = asyncio.create_task(manager.run_mission_container(executor, "web:latest", 8000))
+        await wait_for(lambda: client.created)
+        container = client.created[0]
+        events.started[container.id].set_exception(RuntimeError("container died"))
+        with pytest.raises(RuntimeError):
+            await task
+        executor.shutdown()
+        return manager, container
+
+    manager, container = asyncio.run(scenario())
+    assert container.removed
+    assert manager.ports.in_use == 0
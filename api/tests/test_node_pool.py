@@ -0,0 +1,93 @@
+"""
+NodePool の配置キーと公開ポート解放のテスト
+"""
+
+import pytest
+
+pytest.importorskip("docker")
+
+from app.core.node_pool import DockerNode, NodePool
+from app.core.ports import PortAllocator
+
+
+def make_pool():
+    ports = PortAllocator(range(20000, 20003))
+    node = DockerNode(name="local", client=None, container_host="localhost", ports=ports)
+    return NodePool([node]), node
+
+
+def test_failed_cold_start_releases_port_under_pending_key():
+    """コンテナ作成後に起動が失敗しても、起動用のキーで解放すればポートが戻る"""
+    pool, node = make_pool()
+    pool.place("start:u1:c1", "web:latest", memory=0)
+    port = node.ports.allocate()
+
+    # 配置はまだコンテナIDへ移譲されていないため、コンテナIDでは解放されない
+    assert pool.release("container-id", port) is None
+    assert node.ports.in_use == 1
+
+    assert pool.release("start:u1:c1", port) is node
+    assert node.ports.in_use == 0
+    assert node.running == 0
+
+
+def test_release_after_transfer_uses_container_id():
+    """起動成功後（移譲済み）はコンテナIDで配置とポートを解放する"""
+    pool, node = make_pool()
+    pool.place("start:u1:c1", "web:latest", memory=64)
+    port = node.ports.allocate()
+    pool.transfer("start:u1:c1", "container-id")
+
+    assert pool.release("start:u1:c1", port) is None
+    assert node.ports.in_use == 1
+
+    assert pool.release("container-id", port) is node
+    assert node.ports.in_use == 0
+    assert node.reserved_memory == 0
+
+
+class FakeClient:
+    def __init__(self, reachable=True):
+        self.reachable = reachable
+        self.inventory_reads = 0
+        self.images = self
+        self.containers = self
+
+    def ping(self):
+        if not self.reachable:
+            raise ConnectionError("daemon down")
+
+    def list(self, **kwargs):
+        self.inventory_reads += 1
+        return []
+
+
+def test_ping_marks_unreachable_nodes_without_reading_inventory():
+    """ヘルスチェックの ping はイメージ・コンテナ一覧を読まない"""
+    up, down = FakeClient(), FakeClient(reachable=False)
+    pool = NodePool([
+        DockerNode(name="a", client=up, container_host="a"),
+        DockerNode(name="b", client=down, container_host="b"),
+    ])
+    pool.ping()
+    assert pool.nodes["a"].healthy and not pool.nodes["b"].healthy
+    assert up.inventory_reads == 0
+
+    # 応答しないノードには配置しない
+    assert pool.place("start:u1:c1", "web:latest", memory=0).name == "a"
+
+    up.reachable = False
+    with pytest.raises(Exception):
+        pool.ping()
+
+
+def test_inventory_refresh_skips_unhealthy_nodes():
+    up, down = FakeClient(), FakeClient(reachable=False)
+    pool = NodePool([
+        DockerNode(name="a", client=up, container_host="a"),
+        DockerNode(name="b", client=down, container_host="b"),
+    ])
+    pool.ping()
+    pool.refresh_inventories()
+    assert up.inventory_reads == 2  # images.list と containers.list
+    assert down.inventory_reads == 0
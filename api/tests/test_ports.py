@@ -0,0 +1,76 @@
+"""
+PortAllocator（公開ポートの割り当て・解放・reconcile）のテスト
+"""
+
+import pytest
+
+from app.core import ports as ports_module
+from app.core.ports import PortAllocator, PortsExhausted, parse_port_range
+
+
+def test_parse_port_range():
+    assert parse_port_range("20000-20002") == range(20000, 20003)
+    assert parse_port_range("8080") == range(8080, 8081)
+    with pytest.raises(ValueError):
+        parse_port_range("30000-20000")
+
+
+def test_allocate_until_exhausted_and_release():
+    allocator = PortAllocator(range(20000, 20002))
+    first = allocator.allocate()
+    second = allocator.allocate()
+    assert {first, second} == {20000, 20001}
+    with pytest.raises(PortsExhausted):
+        allocator.allocate()
+
+    allocator.release(first)
+    assert allocator.available == 1
+    assert allocator.allocate() == first
+
+
+def test_release_is_idempotent():
+    allocator = PortAllocator(range(20000, 20002))
+    port = allocator.allocate()
+    allocator.release(port)
+    allocator.release(port)
+    assert allocator.in_use == 0
+    assert allocator.available == 2
+
+
+def test_reserved_port_is_skipped():
+    """reserve() したポート（復元したコンテナ）は割り当てない"""
+    allocator = PortAllocator(range(20000, 20002))
+    allocator.reserve(20000)
+    assert allocator.allocate() == 20001
+    with pytest.raises(PortsExhausted):
+        allocator.allocate()
+
+
+def test_reserve_ignores_ports_outside_range():
+    allocator = PortAllocator(range(20000, 20002))
+    allocator.reserve(8080)
+    assert allocator.in_use == 0
+
+
+def test_reconcile_respects_grace_period(monkeypatch):
+    """公開されていないポートは grace_seconds を過ぎてから回収する（起動中のコンテナを守る）"""
+    now = [1000.0]
+    monkeypatch.setattr(ports_module.time, "monotonic", lambda: now[0])
+    allocator = PortAllocator(range(20000, 20003))
+    in_flight = allocator.allocate()
+
+    assert allocator.reconcile([], grace_seconds=120) == 0
+    assert allocator.in_use == 1
+
+    now[0] += 121
+    assert allocator.reconcile([], grace_seconds=120) == 1
+    assert allocator.in_use == 0
+    assert in_flight in [allocator.allocate() for _ in range(3)]
+
+
+def test_reconcile_marks_published_ports_used():
+    """他プロセスが公開しているポートは使用中として扱う"""
+    allocator = PortAllocator(range(20000, 20002))
+    allocator.reconcile([20000, 9999], grace_seconds=120)
+    assert allocator.in_use == 1
+    assert allocator.allocate() == 20001
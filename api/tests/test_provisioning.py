@@ -0,0 +1,230 @@
+"""
+MissionProvisioner（共有レプリカ・既存セッション・ウォームプール・コールドスタートのロールバック）のテスト
+"""
+
+import asyncio
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+docker = pytest.importorskip("docker")
+pytest.importorskip("httpx")
+
+from app.core.admission import AdmissionController
+from app.core.docker_executor import DockerExecutor
+from app.core.provisioning import MissionProvisioner, ProvisioningError, uses_dynamic_flag
+from app.core.session_registry import Session, SessionRegistry
+from app.core.sessions import SessionManager
+from app.core.warm_pool import WarmContainer
+
+CPU = 0.5
+MEMORY = 256 * 1024 * 1024
+CHALLENGE = {"id": "web1", "image_name": "web:latest", "internal_port": 8000, "title": "Web 1", "flag_answer": "FLAG{x}"}
+
+
+class FakeContainer:
+    def __init__(self, container_id, status="running"):
+        self.id = container_id
+        self.short_id = container_id[:12]
+        self.status = status
+        self.removed = False
+
+    def kill(self):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeManager:
+    """コールドスタート用の DockerManager（start イベントは届かない）"""
+
+    def __init__(self):
+        self.created = []
+
+    def create_published(self, port_key, **kwargs):
+        container = FakeContainer("cold" + "0" * 60)
+        self.created.append((container, kwargs))
+        return container, 20005, Future()
+
+
+class FakeNodePool:
+    def __init__(self):
+        images = SimpleNamespace(get=lambda name: None)
+        networks = SimpleNamespace(list=lambda names: ["ctf_net"])
+        self.primary = SimpleNamespace(
+            name="local", local=True, container_host="node.example",
+            client=SimpleNamespace(images=images, networks=networks), manager=FakeManager(),
+        )
+        self.placed = {}
+        self.released = []
+
+    def place(self, key, image, memory):
+        self.placed[key] = self.primary.name
+        return self.primary
+
+    def assign(self, key, node_name, memory):
+        self.placed[key] = node_name
+
+    def transfer(self, old_key, new_key):
+        if old_key in self.placed:
+            self.placed[new_key] = self.placed.pop(old_key)
+
+    def release(self, key, port=None):
+        self.placed.pop(key, None)
+        self.released.append((key, port))
+
+    def mark_image(self, node, image, present=True):
+        pass
+
+    def client_for(self, container_id):
+        return self.primary.client
+
+
+class FakeWarmPool:
+    def __init__(self, warm=None):
+        self.warm = warm
+
+    async def claim(self, challenge_id, image, internal_port, flag):
+        warm, self.warm = self.warm, None
+        return warm
+
+
+class FakeSharedInstances:
+    replicas = 2
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.tokens = {}
+
+    def route(self, challenge_id, user_id):
+        return self.replica
+
+    def spec_for(self, challenge_id):
+        return SimpleNamespace(title="Shared")
+
+    def register_token(self, token, challenge_id, user_id):
+        self.tokens[token] = (challenge_id, user_id)
+
+
+class FakeProxy:
+    def forget(self, key):
+        pass
+
+
+def make_provisioner(challenge=CHALLENGE, warm=None, replica=None, max_per_user=3):
+    admission = AdmissionController(cpu_budget=4.0, memory_budget=8 * MEMORY)
+    executor = DockerExecutor(max_workers=2)
+    sessions = SessionManager(
+        SessionRegistry(max_per_user=max_per_user),
+        executor,
+        admission,
+        FakeProxy(),
+        b"secret",
+        lambda token, host, port: f"https://proxy.example/p/{token}/",
+        container_cpu=CPU,
+        container_memory=MEMORY,
+        ttl_seconds=3600.0,
+        network="ctf_net",
+        idle_seconds=60.0,
+    )
+    node_pool = FakeNodePool()
+    sessions.node_pool = node_pool
+    return MissionProvisioner(
+        sessions,
+        admission,
+        executor,
+        node_pool,
+        FakeWarmPool(warm),
+        FakeSharedInstances(replica),
+        load_challenge=lambda challenge_id: challenge,
+        ensure_network=lambda client: None,
+        start_timeout_seconds=0.05,
+    )
+
+
+def test_uses_dynamic_flag_only_for_dedicated_instances():
+    assert uses_dynamic_flag({"flag_mode": "dynamic"})
+    assert not uses_dynamic_flag({"flag_mode": "dynamic", "instance_mode": "shared"})
+    assert not uses_dynamic_flag({"flag_mode": None})
+
+
+def test_running_shared_replica_is_assigned_without_a_lookup():
+    replica = SimpleNamespace(container=FakeContainer("replica" + "0" * 57), port=20010)
+    provisioner = make_provisioner(challenge=None, replica=replica)
+    response = asyncio.run(provisioner.provision("alice", "web1"))
+    assert response["message"] == "SHARED MISSION ENVIRONMENT ASSIGNED."
+    assert response["container_id"] == replica.container.short_id
+    token = response["url"].split("/")[-2]
+    assert provisioner.shared_instances.tokens[token] == ("web1", "alice")
+
+
+def test_warm_claim_registers_the_session_and_moves_capacity_to_it():
+    warm = WarmContainer(container=FakeContainer("warm" + "0" * 60), port=20003)
+    provisioner = make_provisioner(warm=warm)
+    reports = []
+    response = asyncio.run(provisioner.provision("alice", "web1", lambda phase, **data: reports.append(phase)))
+
+    session = provisioner.sessions.registry.get("alice", "web1")
+    assert response["url"] == session.url and response["port"] == 20003
+    assert reports == ["port_bound", "healthy"]
+    assert provisioner.sessions.expiry.deadline_for(warm.container.id) is not None
+    # 起動用の予約は返し、ノードへの配置はコンテナIDで持つ
+    assert provisioner.admission.stats()["cpu_reserved"] == 0.0
+    assert provisioner.node_pool.placed == {warm.container.id: "local"}
+
+
+def test_second_start_returns_the_running_session():
+    async def scenario():
+        provisioner = make_provisioner()
+        container = FakeContainer("running" + "0" * 57)
+        provisioner.node_pool.primary.client.containers = SimpleNamespace(get=lambda container_id: container)
+        provisioner.sessions.registry.add(Session(
+            user_id="alice", challenge_id="web1", container_id=container.id, port=20001, url="http://existing/",
+        ), persist=False)
+        return await provisioner.provision("alice", "web1")
+
+    response = asyncio.run(scenario())
+    assert response["message"] == "MISSION ENVIRONMENT ALREADY RUNNING."
+    assert response["url"] == "http://existing/"
+
+
+def test_quota_and_blocked_pipeline_map_to_http_statuses():
+    provisioner = make_provisioner(max_per_user=0)
+    provisioner.sessions.registry.reserve("alice", "web1")
+    with pytest.raises(ProvisioningError) as quota:
+        asyncio.run(provisioner.provision("alice", "web1"))
+    assert quota.value.status_code == 429
+
+    provisioner = make_provisioner()
+    provisioner.admission.set_state("FROZEN")
+    with pytest.raises(ProvisioningError) as blocked:
+        asyncio.run(provisioner.provision("alice", "web1"))
+    assert blocked.value.status_code == 503 and blocked.value.headers == {"Retry-After": "300"}
+    # 拒否した起動の枠は残らない
+    assert provisioner.sessions.registry.reserve("alice", "web1") is None
+
+
+def test_unknown_challenge_is_404_and_releases_the_slot():
+    provisioner = make_provisioner(challenge=None)
+    with pytest.raises(ProvisioningError) as error:
+        asyncio.run(provisioner.provision("alice", "missing"))
+    assert error.value.status_code == 404
+    assert provisioner.sessions.registry.reserve("alice", "missing") is None
+
+
+def test_cold_start_that_never_starts_is_rolled_back():
+    provisioner = make_provisioner()
+    with pytest.raises(ProvisioningError) as error:
+        asyncio.run(provisioner.provision("alice", "web1"))
+    assert error.value.status_code == 500 and "did not start" in error.value.detail
+
+    container, kwargs = provisioner.node_pool.primary.manager.created[0]
+    assert kwargs["environment"] == {"CTF_FLAG": "FLAG{x}"}
+    assert kwargs["labels"]["sol.user_id"] == "alice"
+    assert container.removed
+    assert len(provisioner.sessions.registry) == 0
+    assert provisioner.admission.stats()["cpu_reserved"] == 0.0
+    assert ("start:alice:web1", 20005) in provisioner.node_pool.released
+    assert provisioner.node_pool.placed == {}
@@ -0,0 +1,73 @@
+"""
+リバースプロキシのトークン（署名・検証）と転送ヘッダーのテスト
+"""
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app.core.proxy import (
+    TOKEN_LENGTH,
+    hostname,
+    is_session_token,
+    session_token,
+    shared_token,
+    token_from_host,
+    upstream_request_headers,
+)
+
+SECRET = b"proxy-secret"
+CONTAINER_ID = "0123456789ab" + "c" * 52
+
+
+def test_session_token_is_stable_and_signed():
+    token = session_token(SECRET, CONTAINER_ID)
+    assert len(token) == TOKEN_LENGTH and is_session_token(token)
+    assert token.startswith(CONTAINER_ID[:12])
+    # 再起動後にラベルから再計算しても同じトークンになる
+    assert session_token(SECRET, CONTAINER_ID) == token
+    # 鍵が違えば署名部分が変わる（推測できない）
+    assert session_token(b"other-secret", CONTAINER_ID) != token
+
+
+def test_shared_token_depends_on_the_key():
+    a = shared_token(SECRET, "shared:c1:alice")
+    assert is_session_token(a)
+    assert a != shared_token(SECRET, "shared:c1:bob")
+
+
+def test_token_from_host():
+    token = session_token(SECRET, CONTAINER_ID)
+    assert token_from_host(f"{token}.ctf.example.com:443", "ctf.example.com") == token
+    assert token_from_host(f"{token.upper()}.CTF.example.com", "ctf.example.com") == token
+    assert token_from_host("api.ctf.example.com", "ctf.example.com") is None
+    assert token_from_host(f"{token}.evil.com", "ctf.example.com") is None
+    assert token_from_host(f"{token}.ctf.example.com", "") is None
+
+
+def test_hostname_of_urls_and_host_headers():
+    assert hostname("https://Play.example.com:8443/i") == "play.example.com"
+    assert hostname("play.example.com:80") == "play.example.com"
+    assert hostname("[::1]:8000") == "::1"
+    assert hostname("") is None
+
+
+def test_credentials_and_hop_by_hop_headers_are_not_forwarded():
+    headers = [
+        (b"Host", b"play.example.com"),
+        (b"Authorization", b"Bearer player-jwt"),
+        (b"Connection", b"keep-alive"),
+        (b"Cookie", b"session=abc; sb-proj-auth-token=jwt; sb-proj-auth-token.0=part; theme=dark"),
+        (b"Accept", b"text/html"),
+    ]
+    assert upstream_request_headers(headers) == [
+        (b"Cookie", b"session=abc; theme=dark"),
+        (b"Accept", b"text/html"),
+    ]
+
+
+def test_cookie_header_with_only_auth_cookies_is_dropped():
+    headers = [(b"cookie", b"sb-proj-auth-token=jwt"), (b"accept", b"*/*")]
+    assert upstream_request_headers(headers) == [(b"accept", b"*/*")]
+    # 接頭辞なしなら Cookie はそのまま（Authorization は常に除去）
+    assert upstream_request_headers(headers + [(b"authorization", b"x")], ()) == headers
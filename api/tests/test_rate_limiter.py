@@ -0,0 +1,80 @@
+"""
+バケット保存先（トークンバケット・満タンになったバケットの破棄・SQLite 共有）のテスト
+"""
+
+import pytest
+
+from app.core.rate_buckets import MemoryBucketStore, SQLiteBucketStore, create_store, parse_rate
+
+
+def test_parse_rate():
+    assert parse_rate("5/minute") == (5, 5 / 60)
+    assert parse_rate("10/seconds") == (10, 10.0)
+
+
+def test_take_until_empty_then_refill():
+    store = MemoryBucketStore()
+    capacity, rate = parse_rate("2/minute")
+    assert store.take(["k"], capacity, rate, now=0.0) == 0.0
+    assert store.take(["k"], capacity, rate, now=0.0) == 0.0
+    assert store.take(["k"], capacity, rate, now=0.0) == pytest.approx(30.0)
+    assert store.take(["k"], capacity, rate, now=30.0) == 0.0
+
+
+def test_rejected_when_any_key_is_empty():
+    """ユーザー・IPのどちらかが空なら拒否し、もう一方も消費しない"""
+    store = MemoryBucketStore()
+    capacity, rate = parse_rate("1/minute")
+    assert store.take(["user"], capacity, rate, now=0.0) == 0.0
+    assert store.take(["user", "ip"], capacity, rate, now=0.0) > 0
+    assert store.take(["ip"], capacity, rate, now=0.0) == 0.0
+
+
+def test_refilled_buckets_are_evicted():
+    store = MemoryBucketStore(sweep_seconds=10.0)
+    capacity, rate = parse_rate("5/minute")
+    store.take(["a"], capacity, rate, now=0.0)
+    store.take(["b"], capacity, rate, now=5.0)
+    assert len(store) == 2
+    # "a" は 12 秒で満タンに戻る。"b" はまだ補充中
+    store.take(["c"], capacity, rate, now=15.0)
+    assert len(store) == 2
+    store.take(["c"], capacity, rate, now=30.0)
+    assert len(store) == 1
+
+
+def test_max_buckets_drops_least_recently_used():
+    store = MemoryBucketStore(max_buckets=2, sweep_seconds=3600.0)
+    capacity, rate = parse_rate("5/hour")
+    for i, key in enumerate(["a", "b", "c"]):
+        store.take([key], capacity, rate, now=float(i))
+    assert len(store) == 2
+    # 破棄された "a" は満タンから数え直す
+    for _ in range(5):
+        assert store.take(["a"], capacity, rate, now=3.0) == 0.0
+
+
+def test_sqlite_store_is_shared_through_the_file(tmp_path):
+    """同じファイルを開いた別の保存先（別プロセス相当）とバケットを共有する"""
+    path = str(tmp_path / "limits" / "buckets.db")
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    capacity, rate = parse_rate("2/minute")
+    assert first.take(["k"], capacity, rate, now=0.0) == 0.0
+    assert second.take(["k"], capacity, rate, now=0.0) == 0.0
+    assert first.take(["k"], capacity, rate, now=0.0) == pytest.approx(30.0)
+    assert second.take(["k"], capacity, rate, now=30.0) == 0.0
+
+
+def test_sqlite_store_does_not_charge_on_rejection(tmp_path):
+    store = SQLiteBucketStore(str(tmp_path / "buckets.db"))
+    capacity, rate = parse_rate("1/minute")
+    assert store.take(["user"], capacity, rate, now=0.0) == 0.0
+    assert store.take(["user", "ip"], capacity, rate, now=0.0) > 0
+    assert store.take(["ip"], capacity, rate, now=0.0) == 0.0
+
+
+def test_create_store_by_uri(tmp_path):
+    assert isinstance(create_store("memory://"), MemoryBucketStore)
+    assert isinstance(create_store(f"sqlite://{tmp_path}/buckets.db"), SQLiteBucketStore)
+    with pytest.raises(ValueError):
+        create_store("memcached://localhost")
@@ -0,0 +1,146 @@
+"""
+ContainerEventWatcher（イベントによる起動・準備完了の検出とプローブ）のテスト
+"""
+
+import queue
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.core.readiness import ContainerEndpoint, ContainerEventWatcher
+
+CONTAINER_ID = "c" * 64
+PORT_KEY = "8000/tcp"
+
+
+class FakeStream:
+    """client.events() の代わり: テストから送ったイベントを順に返す"""
+
+    def __init__(self):
+        self.events = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        self.events.put(None)
+
+
+class FakeClient:
+    def __init__(self):
+        self.api = self
+        self.stream = FakeStream()
+        self.running = False
+        self.inspections = 0
+
+    def events(self, decode=True, filters=None):
+        return self.stream
+
+    def inspect_container(self, container_id):
+        self.inspections += 1
+        return {
+            "State": {"Running": self.running},
+            "NetworkSettings": {
+                "Ports": {PORT_KEY: [{"HostIp": "0.0.0.0", "HostPort": "20001"}]},
+                "Networks": {"bridge": {"IPAddress": "172.17.0.2"}, "ctf": {"IPAddress": "10.0.0.5"}},
+            },
+        }
+
+
+@pytest.fixture
+def watcher():
+    client = FakeClient()
+    watcher = ContainerEventWatcher(client, network="ctf", probe_workers=2)
+    watcher.start()
+    yield watcher, client
+    watcher.stop()
+
+
+def send(client, action, container_id=CONTAINER_ID):
+    client.stream.events.put({"id": container_id, "Action": action})
+
+
+def test_start_event_resolves_the_endpoint(watcher):
+    watcher, client = watcher
+    future = watcher.watch_start(CONTAINER_ID, PORT_KEY)
+    assert not future.done()
+    assert client.inspections == 0  # 購読中はポーリングしない
+
+    client.running = True
+    send(client, "start")
+    assert future.result(timeout=2) == ContainerEndpoint(CONTAINER_ID, 20001, "10.0.0.5")
+    assert client.inspections == 1
+
+
+def test_events_for_other_containers_are_ignored(watcher):
+    watcher, client = watcher
+    future = watcher.watch_start(CONTAINER_ID, PORT_KEY)
+    client.running = True
+    send(client, "start", container_id="d" * 64)
+    send(client, "die", container_id="d" * 64)
+    send(client, "start")
+    assert future.result(timeout=2).host_port == 20001
+
+
+def test_die_fails_pending_start_and_ready_watches(watcher):
+    watcher, client = watcher
+    started = watcher.watch_start(CONTAINER_ID, PORT_KEY)
+    ready = watcher.wait_ready("127.0.0.1", _closed_port(), timeout=5, container_id=CONTAINER_ID)
+    send(client, "die")
+    with pytest.raises(RuntimeError, match="exited before becoming ready"):
+        started.result(timeout=2)
+    with pytest.raises(RuntimeError):
+        ready.result(timeout=2)
+
+
+def test_healthy_event_marks_the_container_ready(watcher):
+    watcher, client = watcher
+    ready = watcher.wait_ready("127.0.0.1", _closed_port(), timeout=5, container_id=CONTAINER_ID)
+    send(client, "health_status: unhealthy")
+    send(client, "health_status: healthy")
+    assert ready.result(timeout=2) is True
+
+
+def test_inspect_polling_is_used_without_the_events_stream():
+    client = FakeClient()
+    client.running = True
+    watcher = ContainerEventWatcher(client, network="ctf", probe_workers=1)
+    try:
+        endpoint = watcher.watch_start(CONTAINER_ID, PORT_KEY).result(timeout=2)
+    finally:
+        watcher.stop()
+    assert endpoint.ip_address == "10.0.0.5"
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Answer(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(503)  # 4xx / 5xx でもアプリは応答している
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_http_probe_waits_for_an_http_response():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Answer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    watcher = ContainerEventWatcher(FakeClient(), probe_workers=2)
+    try:
+        assert watcher.wait_ready("127.0.0.1", server.server_address[1], timeout=2, http=True).result(timeout=5)
+        assert watcher.wait_ready("127.0.0.1", _closed_port(), timeout=0.2, http=True).result(timeout=5) is False
+    finally:
+        watcher.stop()
+        server.shutdown()
@@ -0,0 +1,74 @@
+"""
+Scoreboard（bisect による順位・正解の重複登録）のテスト
+"""
+
+from app.core.scoreboard import Scoreboard
+
+POINTS = {"c1": 100, "c2": 200, "c3": 50}
+
+
+def make_scoreboard(rows=()):
+    scoreboard = Scoreboard()
+    scoreboard.bootstrap(POINTS, rows)
+    return scoreboard
+
+
+def test_ranking_orders_by_score_then_earliest_last_solve():
+    scoreboard = make_scoreboard([
+        {"user_id": "alice", "challenge_id": "c1", "is_correct": True, "created_at": 10},
+        {"user_id": "bob", "challenge_id": "c1", "is_correct": True, "created_at": 5},
+        {"user_id": "carol", "challenge_id": "c2", "is_correct": True, "created_at": 20},
+        {"user_id": "dave", "challenge_id": "c3", "is_correct": False, "created_at": 1},
+    ])
+    assert [entry["user_id"] for entry in scoreboard.top(10)] == ["carol", "bob", "alice"]
+    assert scoreboard.rank_of("alice")["rank"] == 3
+    assert scoreboard.rank_of("dave") is None
+    assert len(scoreboard) == 3
+
+
+def test_record_moves_the_player_in_the_ranking():
+    scoreboard = make_scoreboard()
+    assert scoreboard.record("alice", "c1", True, at=1)
+    assert scoreboard.record("bob", "c2", True, at=2)
+    assert scoreboard.rank_of("alice")["rank"] == 2
+
+    assert scoreboard.record("alice", "c2", True, at=3)
+    assert [entry["user_id"] for entry in scoreboard.top(2)] == ["alice", "bob"]
+    alice = scoreboard.rank_of("alice")
+    assert (alice["rank"], alice["score"], alice["solves"]) == (1, 300, 2)
+    assert scoreboard.rank_of("bob")["rank"] == 2
+    assert len(scoreboard) == 2
+
+
+def test_re_solving_a_challenge_is_ignored():
+    scoreboard = make_scoreboard()
+    assert scoreboard.record("alice", "c1", True, at=1)
+    assert not scoreboard.record("alice", "c1", True, at=50)
+    assert scoreboard.record("bob", "c3", True, at=2)
+    assert not scoreboard.record("bob", "c3", True, at=3)
+
+    alice = scoreboard.rank_of("alice")
+    assert alice["score"] == 100 and alice["solves"] == 1
+    assert alice["last_solve_at"] == "1970-01-01T00:00:01Z"
+    assert len(scoreboard) == 2
+    assert scoreboard.challenge_stats()["c1"]["solves"] == 1
+
+
+def test_wrong_answers_count_as_attempts_only():
+    scoreboard = make_scoreboard()
+    assert not scoreboard.record("alice", "c1", False, at=1)
+    assert scoreboard.record("bob", "c1", True, at=2)
+    stats = scoreboard.challenge_stats()["c1"]
+    assert stats["attempts"] == 2
+    assert stats["solve_rate"] == 0.5
+    assert stats["first_blood"]["user_id"] == "bob"
+    assert scoreboard.rank_of("alice") is None
+
+
+def test_set_points_rescores_and_reorders():
+    scoreboard = make_scoreboard()
+    scoreboard.record("alice", "c1", True, at=1)
+    scoreboard.record("bob", "c3", True, at=2)
+    scoreboard.set_points({"c1": 10, "c2": 200, "c3": 50})
+    assert [entry["user_id"] for entry in scoreboard.top(10)] == ["bob", "alice"]
+    assert scoreboard.rank_of("alice")["score"] == 10
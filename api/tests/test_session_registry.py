@@ -0,0 +1,62 @@
+"""
+SessionRegistry（同時起動数・冪等な起動・コンテナID/トークンでの検索）のテスト
+"""
+
+import pytest
+
+from app.core.session_registry import Session, SessionQuotaExceeded, SessionRegistry
+
+
+def make_session(user_id, challenge_id, container_id, token=None):
+    return Session(
+        user_id=user_id,
+        challenge_id=challenge_id,
+        container_id=container_id,
+        port=20000,
+        url="http://localhost:20000",
+        token=token,
+    )
+
+
+def test_reserve_returns_the_running_session_instead_of_a_new_slot():
+    registry = SessionRegistry(max_per_user=2)
+    assert registry.reserve("alice", "c1") is None
+    session = make_session("alice", "c1", "a" * 64)
+    registry.add(session, persist=False)
+    assert registry.reserve("alice", "c1") is session
+
+
+def test_quota_counts_running_and_pending_starts():
+    registry = SessionRegistry(max_per_user=2)
+    registry.add(make_session("alice", "c1", "a" * 64), persist=False)
+    assert registry.reserve("alice", "c2") is None
+    with pytest.raises(SessionQuotaExceeded):
+        registry.reserve("alice", "c3")
+    # 起動中の同じ問題への二重起動も拒否する
+    with pytest.raises(SessionQuotaExceeded):
+        registry.reserve("alice", "c2")
+
+    registry.release("alice", "c2")
+    assert registry.reserve("alice", "c3") is None
+
+
+def test_lookups_by_full_or_short_id_and_token():
+    registry = SessionRegistry()
+    session = make_session("alice", "c1", "0123456789ab" + "f" * 52, token="token-1")
+    registry.add(session, persist=False)
+    assert registry.get_by_container(session.container_id) is session
+    assert registry.get_by_container("0123456789ab") is session
+    assert registry.get_by_token("token-1") is session
+
+    registry.remove(session.container_id)
+    assert registry.get_by_container("0123456789ab") is None
+    assert registry.get_by_token("token-1") is None
+    assert registry.for_user("alice") == []
+
+
+def test_unknown_container_is_not_found():
+    """レジストリが正: 未登録のコンテナは外部を探さず None（API は 404）"""
+    registry = SessionRegistry()
+    registry.rebuild([make_session("alice", "c1", "a" * 64)])
+    assert registry.get_by_container("b" * 64) is None
+    assert len(registry) == 1
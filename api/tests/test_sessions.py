@@ -0,0 +1,293 @@
+"""
+SessionManager（起動時の復元・期限切れ削除・pause と再開・停止・延長）のテスト
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+docker = pytest.importorskip("docker")
+pytest.importorskip("httpx")
+
+from app.core.admission import AdmissionController
+from app.core.docker_executor import DockerExecutor
+from app.core.session_registry import Session, SessionRegistry
+from app.core.sessions import SessionManager, container_ip, upstream_address
+
+CPU = 0.5
+MEMORY = 256 * 1024 * 1024
+TTL = 3600.0
+
+
+class FakeContainer:
+    def __init__(self, container_id, labels, status="running", host_port=20001, ip="172.18.0.5"):
+        self.id = container_id
+        self.short_id = container_id[:12]
+        self.labels = labels
+        self.status = status
+        self.attrs = {
+            "NetworkSettings": {
+                "Ports": {f"{labels.get('sol.internal_port', '8000')}/tcp": [{"HostPort": str(host_port)}]},
+                "Networks": {"ctf_net": {"IPAddress": ip}},
+            }
+        }
+        self.removed = False
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeContainers:
+    def __init__(self):
+        self.by_id = {}
+
+    def get(self, container_id):
+        container = self.by_id.get(container_id)
+        if container is None or container.removed:
+            raise docker.errors.NotFound("No such container")
+        return container
+
+    def list(self, filters=None):
+        return list(self.by_id.values())
+
+
+class FakeAPI:
+    def __init__(self, unpause_status=None):
+        self.paused = []
+        self.unpaused = []
+        self.unpause_status = unpause_status
+
+    def pause(self, container_id):
+        self.paused.append(container_id)
+
+    def unpause(self, container_id):
+        if self.unpause_status is not None:
+            raise docker.errors.APIError("conflict", response=type("R", (), {"status_code": self.unpause_status})())
+        self.unpaused.append(container_id)
+
+
+class FakePorts:
+    def __init__(self):
+        self.reserved = set()
+
+    def reserve(self, port):
+        self.reserved.add(port)
+
+
+class FakeNode:
+    def __init__(self, name="local", local=True):
+        self.name = name
+        self.local = local
+        self.container_host = "node.example"
+        self.client = type("Client", (), {})()
+        self.client.containers = FakeContainers()
+        self.client.api = FakeAPI()
+        self.ports = FakePorts()
+
+
+class FakeNodePool:
+    def __init__(self, node):
+        self.primary = node
+        self.assigned = {}
+        self.released = []
+
+    def __iter__(self):
+        return iter([self.primary])
+
+    def client_for(self, container_id):
+        return self.primary.client
+
+    def node_for(self, container_id):
+        return self.primary
+
+    def assign(self, key, node_name, memory):
+        self.assigned[key] = node_name
+
+    def release(self, key, port=None):
+        self.released.append((key, port))
+
+
+class FakeProxy:
+    def __init__(self):
+        self.forgotten = []
+
+    def forget(self, key):
+        self.forgotten.append(key)
+
+
+def make_manager(persisted=None):
+    node = FakeNode()
+    admission = AdmissionController(cpu_budget=4.0, memory_budget=8 * MEMORY)
+    manager = SessionManager(
+        SessionRegistry(max_per_user=3),
+        DockerExecutor(max_workers=2),
+        admission,
+        FakeProxy(),
+        b"secret",
+        lambda token, host, port: f"http://{host}:{port}",
+        container_cpu=CPU,
+        container_memory=MEMORY,
+        ttl_seconds=TTL,
+        network="ctf_net",
+        idle_seconds=60.0,
+        load_persisted=(lambda: persisted) if persisted is not None else None,
+    )
+    manager.node_pool = FakeNodePool(node)
+    return manager, node
+
+
+def add_session(manager, node, container_id="c" * 64, user_id="alice", challenge_id="web1", **kwargs):
+    container = FakeContainer(container_id, {"sol.user_id": user_id, "sol.challenge_id": challenge_id})
+    node.client.containers.by_id[container_id] = container
+    session = Session(
+        user_id=user_id, challenge_id=challenge_id, container_id=container_id, port=20001, url="", **kwargs
+    )
+    manager.registry.add(session, persist=False)
+    manager.admission.reserve(container_id, CPU, MEMORY)
+    return session, container
+
+
+def test_container_ip_prefers_the_configured_network():
+    attrs = {"NetworkSettings": {"Networks": {"bridge": {"IPAddress": "10.0.0.2"}, "ctf_net": {"IPAddress": "172.18.0.5"}}}}
+    assert container_ip(attrs, "ctf_net") == "172.18.0.5"
+    assert container_ip(attrs, "other") == "10.0.0.2"
+    assert container_ip({}, "ctf_net") is None
+
+
+def test_upstream_address_uses_the_container_ip_only_on_local_nodes():
+    assert upstream_address(FakeNode(local=True), "172.18.0.5", 8000, 20001) == "172.18.0.5:8000"
+    assert upstream_address(FakeNode(local=False), "172.18.0.5", 8000, 20001) == "node.example:20001"
+    assert upstream_address(FakeNode(local=True), None, 8000, 20001) == "node.example:20001"
+
+
+def test_rebuild_restores_sessions_and_removes_orphaned_pool_containers():
+    extended = datetime.now(timezone.utc) + timedelta(hours=2)
+    manager, node = make_manager(persisted={
+        "claimed" + "0" * 57: {"user_id": "bob", "expires_at": extended.isoformat()},
+    })
+    containers = node.client.containers.by_id
+    containers["owned" + "0" * 59] = FakeContainer(
+        "owned" + "0" * 59, {"sol.user_id": "alice", "sol.challenge_id": "web1"}, status="paused", host_port=20001
+    )
+    # ウォームプールから割り当てたコンテナはユーザーラベルがなく、DBの行で補完する
+    containers["claimed" + "0" * 57] = FakeContainer(
+        "claimed" + "0" * 57, {"sol.challenge_id": "web2", "sol.pool": "warm"}, host_port=20002
+    )
+    orphan = FakeContainer("orphan" + "0" * 58, {"sol.challenge_id": "web3", "sol.pool": "warm"}, host_port=20003)
+    containers[orphan.id] = orphan
+
+    assert manager.rebuild() == 2
+    owned = manager.registry.get("alice", "web1")
+    claimed = manager.registry.get("bob", "web2")
+    assert owned.paused and owned.upstream == "172.18.0.5:8000"
+    assert owned.url == "http://node.example:20001" and owned.token
+    assert claimed.expires_at == extended and manager.deadline(claimed) == extended.timestamp()
+    assert orphan.removed
+    assert node.ports.reserved == {20001, 20002}
+    assert set(manager.node_pool.assigned) == {"owned" + "0" * 59, "claimed" + "0" * 57}
+
+    manager.restore_deadlines()
+    assert manager.expiry.scheduled_ids() == {"owned" + "0" * 59, "claimed" + "0" * 57}
+    # pause 中のセッションは CPU を予約しない
+    assert manager.admission.stats()["cpu_reserved"] == pytest.approx(CPU)
+
+
+def test_reserve_drops_a_session_whose_container_is_gone():
+    async def scenario():
+        manager, node = make_manager()
+        session, container = add_session(manager, node)
+        assert await manager.reserve("alice", "web1") is session
+        container.removed = True
+        assert await manager.reserve("alice", "web1") is None
+        return manager, session
+
+    manager, session = asyncio.run(scenario())
+    assert manager.registry.get_by_container(session.container_id) is None
+    assert manager.node_pool.released == [(session.container_id, session.port)]
+    assert manager.proxy.forgotten == [session.container_id]
+
+
+def test_pause_returns_cpu_and_resume_takes_it_back():
+    async def scenario():
+        manager, node = make_manager()
+        session, _ = add_session(manager, node)
+        await manager.pause(session.container_id)
+        paused_cpu = manager.admission.stats()["cpu_reserved"]
+        await manager.resume(session)
+        return manager, node, session, paused_cpu
+
+    manager, node, session, paused_cpu = asyncio.run(scenario())
+    assert paused_cpu == 0.0
+    assert manager.admission.stats()["cpu_reserved"] == pytest.approx(CPU)
+    assert node.client.api.paused == [session.container_id]
+    assert node.client.api.unpaused == [session.container_id]
+    assert not session.paused
+
+
+def test_resume_treats_409_as_already_running():
+    async def scenario():
+        manager, node = make_manager()
+        session, _ = add_session(manager, node, paused=True)
+        node.client.api.unpause_status = 409
+        await manager.resume(session)
+        return session
+
+    assert not asyncio.run(scenario()).paused
+
+
+def test_stop_reports_whether_the_container_still_existed():
+    async def scenario():
+        manager, node = make_manager()
+        running, running_container = add_session(manager, node)
+        gone, gone_container = add_session(manager, node, container_id="d" * 64, challenge_id="web2")
+        gone_container.removed = True
+        return manager, running_container, await manager.stop(running), await manager.stop(gone)
+
+    manager, running_container, stopped, already_gone = asyncio.run(scenario())
+    assert stopped and not already_gone
+    assert running_container.killed and running_container.removed
+    assert len(manager.registry) == 0
+    assert manager.expiry.scheduled_ids() == set()
+    assert manager.admission.stats()["cpu_reserved"] == 0.0
+
+
+def test_extend_never_shortens_and_stores_the_deadline():
+    async def scenario():
+        manager, node = make_manager()
+        later = datetime.now(timezone.utc) + timedelta(seconds=TTL * 2)
+        session, _ = add_session(manager, node, expires_at=later)
+        return manager, session, later, await manager.extend(session)
+
+    manager, session, later, deadline = asyncio.run(scenario())
+    assert deadline == later.timestamp()
+    assert manager.expiry.deadline_for(session.container_id) == deadline
+
+    async def fresh():
+        manager, node = make_manager()
+        session, _ = add_session(manager, node, paused=True)
+        return manager, session, await manager.extend(session)
+
+    manager, session, deadline = asyncio.run(fresh())
+    assert deadline >= time.time() + TTL - 5
+    assert session.expires_at.timestamp() == pytest.approx(deadline)
+    assert not session.paused
+
+
+def test_expire_removes_the_container_and_releases_capacity():
+    async def scenario():
+        manager, node = make_manager()
+        session, container = add_session(manager, node)
+        await manager.expire(session.container_id)
+        return manager, session, container
+
+    manager, session, container = asyncio.run(scenario())
+    assert container.removed
+    assert manager.registry.get_by_container(session.container_id) is None
+    assert manager.node_pool.released == [(session.container_id, session.port)]
+    assert manager.admission.stats()["cpu_reserved"] == 0.0
@@ -0,0 +1,194 @@
+"""
+SharedInstanceManager（レプリカの起動・置き換え、セッションアフィニティ、割り当てとトークンの失効）のテスト
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("docker")
+
+from app.core.admission import AdmissionController
+from app.core.docker_executor import DockerExecutor
+from app.core.shared_instances import Replica, SharedInstanceManager, SharedSpec, _ReplicaSet, parse_instance_mode
+
+
+class FakeContainer:
+    def __init__(self, container_id):
+        self.id = container_id
+        self.short_id = container_id[:12]
+
+
+def make_manager(replicas=2, ttl=60.0):
+    manager = SharedInstanceManager(docker_manager=None, executor=None, assignment_ttl_seconds=ttl)
+    spec = SharedSpec("c1", "web:latest", 8000, "FLAG{x}", "Shared", replicas)
+    replica_set = _ReplicaSet(spec=spec)
+    for i in range(replicas):
+        replica_set.replicas.append(Replica(container=FakeContainer(f"replica-{i}" + "0" * 52), port=20000 + i))
+    manager._sets["c1"] = replica_set
+    return manager, replica_set
+
+
+def test_users_are_spread_and_stay_on_their_replica():
+    manager, replica_set = make_manager()
+    alice = manager.route("c1", "alice")
+    bob = manager.route("c1", "bob")
+    assert alice is not bob
+    assert manager.route("c1", "alice") is alice
+    assert [r.users for r in replica_set.replicas] == [1, 1]
+
+
+def test_release_forgets_affinity_and_token():
+    manager, replica_set = make_manager()
+    manager.route("c1", "alice")
+    manager.register_token("token-a", "c1", "alice")
+    manager.release("c1", "alice")
+    assert manager.route_token("token-a") is None
+    assert "alice" not in replica_set.affinity
+    assert sum(r.users for r in replica_set.replicas) == 0
+
+
+def test_idle_assignments_expire_but_active_ones_stay():
+    manager, replica_set = make_manager(ttl=60.0)
+    manager.route("c1", "alice")
+    manager.register_token("token-a", "c1", "alice")
+    manager.route("c1", "bob")
+    manager.register_token("token-b", "c1", "bob")
+
+    # bob は転送で最終利用時刻が更新される
+    replica_set.last_seen["alice"] -= 120
+    assert manager.route_token("token-b") is not None
+    assert manager.expire_idle() == 1
+
+    assert manager.route_token("token-a") is None
+    assert manager.route_token("token-b") is not None
+    assert set(replica_set.affinity) == {"bob"}
+    assert len(manager._tokens) == 1
+
+
+def test_invalidate_drops_tokens_of_removed_sets():
+    manager, _ = make_manager()
+    manager.route("c1", "alice")
+    manager.register_token("token-a", "c1", "alice")
+    manager._discard = lambda replica: None
+    manager.invalidate("c1")
+    assert manager._tokens == {} and manager._owner_tokens == {}
+
+
+class FakeReplicaContainer(FakeContainer):
+    def __init__(self, container_id):
+        super().__init__(container_id)
+        self.status = "running"
+        self.removed = False
+
+    def reload(self):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakePorts:
+    def __init__(self):
+        self.released = []
+
+    def release(self, port):
+        self.released.append(port)
+
+
+class FakeDockerManager:
+    """run_mission_container の代わり: 起動したコンテナと環境変数を記録する"""
+
+    def __init__(self):
+        self.ports = FakePorts()
+        self.started = []
+
+    async def run_mission_container(self, executor, image, internal_port=8000, environment=None, labels=None, name=None):
+        container = FakeReplicaContainer(f"{len(self.started):012d}" + "0" * 52)
+        self.started.append((container, image, environment, labels))
+        return container, 21000 + len(self.started)
+
+
+SPEC = SharedSpec("c1", "web:latest", 8000, "FLAG{shared}", "Shared", 2)
+
+
+def run_manager(scenario, admission=None):
+    async def wrapper():
+        manager = SharedInstanceManager(FakeDockerManager(), executor=DockerExecutor(max_workers=2), admission=admission)
+        try:
+            return await scenario(manager)
+        finally:
+            await manager.shutdown()
+            manager.executor.shutdown()
+
+    return asyncio.run(wrapper())
+
+
+def test_parse_instance_mode():
+    assert parse_instance_mode(" Shared ") == "shared"
+    assert parse_instance_mode(None) == "dedicated"
+    assert parse_instance_mode("pooled") == "dedicated"
+
+
+def test_ensure_starts_the_target_replicas_once():
+    async def scenario(manager):
+        manager.ensure(SPEC)
+        manager.ensure(SPEC)
+        assert await manager.wait_ready("c1", timeout=1)
+        await asyncio.gather(*list(manager._tasks))
+        return manager.docker_manager.started, manager.stats()["c1"]
+
+    started, stats = run_manager(scenario)
+    assert len(started) == 2
+    assert all(env == {"CTF_FLAG": "FLAG{shared}"} and labels["sol.pool"] == "shared" for _, _, env, labels in started)
+    assert (stats["replicas"], stats["target"], stats["starting"]) == (2, 2, 0)
+
+
+def test_replicas_hold_admission_reservations_until_removed():
+    admission = AdmissionController(cpu_budget=1.0, memory_budget=1024 ** 3)
+
+    async def scenario(manager):
+        manager.container_cpu = 0.5
+        manager.ensure(SPEC)
+        await asyncio.gather(*list(manager._tasks))
+        reserved = admission.stats()["reservations"]
+        manager.invalidate("c1")
+        await asyncio.gather(*list(manager._tasks))
+        return reserved, admission.stats()["reservations"], manager.docker_manager
+
+    reserved, after, docker_manager = run_manager(scenario, admission=admission)
+    assert (reserved, after) == (2, 0)
+    assert all(container.removed for container, *_ in docker_manager.started)
+    assert sorted(docker_manager.ports.released) == [21001, 21002]
+
+
+def test_check_replaces_a_stopped_replica_and_reroutes_its_users():
+    async def scenario(manager):
+        manager.ensure(SPEC)
+        await asyncio.gather(*list(manager._tasks))
+        down = manager.route("c1", "alice")
+        down.container.status = "exited"
+        await manager.check()
+        await asyncio.gather(*list(manager._tasks))
+        return down, manager.route("c1", "alice"), manager
+
+    down, rerouted, manager = run_manager(scenario)
+    assert down.container.removed
+    assert rerouted is not down
+    assert len(manager.docker_manager.started) == 3
+
+
+def test_changed_spec_recreates_the_replica_set():
+    async def scenario(manager):
+        manager.ensure(SPEC)
+        await asyncio.gather(*list(manager._tasks))
+        old = [container for container, *_ in manager.docker_manager.started]
+        manager.ensure(SharedSpec("c1", "web:v2", 8000, "FLAG{rotated}", "Shared", 1))
+        await asyncio.gather(*list(manager._tasks))
+        return old, manager.spec_for("c1"), manager.stats()["c1"], manager.docker_manager.started
+
+    old, spec, stats, started = run_manager(scenario)
+    assert all(container.removed for container in old)
+    assert spec.image == "web:v2"
+    assert started[-1][2] == {"CTF_FLAG": "FLAG{rotated}"}
+    assert stats["replicas"] == 1
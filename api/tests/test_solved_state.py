@@ -0,0 +1,54 @@
+"""
+SolvedBitsets（ユーザーごとの正解済みビット集合とカタログへの合成）のテスト
+"""
+
+from app.core.solved_state import SolvedBitsets
+
+ETAG = 'W/"catalog"'
+ITEMS = [{"challenge_id": "c1"}, {"challenge_id": "c2"}, {"challenge_id": "c3"}]
+
+
+def test_merge_marks_only_the_users_solves():
+    bitsets = SolvedBitsets()
+    bitsets.rebuild([("alice", ["c2"]), ("bob", [])])
+    items, _, _ = bitsets.merge("alice", ETAG, ITEMS)
+    assert [item["solved"] for item in items] == [False, True, False]
+    assert all("solved" not in item for item in ITEMS)  # スナップショットは書き換えない
+
+    items, etag, solved_at = bitsets.merge("bob", ETAG, ITEMS)
+    assert not any(item["solved"] for item in items)
+    assert (etag, solved_at) == (ETAG, None)
+
+
+def test_personalised_etag_changes_with_the_solved_set():
+    bitsets = SolvedBitsets()
+    bitsets.rebuild([("alice", ["c1"]), ("bob", ["c1"]), ("carol", ["c3"])])
+    alice = bitsets.merge("alice", ETAG, ITEMS)[1]
+    assert alice.startswith('W/"catalog-') and alice.endswith('"')
+    assert bitsets.merge("bob", ETAG, ITEMS)[1] == alice
+    assert bitsets.merge("carol", ETAG, ITEMS)[1] != alice
+
+    bitsets.mark("alice", "c3")
+    assert bitsets.merge("alice", ETAG, ITEMS)[1] != alice
+
+
+def test_mark_records_the_solve_time_for_last_modified():
+    bitsets = SolvedBitsets()
+    bitsets.mark("alice", "c1")
+    assert bitsets.is_solved("alice", "c1")
+    assert not bitsets.is_solved("alice", "c2")
+    assert bitsets.merge("alice", ETAG, ITEMS)[2] is not None
+
+
+def test_ordinals_survive_reordering_and_new_challenges():
+    bitsets = SolvedBitsets()
+    bitsets.rebuild([("alice", ["c3"])])
+    reordered = [{"challenge_id": "c4"}, {"challenge_id": "c3"}, {"challenge_id": "c1"}]
+    items, _, _ = bitsets.merge("alice", 'W/"reloaded"', reordered)
+    assert [item["solved"] for item in items] == [False, True, False]
+    # 並びはスナップショットの ETag ごとに1つだけ保持する
+    assert list(bitsets._layouts) == ['W/"reloaded"']
+
+
+def test_unknown_challenge_is_not_solved():
+    assert not SolvedBitsets().is_solved("alice", "missing")
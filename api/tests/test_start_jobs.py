@@ -0,0 +1,123 @@
+"""
+StartJobManager（進捗イベント・SSE 形式・所有者の確認・保持期間）のテスト
+"""
+
+import asyncio
+import json
+
+from app.core.start_jobs import StartJobManager, format_sse
+
+
+class Rejected(Exception):
+    """HTTPException と同じ属性を持つ例外"""
+
+    def __init__(self, status_code, detail, headers=None):
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def test_progress_is_published_in_order_and_replayable():
+    async def scenario():
+        manager = StartJobManager()
+
+        async def run(report):
+            report("pulling")
+            await asyncio.sleep(0)
+            report("port_bound", port=20000)
+            return {"url": "http://example"}
+
+        job = manager.submit("alice", "c1", run)
+        live = [event["phase"] async for _, event in job.follow() if event]
+        # 途中から再接続した購読者は Last-Event-ID の次から受け取る
+        replay = [index async for index, _ in job.follow(start=2)]
+        return job, live, replay
+
+    job, live, replay = asyncio.run(scenario())
+    assert live == ["queued", "pulling", "port_bound", "ready"]
+    assert replay == [2, 3]
+    assert job.done and job.snapshot()["events"][-1]["url"] == "http://example"
+
+
+def test_failures_are_published_as_error_events():
+    async def scenario():
+        manager = StartJobManager()
+
+        async def run(report):
+            raise Rejected(429, "Too many starts", {"Retry-After": "5"})
+
+        job = manager.submit("alice", "c1", run)
+        return [event async for _, event in job.follow()][-1]
+
+    error = asyncio.run(scenario())
+    assert (error["phase"], error["status_code"], error["detail"], error["retry_after"]) == (
+        "error", 429, "Too many starts", "5"
+    )
+
+
+def test_one_active_job_per_user_and_challenge():
+    async def scenario():
+        manager = StartJobManager()
+        release = asyncio.Event()
+
+        async def run(report):
+            await release.wait()
+            return {}
+
+        first = manager.submit("alice", "c1", run)
+        same = manager.submit("alice", "c1", run)
+        other = manager.submit("bob", "c1", run)
+        release.set()
+        await asyncio.sleep(0.01)
+        again = manager.submit("alice", "c1", run)
+        release.set()
+        await manager.shutdown()
+        return first, same, other, again
+
+    first, same, other, again = asyncio.run(scenario())
+    assert same is first
+    assert other is not first
+    assert again is not first
+
+
+def test_jobs_are_only_visible_to_their_owner():
+    async def scenario():
+        manager = StartJobManager()
+
+        async def run(report):
+            return {}
+
+        job = manager.submit("alice", "c1", run)
+        await manager.shutdown()
+        return manager, job
+
+    manager, job = asyncio.run(scenario())
+    assert manager.get_owned(job.id, "alice") is job
+    assert manager.get_owned(job.id, "bob") is None
+    assert manager.get_owned("missing", "alice") is None
+
+
+def test_finished_jobs_are_dropped_after_retention():
+    async def scenario():
+        manager = StartJobManager(retention_seconds=60)
+
+        async def run(report):
+            return {}
+
+        job = manager.submit("alice", "c1", run)
+        await asyncio.sleep(0.01)
+        return manager, job
+
+    manager, job = asyncio.run(scenario())
+    assert manager.get(job.id) is job
+    job.finished_at -= 61
+    assert manager.get(job.id) is None
+
+
+def test_sse_frames():
+    event = {"phase": "ready", "url": "http://例"}
+    frame = format_sse(3, event)
+    assert frame.startswith("id: 3\nevent: ready\ndata: ")
+    assert frame.endswith("\n\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == event
+    assert format_sse(4, None) == ": keepalive\n\n"
@@ -0,0 +1,51 @@
+"""
+SubmissionLogWriter（spill ファイルの書き出し・再投入）のテスト
+"""
+
+import json
+
+from app.core.submission_writer import SubmissionLogWriter
+
+
+def make_writer(tmp_path, inserted, fail=False):
+    def insert_batch(batch):
+        if fail:
+            raise RuntimeError("supabase down")
+        inserted.extend(batch)
+
+    return SubmissionLogWriter(
+        insert_batch,
+        batch_size=10,
+        flush_interval_ms=10,
+        spill_path=str(tmp_path / "spill.jsonl"),
+    )
+
+
+def test_failed_batch_is_spilled_and_replayed_on_start(tmp_path):
+    inserted = []
+    failing = make_writer(tmp_path, inserted, fail=True)
+    failing.start()
+    failing.submit({"user_id": "u1", "is_correct": True})
+    failing.stop()
+    assert inserted == []
+    assert (tmp_path / "spill.jsonl").exists()
+
+    writer = make_writer(tmp_path, inserted)
+    writer.start()
+    writer.stop()
+    assert inserted == [{"user_id": "u1", "is_correct": True}]
+    assert not (tmp_path / "spill.jsonl").exists()
+
+
+def test_replay_skips_corrupt_lines(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    spill.write_bytes(
+        json.dumps({"user_id": "u1"}).encode() + b"\n{not json\n\xff\xfe\n[1, 2]\n"
+        + json.dumps({"user_id": "u2"}).encode() + b"\n"
+    )
+    inserted = []
+    writer = make_writer(tmp_path, inserted)
+    writer.start()
+    writer.stop()
+    assert inserted == [{"user_id": "u1"}, {"user_id": "u2"}]
+
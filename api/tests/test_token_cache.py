@@ -0,0 +1,98 @@
+"""
+TokenCache（exp による失効・無効化・LRU 上限）のテスト
+"""
+
+from app.core.token_cache import TokenCache
+
+USER = {"id": "user-1", "email": "user@example.com"}
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(maxsize=10):
+    clock = FakeClock()
+    return TokenCache(maxsize=maxsize, clock=clock), clock
+
+
+def test_entry_expires_at_the_token_exp():
+    cache, clock = make_cache()
+    cache.set("token", USER, expires_at=clock.now + 60)
+    assert cache.get("token") == USER
+
+    clock.now += 59
+    assert cache.get("token") == USER
+    clock.now += 1
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_tokens_without_a_future_exp_are_not_cached():
+    cache, clock = make_cache()
+    cache.set("no-exp", USER, expires_at=None)
+    cache.set("expired", USER, expires_at=clock.now - 1)
+    assert cache.get("no-exp") is None
+    assert cache.get("expired") is None
+    assert len(cache) == 0
+
+
+def test_clear_invalidates_every_entry():
+    cache, clock = make_cache()
+    cache.set("a", USER, expires_at=clock.now + 60)
+    cache.set("b", USER, expires_at=clock.now + 60)
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+
+def test_ttl_caps_the_lifetime_below_the_exp():
+    cache, clock = make_cache()
+    cache.set("remote", USER, expires_at=clock.now + 3600, ttl=30)
+    clock.now += 29
+    assert cache.get("remote") == USER
+    clock.now += 1
+    assert cache.get("remote") is None
+
+
+def test_ttl_never_extends_past_the_exp():
+    cache, clock = make_cache()
+    cache.set("remote", USER, expires_at=clock.now + 10, ttl=30)
+    clock.now += 10
+    assert cache.get("remote") is None
+
+
+def test_zero_ttl_disables_caching():
+    cache, clock = make_cache()
+    cache.set("remote", USER, expires_at=clock.now + 60, ttl=0)
+    assert len(cache) == 0
+
+
+def test_set_replaces_the_cached_user():
+    cache, clock = make_cache()
+    cache.set("token", USER, expires_at=clock.now + 60)
+    cache.set("token", {**USER, "email": "new@example.com"}, expires_at=clock.now + 5)
+    assert cache.get("token")["email"] == "new@example.com"
+    clock.now += 5
+    assert cache.get("token") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache, clock = make_cache(maxsize=2)
+    cache.set("a", USER, expires_at=clock.now + 60)
+    cache.set("b", USER, expires_at=clock.now + 60)
+    assert cache.get("a") == USER  # a を最近使ったものにする
+    cache.set("c", USER, expires_at=clock.now + 60)
+    assert cache.get("b") is None
+    assert cache.get("a") == USER
+    assert cache.get("c") == USER
+
+
+def test_raw_token_is_not_stored_as_key():
+    cache, clock = make_cache()
+    cache.set("secret-token", USER, expires_at=clock.now + 60)
+    assert "secret-token" not in cache._entries
@@ -0,0 +1,19 @@
+-- Running mission containers (SESSION_TABLE, default "active_sessions").
+-- Written behind by the API's SessionRegistry and read back on restart and
+-- when a stop / extend / start misses the in-memory registry.
+create table if not exists public.active_sessions (
+    container_id text primary key,
+    user_id      text not null,
+    challenge_id text not null,
+    port         integer not null,
+    start_time   timestamptz not null default now(),
+    -- Deadline after /api/containers/extend (null = start_time + CONTAINER_TTL_MINUTES)
+    expires_at   timestamptz
+);
+
+alter table public.active_sessions add column if not exists expires_at timestamptz;
+
+create index if not exists active_sessions_user_id_idx on public.active_sessions (user_id);
+
+-- Only the API (service role) reads and writes sessions
+alter table public.active_sessions enable row level security;
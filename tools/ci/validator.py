@@ -40,6 +40,11 @@ DISALLOWED_CVE_TYPES = [
 # Base images (PROJECT_MASTER.md)
 ALLOWED_BASE_IMAGES = ["python:3.11-slim", "alpine:3.19"]
 
+# environment.instance_mode (shared = one replica set serves every player; stateless challenges only)
+ALLOWED_INSTANCE_MODES = ["dedicated", "shared"]
+# environment.flag_mode (dynamic = per-user flag injected as CTF_FLAG; the image must read it)
+ALLOWED_FLAG_MODES = ["static", "dynamic"]
+
 
 class ValidationError(Exception):
     """Custom exception for validation errors."""
@@ -177,6 +182,18 @@ class MissionValidator:
                         f"base_image should be one of {ALLOWED_BASE_IMAGES}: {base_image}"
                     )
             
+            # instance_mode: optional, dedicated (default) or shared
+            if "instance_mode" in env and env["instance_mode"] not in ALLOWED_INSTANCE_MODES:
+                self.errors.append(
+                    f"instance_mode must be one of {ALLOWED_INSTANCE_MODES}: {env['instance_mode']}"
+                )
+            
+            # flag_mode: optional, static (default) or dynamic
+            if "flag_mode" in env and env["flag_mode"] not in ALLOWED_FLAG_MODES:
+                self.errors.append(
+                    f"flag_mode must be one of {ALLOWED_FLAG_MODES}: {env['flag_mode']}"
+                )
+            
             # cost_token: Range 1000-10000
             if "cost_token" in env:
                 cost = env["cost_token"]
@@ -29,6 +29,12 @@ from builder.simple_builder import ImageBuilder
 from solver.container_tester import ContainerTester
 import json
 
+# Shared metrics helpers (api/app/core/metrics.py, path added by container_tester)
+try:
+    from app.core.metrics import PIPELINE_STEP_SECONDS, REGISTRY, timed
+except ImportError:
+    REGISTRY = None
+
 # Docker library for cleanup
 try:
     import docker
@@ -698,6 +704,13 @@ Examples:
         """
     )
     
+    parser.add_argument(
+        '--metrics-file',
+        default=os.getenv('SOL_METRICS_FILE'),
+        help='Write Prometheus metrics (step and Docker latencies) to this file when done '
+             '(node_exporter textfile collector format)'
+    )
+    
     subparsers = parser.add_subparsers(dest='command', help='Command to execute')
     
     # validate command
@@ -889,6 +902,18 @@ Examples:
         parser.print_help()
         return 1
     
+    if REGISTRY is None:
+        return run_command(args, parser)
+    try:
+        with timed(PIPELINE_STEP_SECONDS, step=args.command):
+            return run_command(args, parser)
+    finally:
+        if args.metrics_file:
+            REGISTRY.write_textfile(args.metrics_file)
+
+
+def run_command(args, parser):
+    """Dispatch the parsed subcommand."""
     if args.command == 'validate':
         return cmd_validate(args)
     elif args.command == 'generate':
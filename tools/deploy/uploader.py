@@ -9,6 +9,8 @@ Uses Supabase client library.
 
 import json
 import os
+import urllib.request
+import urllib.error
 from typing import Dict, Any, Optional
 from pathlib import Path
 import sys
@@ -190,6 +192,14 @@ class MissionUploader:
             for field in required_fields:
                 if field not in mission_json:
                     raise ValueError(f"Missing required field in JSON: {field}")
+            # environment.instance_mode is read by the API from metadata (default: dedicated)
+            instance_mode = mission_json["environment"].get("instance_mode", "dedicated")
+            if instance_mode not in ("dedicated", "shared"):
+                raise ValueError(f"Invalid environment.instance_mode: {instance_mode} (expected 'dedicated' or 'shared')")
+            # environment.flag_mode: dynamic flags are derived by the API per user (default: static)
+            flag_mode = mission_json["environment"].get("flag_mode", "static")
+            if flag_mode not in ("static", "dynamic"):
+                raise ValueError(f"Invalid environment.flag_mode: {flag_mode} (expected 'static' or 'dynamic')")
         
         # Map JSON to database format
         db_record = self._map_json_to_db(mission_json)
@@ -209,7 +219,8 @@ class MissionUploader:
                     "success": True,
                     "mission_id": mission_id,
                     "message": f"Mission '{mission_id}' deployed successfully",
-                    "data": response.data[0] if isinstance(response.data, list) else response.data
+                    "data": response.data[0] if isinstance(response.data, list) else response.data,
+                    "cache_invalidated": self.invalidate_api_caches()
                 }
             else:
                 raise RuntimeError("Upsert operation returned no data")
@@ -236,6 +247,35 @@ class MissionUploader:
             else:
                 raise RuntimeError(f"Database operation failed: {error_msg}")
     
+    def invalidate_api_caches(self) -> bool:
+        """
+        Ask the running API to drop its cached challenge data.
+        
+        Calls POST {API_URL}/api/admin/cache/invalidate with CACHE_INVALIDATION_TOKEN.
+        Best-effort: skipped when either env var is unset, and failures only warn
+        (the API cache expires on its own after CATALOG_CACHE_TTL_SECONDS).
+        
+        Returns:
+            True if the API confirmed the invalidation, False otherwise
+        """
+        api_url = os.getenv("API_URL") or os.getenv("NEXT_PUBLIC_API_URL")
+        token = os.getenv("CACHE_INVALIDATION_TOKEN")
+        if not api_url or not token:
+            return False
+        
+        request = urllib.request.Request(
+            f"{api_url.rstrip('/')}/api/admin/cache/invalidate",
+            data=b"",
+            method="POST",
+            headers={"X-Cache-Invalidation-Token": token}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError) as e:
+            print(f"Warning: Failed to invalidate API caches: {e}", file=sys.stderr)
+            return False
+    
     def reset_database(self) -> Dict[str, Any]:
         """
         Reset database by deleting all records in correct order (child -> parent).
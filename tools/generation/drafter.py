@@ -199,7 +199,8 @@ class MissionDrafter:
     "base_image": "python:3.11-slim|alpine:3.19",
     "cost_token": 1000-10000,
     "expected_solve_time": "30m|45m|60m|90m|120m",
-    "tags": ["web", "linux", ...]
+    "tags": ["web", "linux", ...],
+    "instance_mode": "dedicated|shared"
   },
   "narrative": {
     "story_hook": "最大3文。禁止用語を含まない。",
@@ -577,6 +578,10 @@ JSON形式のみを返してください。説明文やマークダウンは不
    - カテゴリ（Web, Network, Crypto等）、脆弱性タイプ（SQL, RCE, SSRF等）、難易度（Beginner, Intermediate, Advanced等）を含めること
    - 2-4個のタグを推奨
 
+3. **environment.instance_mode**: `"dedicated"`（デフォルト、ユーザーごとにコンテナを起動）または `"shared"`。
+   - プレイヤーの操作でアプリの状態（ファイル・DB・セッション）が変わらない問題（LogicError・暗号など読み取り専用）のみ `"shared"` にすること
+   - `"shared"` の問題は全プレイヤーが同じコンテナを共有する
+
 **[SOLVER SCRIPT REQUIREMENT]**
 
 You MUST also generate a solver script (Python) that demonstrates how to solve this challenge.
@@ -418,7 +418,8 @@ Create a CTF challenge based strictly on the provided technical description belo
     "base_image": "python:3.11-slim",
     "cost_token": 5000,
     "expected_solve_time": "60m",
-    "tags": ["web", "rce"]
+    "tags": ["web", "rce"],
+    "instance_mode": "dedicated"
   }},
   "narrative": {{
     "story_hook": "ストーリーフック（最大3文）",
@@ -441,6 +442,7 @@ Create a CTF challenge based strictly on the provided technical description belo
 - filesオブジェクトのキーは "app.py", "Dockerfile", "requirements.txt", "flag.txt" を使用してください
 - **flag.txtの内容はflag_answerと同じ値にしてください**（例: flag_answerが"SolCTF{{abc}}"なら、flag.txtも"SolCTF{{abc}}"）
 - type, difficulty_factors, vulnerability, environment, narrative, flag_answer, files, writeup, tags はすべて必須です
+- environment.instance_mode は、プレイヤーの操作で状態が変わらない問題（LogicError・暗号など）のみ "shared"（全員で1つのコンテナを共有）、それ以外は "dedicated" にしてください
 """
         else:
             # 通常モード
@@ -483,7 +485,8 @@ Create a CTF challenge based strictly on the provided technical description belo
     "base_image": "python:3.11-slim",
     "cost_token": 5000,
     "expected_solve_time": "60m",
-    "tags": ["web", "rce"]
+    "tags": ["web", "rce"],
+    "instance_mode": "dedicated"
   }},
   "narrative": {{
     "story_hook": "ストーリーフック（最大3文）",
@@ -506,6 +509,7 @@ Create a CTF challenge based strictly on the provided technical description belo
 - filesオブジェクトのキーは "app.py", "Dockerfile", "requirements.txt", "flag.txt" を使用してください
 - **flag.txtの内容はflag_answerと同じ値にしてください**（例: flag_answerが"SolCTF{{abc}}"なら、flag.txtも"SolCTF{{abc}}"）
 - type, difficulty_factors, vulnerability, environment, narrative, flag_answer, files, writeup, tags はすべて必須です
+- environment.instance_mode は、プレイヤーの操作で状態が変わらない問題（LogicError・暗号など）のみ "shared"（全員で1つのコンテナを共有）、それ以外は "dedicated" にしてください
 """
         return prompt
     
@@ -29,6 +29,16 @@ class EnvironmentInfo(BaseModel):
     cost_token: int = Field(..., ge=1000, le=10000, description="推定トークンコスト (1000-10000)")
     expected_solve_time: str = Field(..., description="期待される解答時間 (30m/45m/60m/90m/120m)")
     tags: List[str] = Field(..., description="タグリスト")
+    instance_mode: str = Field(
+        default="dedicated",
+        pattern=r"^(dedicated|shared)$",
+        description="インスタンス方式 (dedicated: ユーザーごと / shared: 状態を持たない問題を全員で共有)",
+    )
+    flag_mode: str = Field(
+        default="static",
+        pattern=r"^(static|dynamic)$",
+        description="Flag方式 (static: flag_answer / dynamic: ユーザーごとにHMACで導出し CTF_FLAG で注入)",
+    )
 
 
 class NarrativeInfo(BaseModel):
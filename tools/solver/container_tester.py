@@ -9,6 +9,9 @@ import json
 import time
 import logging
 import os
+import socket
+import urllib.error
+import urllib.request
 from typing import Dict, Any, Optional, Tuple
 from pathlib import Path
 import sys
@@ -34,6 +37,33 @@ except ImportError:
 import subprocess
 
 
+def parse_port_range(value: str) -> range:
+    """"30000-30999" -> range(30000, 31000)"""
+    start, sep, end = str(value).strip().partition("-")
+    first = int(start)
+    last = int(end) if sep else first
+    if not 0 < first <= last <= 65535:
+        raise ValueError(f"Invalid port range: {value!r}")
+    return range(first, last + 1)
+
+
+def http_ready(url: str, timeout: float = 2.0) -> bool:
+    """
+    True once the app behind ``url`` answers HTTP (any status code).
+
+    A bare TCP connect to a published port succeeds as soon as docker-proxy
+    listens, before the app inside the container does, so readiness is
+    judged by an HTTP response instead.
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=timeout):
+            return True
+    except urllib.error.HTTPError:
+        return True  # 4xx / 5xx でもアプリは応答している
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
 class ContainerTester:
     """Tests mission containers by starting them and verifying they can be solved."""
     
@@ -45,6 +75,9 @@ class ContainerTester:
             use_docker_lib: Use docker Python library if available (default: True)
         """
         self.use_docker_lib = use_docker_lib and docker is not None
+        # テストコンテナを公開するホストポートの範囲と使用中のポート（container_id -> port）
+        self.port_range = parse_port_range(os.getenv("SOL_TEST_PORT_RANGE", "30000-30999"))
+        self._ports_by_container: Dict[str, int] = {}
         
         if self.use_docker_lib:
             try:
@@ -91,17 +124,21 @@ class ContainerTester:
         container_id = None
         port = None
         container_url = None
+        container_host = os.getenv('CONTAINER_HOST', 'localhost')
         
         try:
+            # 割り当て範囲の空きポートに明示的に公開（起動後のポート問い合わせは不要）
+            port = self._allocate_port()
+            container_url = f"http://{container_host}:{port}"
+            
             if self.use_docker_lib:
                 # Start container using docker library
                 try:
-                    container = self.client.containers.run(
+                    create_kwargs = dict(
                         image=image_name,
                         name=f"sol_test_{int(time.time())}",
-                        ports={'8000/tcp': ('0.0.0.0', 0)},  # Auto-assign port
+                        ports={'8000/tcp': ('0.0.0.0', port)},
                         detach=True,
-                        remove=False,
                         environment={
                             "CTF_FLAG": flag
                         },
@@ -109,75 +146,22 @@ class ContainerTester:
                         network_disabled=False,
                     )
                     
-                    # Wait for container to be ready
-                    container.reload()
+                    container = self.client.containers.run(remove=False, **create_kwargs)
                     container_id = container.id
                     
-                    # Get assigned port
-                    if container.ports and '8000/tcp' in container.ports:
-                        port_info = container.ports['8000/tcp']
-                        if port_info and len(port_info) > 0:
-                            port = int(port_info[0]['HostPort'])
-                            # Use CONTAINER_HOST environment variable (defaults to localhost)
-                            container_host = os.getenv('CONTAINER_HOST', 'localhost')
-                            container_url = f"http://{container_host}:{port}"
-                    
+                    self._ports_by_container[container_id] = port
                     # Wait for container to be ready (check if it responds)
-                    if HAS_REQUESTS:
-                        max_wait = timeout
-                        wait_interval = 2
-                        waited = 0
-                        
-                        while waited < max_wait:
-                            try:
-                                response = requests.get(f"{container_url}/", timeout=2)
-                                if response.status_code in [200, 404]:  # 404 is OK, means server is running
-                                    break
-                            except requests.RequestException:
-                                pass
-                            
-                            time.sleep(wait_interval)
-                            waited += wait_interval
-                    else:
-                        # Wait without checking if requests is not available
-                        time.sleep(5)
+                    self._wait_until_ready(container_url, timeout)
                     
                     return container_id, port, container_url
                 except docker.errors.APIError as e:
-                    error_msg = str(e)
-                    if "port is already allocated" in error_msg or "Bind" in error_msg:
-                        print(f"[WARNING] Port conflict detected. Trying to find available port...", file=sys.stderr)
-                        # Try with a different approach - let Docker auto-assign
+                    print(f"[ERROR] Failed to start container on port {port}: {e}", file=sys.stderr)
+                    if container is not None:
                         try:
-                            container = self.client.containers.run(
-                                image=image_name,
-                                name=f"sol_test_{int(time.time())}_{hash(image_name) % 10000}",
-                                ports={'8000/tcp': None},  # Let Docker auto-assign
-                                detach=True,
-                                remove=False,
-                                environment={
-                                    "CTF_FLAG": flag
-                                },
-                                mem_limit="512m",
-                                network_disabled=False,
-                            )
-                            container.reload()
-                            container_id = container.id
-                            if container.ports and '8000/tcp' in container.ports:
-                                port_info = container.ports['8000/tcp']
-                                if port_info and len(port_info) > 0:
-                                    port = int(port_info[0]['HostPort'])
-                                    # Use CONTAINER_HOST environment variable (defaults to localhost)
-                                    container_host = os.getenv('CONTAINER_HOST', 'localhost')
-                                    container_url = f"http://{container_host}:{port}"
-                            time.sleep(5)
-                            return container_id, port, container_url
-                        except Exception as e2:
-                            print(f"[ERROR] Failed to start container after retry: {e2}", file=sys.stderr)
-                            return None, None, None
-                    else:
-                        print(f"[ERROR] Failed to start container: {error_msg}", file=sys.stderr)
-                        return None, None, None
+                            container.remove(force=True)
+                        except Exception:
+                            pass
+                    return None, None, None
                 except Exception as e:
                     print(f"[ERROR] Unexpected error starting container: {e}", file=sys.stderr)
                     return None, None, None
@@ -192,7 +176,7 @@ class ContainerTester:
                         "docker", "run",
                         "-d",
                         "--name", test_name,
-                        "-p", "0:8000",
+                        "-p", f"{port}:8000",
                         "-e", f"CTF_FLAG={flag}",
                         "--rm",
                         image_name
@@ -209,69 +193,10 @@ class ContainerTester:
                     return None, None, None
                 
                 container_id = stdout.strip()
-                
-                # Get port mapping
-                port_process = subprocess.run(
-                    [
-                        "docker", "port", test_name
-                    ],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    timeout=10
-                )
-                
-                if port_process.returncode == 0:
-                    # Parse port output: "8000/tcp -> 0.0.0.0:32804"
-                    # Handle multiple lines if present
-                    port_lines = port_process.stdout.strip().split('\n')
-                    for port_line in port_lines:
-                        port_line = port_line.strip()
-                        if "->" in port_line and "8000/tcp" in port_line:
-                            # Extract port from "8000/tcp -> 0.0.0.0:32804"
-                            try:
-                                # Split by "->" and get the right side, then split by ":" to get port
-                                right_side = port_line.split("->")[1].strip()
-                                port_str = right_side.split(":")[1].strip()
-                                port = int(port_str)
-                                # Use CONTAINER_HOST environment variable (defaults to localhost)
-                                container_host = os.getenv('CONTAINER_HOST', 'localhost')
-                                container_url = f"http://{container_host}:{port}"
-                                break
-                            except (ValueError, IndexError) as e:
-                                print(f"[WARNING] Failed to parse port from line: {port_line}", file=sys.stderr)
-                                continue
-                
-                # Check if container_url was set
-                if not container_url:
-                    print(f"[ERROR] Failed to extract port from docker port output: {port_process.stdout}", file=sys.stderr)
-                    # Try to stop and remove the container
-                    try:
-                        subprocess.run(["docker", "stop", test_name], capture_output=True, timeout=10)
-                        subprocess.run(["docker", "rm", test_name], capture_output=True, timeout=10)
-                    except:
-                        pass
-                    return None, None, None
+                self._ports_by_container[container_id] = port
                 
                 # Wait for container to be ready
-                if HAS_REQUESTS:
-                    max_wait = timeout
-                    wait_interval = 2
-                    waited = 0
-                    
-                    while waited < max_wait:
-                        try:
-                            response = requests.get(f"{container_url}/", timeout=2)
-                            if response.status_code in [200, 404]:
-                                break
-                        except requests.RequestException:
-                            pass
-                        
-                        time.sleep(wait_interval)
-                        waited += wait_interval
-                else:
-                    # Wait without checking if requests is not available
-                    time.sleep(5)
+                self._wait_until_ready(container_url, timeout)
                 
                 return container_id, port, container_url
                 
@@ -279,6 +204,45 @@ class ContainerTester:
             print(f"[ERROR] Failed to start test container: {e}", file=sys.stderr)
             return None, None, None
     
+    def _allocate_port(self) -> int:
+        """
+        Next host port in SOL_TEST_PORT_RANGE that is neither used by one of
+        our test containers nor bound by another process.
+        
+        Raises:
+            RuntimeError: every port in the range is taken
+        """
+        in_use = set(self._ports_by_container.values())
+        for port in self.port_range:
+            if port in in_use:
+                continue
+            with socket.socket() as sock:
+                try:
+                    sock.bind(('', port))
+                except OSError:
+                    continue
+            return port
+        raise RuntimeError(f"No free host port left in SOL_TEST_PORT_RANGE ({self.port_range.start}-{self.port_range.stop - 1})")
+    
+    def _wait_until_ready(self, container_url: str, timeout: int) -> bool:
+        """
+        Wait until the app in the container answers HTTP, probing with a
+        short exponential backoff.
+        
+        Returns:
+            True if the container became ready within timeout
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.1
+        while True:
+            if http_ready(f"{container_url}/", timeout=min(2.0, timeout)):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 2.0)
+    
     def stop_test_container(self, container_id: str) -> bool:
         """
         Stop and remove test container.
@@ -306,6 +270,7 @@ class ContainerTester:
                     capture_output=True,
                     timeout=10
                 )
+            self._ports_by_container.pop(container_id, None)
             return True
         except Exception as e:
             print(f"[WARNING] Failed to stop container {container_id}: {e}", file=sys.stderr)
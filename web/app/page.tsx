@@ -4,11 +4,11 @@ import { useState, useEffect } from 'react';
 import { useRouter } from 'next/navigation';
 import { Terminal, Shield, Loader2, AlertCircle, LogOut, User, Target, Flag, CheckCircle2, XCircle, BookOpen, AlertTriangle } from 'lucide-react';
 import { createClient } from '@/utils/supabase/client';
-import { buildApiUrl } from '@/utils/api';
+import { buildApiUrl, followStartJob } from '@/utils/api';
 import { Button } from '@/components/ui/button';
 import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle, DialogTrigger } from '@/components/ui/dialog';
 import type { User as SupabaseUser } from '@supabase/supabase-js';
-import type { Challenge, MissionData, SubmitResult } from '@/types';
+import type { Challenge, MissionData, StartJob, SubmitResult } from '@/types';
 import ChallengeCard from '@/components/ChallengeCard';
 
 export default function Home() {
@@ -16,6 +16,7 @@ export default function Home() {
   const supabase = createClient();
   const [isLoading, setIsLoading] = useState(false);
   const [loadingChallengeId, setLoadingChallengeId] = useState<string | null>(null);
+  const [startPhase, setStartPhase] = useState<string | null>(null);
   const [missionData, setMissionData] = useState<MissionData | null>(null);
   const [error, setError] = useState<string | null>(null);
   
@@ -220,6 +221,7 @@ export default function Home() {
     
     setIsLoading(true);
     setLoadingChallengeId(challengeId);
+    setStartPhase(null);
     setError(null);
     
     try {
@@ -281,14 +283,30 @@ export default function Home() {
         }
       }
 
-      let data;
+      // 起動はジョブとして受け付けられる（202）。進捗は SSE で受け取る
+      let job: StartJob;
       try {
-        data = await res.json();
+        job = await res.json();
       } catch (jsonError: any) {
         console.error('JSON parse error:', jsonError);
         throw new Error('Invalid response from server');
       }
       
+      const result = await followStartJob(
+        job.events_url,
+        session.access_token,
+        (event) => setStartPhase(event.phase)
+      );
+      if (result.phase === 'error') {
+        if (result.status_code === 429) {
+          throw new Error("RATE LIMIT EXCEEDED. WAIT.");
+        } else if (result.status_code === 404) {
+          throw new Error("CHALLENGE NOT FOUND.");
+        }
+        throw new Error(result.detail || "SYSTEM ERROR: UNABLE TO DEPLOY.");
+      }
+      const { phase, at, ...data } = result;
+      
       // challenge_idを追加して保存（Flag提出時に必要）
       setMissionData({ ...data, challenge_id: challengeId });
       // Flag提出関連のStateをリセット
@@ -339,6 +357,7 @@ export default function Home() {
     } finally {
       setIsLoading(false);
       setLoadingChallengeId(null);
+      setStartPhase(null);
     }
   };
 
@@ -606,13 +625,28 @@ export default function Home() {
                   (c) => c.challenge_id === missionData?.challenge_id || c.id === missionData?.challenge_id
                 );
                 
-                if (currentChallenge?.writeup && missionData) {
+                if ((currentChallenge?.has_writeup || currentChallenge?.writeup) && missionData) {
                   return (
                     <div className="border-t border-zinc-800 pt-4">
                       <Button
-                        onClick={() => {
-                          // Replace {{CONTAINER_HOST}} placeholder with actual container URL
+                        onClick={async () => {
+                          // 一覧には writeup が含まれないため、詳細エンドポイントから取得
                           let writeup = currentChallenge.writeup || null;
+                          if (!writeup) {
+                            try {
+                              const { data: { session } } = await supabase.auth.getSession();
+                              const res = await fetch(
+                                buildApiUrl(`/api/challenges/${encodeURIComponent(currentChallenge.challenge_id)}`),
+                                { headers: { 'Authorization': `Bearer ${session?.access_token ?? ''}` } }
+                              );
+                              if (res.ok) {
+                                writeup = (await res.json()).writeup || null;
+                              }
+                            } catch (err) {
+                              console.error('Failed to fetch writeup:', err);
+                            }
+                          }
+                          // Replace {{CONTAINER_HOST}} placeholder with actual container URL
                           if (writeup && missionData && missionData.url) {
                             // Extract hostname from missionData.url (e.g., "http://localhost:32804" -> "localhost:32804")
                             const url = new URL(missionData.url);
@@ -678,6 +712,7 @@ export default function Home() {
                     onInitialize={startMission}
                     isLoading={isLoading}
                     loadingChallengeId={loadingChallengeId}
+                    startPhase={startPhase}
                     getDifficultyColor={getDifficultyColor}
                   />
                 ))}
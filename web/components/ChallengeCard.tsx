@@ -10,6 +10,7 @@ interface ChallengeCardProps {
   onInitialize: (challengeId: string) => void;
   isLoading?: boolean;
   loadingChallengeId?: string | null;
+  startPhase?: string | null; // 起動ジョブの進捗（queued / pulling / creating / ...）
   getDifficultyColor?: (difficulty?: number) => string;
 }
 
@@ -18,6 +19,7 @@ export default function ChallengeCard({
   onInitialize,
   isLoading = false,
   loadingChallengeId = null,
+  startPhase = null,
   getDifficultyColor,
 }: ChallengeCardProps) {
 
@@ -95,7 +97,7 @@ export default function ChallengeCard({
             {isThisChallengeLoading ? (
               <>
                 <Loader2 className="w-4 h-4 mr-2 animate-spin" />
-                DEPLOYING...
+                {startPhase ? `DEPLOYING... (${startPhase.replace('_', ' ').toUpperCase()})` : 'DEPLOYING...'}
               </>
             ) : (
               <>
@@ -5,7 +5,9 @@ export interface Challenge {
   difficulty?: number; // DB column is now integer (1-5)
   category?: string;
   points?: number;
-  writeup?: string; // Educational writeup in Markdown format
+  writeup?: string; // Educational writeup in Markdown format (detail endpoint only)
+  has_writeup?: boolean;
+  solved?: boolean;
   tags?: string[]; // Tags array (e.g., ["Web", "SQL", "Beginner"])
   metadata?: {
     tags?: string[]; // Alternative location for tags
@@ -24,6 +26,25 @@ export interface MissionData {
   challenge_id?: string; // Flag提出時に必要
 }
 
+// POST /api/containers/start（202）の応答
+export interface StartJob {
+  job_id: string;
+  status: string;
+  phase?: string | null;
+  events_url: string;
+}
+
+// 起動ジョブの SSE イベント（queued → pulling → creating → port_bound → healthy → ready / error）
+export interface StartJobEvent {
+  phase: string;
+  at: number;
+  position?: number; // queued: キュー内の位置
+  eta_seconds?: number;
+  status_code?: number; // error
+  detail?: string; // error
+  [key: string]: any; // ready: MissionData の各フィールド
+}
+
 export interface SubmitResult {
   correct: boolean;
   message: string;
@@ -1,3 +1,5 @@
+import type { StartJobEvent } from '@/types';
+
 /**
  * API Client Utility (Ver 10.2)
  * 
@@ -73,3 +75,83 @@ export async function apiFetch(
   return fetch(url, fetchOptions);
 }
 
+
+/**
+ * Follow a container start job's Server-Sent Events stream
+ *
+ * EventSource cannot send an Authorization header, so the stream is read
+ * with fetch. Resolves with the terminal event (`ready` or `error`) and
+ * reconnects with Last-Event-ID if the connection drops.
+ * @param eventsUrl - events_url returned by POST /api/containers/start
+ * @param sessionToken - Supabase session access token
+ * @param onEvent - Called for every progress event
+ * @param maxRetries - Reconnect attempts after a dropped connection
+ */
+export async function followStartJob(
+  eventsUrl: string,
+  sessionToken: string,
+  onEvent?: (event: StartJobEvent) => void,
+  maxRetries = 3
+): Promise<StartJobEvent> {
+  let lastEventId: string | null = null;
+
+  for (let attempt = 0; attempt <= maxRetries; attempt++) {
+    const headers: Record<string, string> = {
+      'Authorization': `Bearer ${sessionToken}`,
+      'Accept': 'text/event-stream',
+    };
+    if (lastEventId !== null) {
+      headers['Last-Event-ID'] = lastEventId;
+    }
+
+    let res: Response;
+    try {
+      res = await fetch(buildApiUrl(eventsUrl), { headers, cache: 'no-store' });
+    } catch {
+      continue; // ネットワークエラーは再接続
+    }
+    if (!res.ok || !res.body) {
+      throw new Error(`Start job stream failed (${res.status})`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    try {
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE フレームは空行区切り（id: / event: / data: 行、": keepalive" はコメント）
+        let boundary: number;
+        while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let id: string | null = null;
+          let data = '';
+          for (const line of frame.split('\n')) {
+            if (line.startsWith('id:')) {
+              id = line.slice(3).trim();
+            } else if (line.startsWith('data:')) {
+              data += line.slice(5).trim();
+            }
+          }
+          if (!data) continue;
+          if (id !== null) lastEventId = id;
+
+          const event: StartJobEvent = JSON.parse(data);
+          onEvent?.(event);
+          if (event.phase === 'ready' || event.phase === 'error') {
+            return event;
+          }
+        }
+      }
+    } catch {
+      // 読み込み中の切断は Last-Event-ID 付きで再接続
+    }
+  }
+
+  throw new Error('Start job stream disconnected');
+}